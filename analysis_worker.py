@@ -0,0 +1,87 @@
+import logging
+import queue
+import threading
+import time
+
+# Job kinds understood by the worker's handler.
+JOB_CAPTURE = "capture"
+JOB_FILE = "file"
+
+
+class AnalysisWorker(threading.Thread):
+    """
+    Runs capture and screenshot-file jobs (capture and analysis) one at a time on
+    a dedicated thread, so the keyboard listener never blocks. Jobs are taken from a bounded queue;
+    a capture request that arrives while another capture is still waiting in
+    the queue is coalesced into it instead of queueing a second full run.
+    """
+
+    def __init__(self, handler, max_queue_size, on_status_change=None):
+        super().__init__(name="AnalysisWorker", daemon=True)
+        self.handler = handler
+        self.on_status_change = on_status_change
+        self.jobs = queue.Queue(maxsize=max_queue_size)
+        self.lock = threading.Lock()
+        self.pending_captures = 0
+        self.busy = False
+        self.last_run_seconds = None
+        self.stopping = False
+
+    @property
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def submit(self, kind, payload=None):
+        """Queues a job. Returns False if it was coalesced or the queue is full."""
+        with self.lock:
+            if kind == JOB_CAPTURE and self.pending_captures:
+                logging.info("A capture is already pending, ignoring this hotkey press.")
+                return False
+            try:
+                self.jobs.put_nowait((kind, payload))
+            except queue.Full:
+                logging.warning(f"Work queue is full ({self.jobs.maxsize} jobs), dropping '{kind}' job.")
+                return False
+            if kind == JOB_CAPTURE:
+                self.pending_captures += 1
+        self._notify()
+        return True
+
+    def submit_capture(self):
+        return self.submit(JOB_CAPTURE)
+
+    def stop(self):
+        self.stopping = True
+        try:
+            self.jobs.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _notify(self):
+        if self.on_status_change:
+            try:
+                self.on_status_change(self)
+            except Exception:
+                logging.error("Status callback failed.", exc_info=True)
+
+    def run(self):
+        while not self.stopping:
+            job = self.jobs.get()
+            if job is None:
+                break
+            kind, payload = job
+            with self.lock:
+                if kind == JOB_CAPTURE:
+                    self.pending_captures -= 1
+                self.busy = True
+            self._notify()
+            start = time.perf_counter()
+            try:
+                self.handler(kind, payload)
+            except Exception:
+                logging.error(f"--- UNHANDLED ERROR WHILE PROCESSING '{kind}' JOB ---", exc_info=True)
+            finally:
+                self.last_run_seconds = time.perf_counter() - start
+                self.busy = False
+                self.jobs.task_done()
+                self._notify()
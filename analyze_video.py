@@ -0,0 +1,189 @@
+"""
+Extracts matches from a recorded session or VOD.
+
+    python analyze_video.py session.mp4 --stride 1.0 --output matches.json [--upload]
+
+The video is read once from start to end. Every `--stride` seconds one frame is
+checked with the cheap scoreboard detector. While a scoreboard is on screen the
+frames are checked densely and the sharpest one is kept; when the scoreboard
+disappears that frame is analyzed in a process pool while the scan continues.
+Scoreboards that were opened more than once during the same game result in a
+single match record.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from data_extraction.scoreboard_detector import SCOREBOARD_SIZE, VALIDATOR_ROI, score_region
+
+# While a scoreboard is visible, frames are checked this many times per second.
+REFINE_SAMPLES_PER_SECOND = 10
+# A scoreboard counts as closed after this many negative dense samples in a row.
+MISSES_TO_END = 3
+# Sharpness is measured on a downscaled frame to keep it cheap.
+SHARPNESS_SCALE = 0.5
+# Seconds to wait for --upload to empty the outbox before exiting.
+UPLOAD_TIMEOUT = 120
+
+
+def validator_region(frame):
+    """Crops the 'FINAL SCORE' region from a frame of any 16:9 size, at 2560x1440 scale."""
+    h, w = frame.shape[:2]
+    sx, sy = w / SCOREBOARD_SIZE[0], h / SCOREBOARD_SIZE[1]
+    x1, y1, x2, y2 = VALIDATOR_ROI
+    roi = frame[int(y1 * sy):int(y2 * sy), int(x1 * sx):int(x2 * sx)]
+    if (w, h) != SCOREBOARD_SIZE:
+        roi = cv2.resize(roi, (x2 - x1, y2 - y1), interpolation=cv2.INTER_LINEAR)
+    return roi
+
+
+def sharpness(frame):
+    """Variance of the Laplacian: higher means sharper (less motion blur, fewer artifacts)."""
+    small = cv2.resize(frame, None, fx=SHARPNESS_SCALE, fy=SHARPNESS_SCALE, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+
+def find_scoreboards(video_path, stride_seconds):
+    """
+    Scans the video and yields (timestamp in seconds, sharpest frame) for every
+    stretch of video that shows a scoreboard.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    stride = max(1, round(stride_seconds * fps))
+    refine_step = max(1, round(fps / REFINE_SAMPLES_PER_SECOND))
+
+    index = 0
+    best = None  # (sharpness, frame index, frame) of the scoreboard on screen
+    misses = 0
+    try:
+        while True:
+            step = refine_step if best is not None else stride
+            # Skipped frames are only grabbed, not converted, which is much cheaper.
+            for _ in range(step - 1):
+                if not cap.grab():
+                    break
+                index += 1
+            ok, frame = cap.read()
+            if not ok:
+                break
+            index += 1
+
+            positive, _signature = score_region(validator_region(frame))
+            if positive:
+                misses = 0
+                score = sharpness(frame)
+                if best is None or score > best[0]:
+                    best = (score, index - 1, frame)
+            elif best is not None:
+                misses += 1
+                if misses >= MISSES_TO_END:
+                    yield best[1] / fps, best[2]
+                    best, misses = None, 0
+        if best is not None:
+            yield best[1] / fps, best[2]
+    finally:
+        cap.release()
+
+
+def _init_worker():
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    from data_extraction.template_priors import use_in_memory_priors
+    # Parallel workers must not race on the detection history file.
+    use_in_memory_priors()
+
+
+def _analyze_frame(frame):
+    from data_extraction.main_ocr import analyze_scoreboard
+    if (frame.shape[1], frame.shape[0]) != SCOREBOARD_SIZE:
+        frame = cv2.resize(frame, SCOREBOARD_SIZE, interpolation=cv2.INTER_CUBIC)
+    return analyze_scoreboard(scoreboard_img=frame)
+
+
+def match_key(game_data):
+    """Identifies a game, so the same scoreboard seen twice yields one record."""
+    return (
+        game_data.get("map"), game_data.get("date"), game_data.get("length"),
+        game_data["team1"].get("score"), game_data["team2"].get("score"),
+    )
+
+
+def analyze_video(video_path, stride_seconds, workers):
+    """Returns one record per game found in the video, in order of appearance."""
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for timestamp, frame in find_scoreboards(video_path, stride_seconds):
+            logging.info(f"Scoreboard found at {timestamp:.1f}s, analyzing.")
+            pending.append((timestamp, pool.submit(_analyze_frame, frame)))
+
+        records, seen = [], set()
+        for timestamp, future in pending:
+            try:
+                game_data = future.result()
+            except Exception:
+                logging.error(f"Analysis of the scoreboard at {timestamp:.1f}s failed.", exc_info=True)
+                continue
+            if not game_data:
+                logging.warning(f"Scoreboard at {timestamp:.1f}s did not pass validation, skipping it.")
+                continue
+            key = match_key(game_data)
+            if key in seen:
+                logging.info(f"Scoreboard at {timestamp:.1f}s shows an already recorded game.")
+                continue
+            seen.add(key)
+            records.append({"video_time": round(timestamp, 2), **game_data})
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract match records from a recorded video.")
+    parser.add_argument("video", help="Path to a local video file.")
+    parser.add_argument("--stride", type=float, default=1.0, help="Seconds between checked frames (default: 1.0).")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Parallel analysis processes.")
+    parser.add_argument("--output", help="Write the match records to this JSON file.")
+    parser.add_argument("--upload", action="store_true", help="Upload every match record to Google Sheets.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    cap = cv2.VideoCapture(args.video)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    cap.release()
+
+    started = time.perf_counter()
+    try:
+        records = analyze_video(args.video, args.stride, args.workers)
+    except IOError as e:
+        logging.error(str(e))
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    speed = f" ({duration / elapsed:.1f}x realtime)" if elapsed > 0 and duration > 0 else ""
+    logging.info(f"Found {len(records)} games in {duration:.0f}s of video, took {elapsed:.1f}s{speed}.")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(records, f, indent=2)
+        logging.info(f"Match records written to {args.output}")
+    else:
+        print(json.dumps(records, indent=2))
+
+    if args.upload:
+        from google_sheets_integration.uploader import flush_uploads, stop_uploads, upload_to_sheet
+        for record in records:
+            game_data = {k: v for k, v in record.items() if k != "video_time"}
+            upload_to_sheet(game_data)
+        if not flush_uploads(UPLOAD_TIMEOUT):
+            logging.warning("Not every game could be uploaded yet; the rest is uploaded the next time the app runs.")
+        stop_uploads()
+
+
+if __name__ == "__main__":
+    main()
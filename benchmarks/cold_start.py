@@ -0,0 +1,110 @@
+"""
+Measures how long the tray app takes to start, from launching the process until
+the tray icon is up ("tray_ready") and until the OCR process has warmed up
+("ocr_ready").
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --exe dist/OverwatchStatsOCR/OverwatchStatsOCR.exe
+
+Without --exe the source tree is started with the current interpreter; with
+--exe the PyInstaller bundle produced by build.py is started instead. The app
+must already be set up (config.json present), otherwise it opens the setup GUI.
+With --importtime (source tree only) the `-X importtime` output of the first run
+is saved, to see which imports dominate.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import constants
+from benchmarks.common import latency_summary
+
+MILESTONES = ("main", "tray_ready", "ocr_ready")
+
+
+def launch_once(command, timeout, stderr_path=None):
+    """Starts the app once and returns {milestone: seconds since launch}."""
+    fd, probe_path = tempfile.mkstemp(prefix="startup_probe_", suffix=".jsonl")
+    os.close(fd)
+    env = dict(os.environ, **{constants.STARTUP_PROBE_ENV: probe_path})
+    stderr = open(stderr_path, "w", encoding="utf-8") if stderr_path else subprocess.DEVNULL
+    try:
+        launched_at = time.time()
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            print(f"  App did not exit within {timeout}s, run discarded.")
+            return None
+        with open(probe_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    finally:
+        if stderr_path:
+            stderr.close()
+        os.remove(probe_path)
+    return {r["milestone"]: r["time"] - launched_at for r in records}
+
+
+def run_cold_start(command, runs, timeout, importtime_path=None):
+    samples = []
+    for i in range(runs):
+        stderr_path = importtime_path if i == 0 else None
+        milestones = launch_once(command, timeout, stderr_path)
+        if milestones is None:
+            continue
+        if "ocr_failed" in milestones:
+            print("  The OCR process failed to start, see the app log.")
+        print(f"  Run {i + 1}: " + ", ".join(f"{m} {milestones[m]:.2f}s" for m in MILESTONES if m in milestones))
+        samples.append(milestones)
+
+    # latency_summary works in milliseconds, like the other benchmarks.
+    summary = {
+        m: latency_summary([s[m] * 1000 for s in samples if m in s])
+        for m in MILESTONES
+    }
+    return {"command": command, "runs": len(samples), "samples": samples, "milestones": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--exe", help="Path to the bundled executable built by build.py.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for one launch.")
+    parser.add_argument("--importtime", metavar="PATH", help="Save '-X importtime' output of the first run to PATH.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args()
+
+    if not os.path.exists(constants.CONFIG_FILE):
+        print(f"'{constants.CONFIG_FILE}' not found. Run the app once to complete the setup first.")
+        sys.exit(2)
+
+    if args.exe:
+        command = [os.path.abspath(args.exe)]
+        if args.importtime:
+            print("--importtime only works for the source tree, ignoring it.")
+            args.importtime = None
+    else:
+        command = [sys.executable] + (["-X", "importtime"] if args.importtime else []) + ["run.py"]
+
+    print(f"--- Cold start: {' '.join(command)} ({args.runs} runs) ---")
+    report = run_cold_start(command, args.runs, args.timeout, args.importtime)
+    print(f"\n{'milestone':<12} {'p50':>9} {'p95':>9} {'max':>9}")
+    for m, s in report["milestones"].items():
+        if s:
+            print(f"{m:<12} {s['p50'] / 1000:>8.2f}s {s['p95'] / 1000:>8.2f}s {s['max'] / 1000:>8.2f}s")
+    if args.importtime:
+        print(f"\nImport times of the first run written to {args.importtime}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
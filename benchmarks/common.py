@@ -0,0 +1,103 @@
+import math
+
+# Fields compared against the ground truth / expected output, in report order.
+COMPARED_FIELDS = ["map", "result", "gamemode", "date", "length", "score", "sides", "players"]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers. Returns None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(values):
+    """p50/p95/p99/mean/max in milliseconds for a list of durations."""
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(sum(values) / len(values), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def stage_latencies(traces):
+    """Collects {stage: [duration_ms, ...]} (plus "total") from finished traces."""
+    stages = {}
+    for t in traces:
+        for name, duration in t.stage_durations().items():
+            stages.setdefault(name, []).append(duration)
+        stages.setdefault("total", []).append(t.duration_ms)
+    return stages
+
+
+def memory_summary(traces):
+    """
+    Worst-case peak and retained KiB per stage, plus how much the traced memory
+    grew between the first and the last analysis (should stay near zero).
+    """
+    stages = {}
+    for t in traces:
+        for name, (peak, retained) in t.stage_memory().items():
+            worst = stages.setdefault(name, {"peak_kb": 0.0, "retained_kb": 0.0})
+            worst["peak_kb"] = max(worst["peak_kb"], peak)
+            worst["retained_kb"] = max(worst["retained_kb"], retained)
+    measured = [t.memory for t in traces if t.memory]
+    summary = {"stages": stages}
+    if measured:
+        summary["peak_kb"] = max(m["peak_kb"] for m in measured)
+        summary["growth_kb"] = round(measured[-1]["current_kb"] - measured[0]["current_kb"], 1)
+    return summary
+
+
+def _players(data, team):
+    return sorted(
+        (p.get("player_name"), p.get("hero"))
+        for p in (data.get(team) or {}).get("players", [])
+    )
+
+
+def compare_fields(expected, actual):
+    """Returns {field: True/False} for every compared field of one analysis."""
+    actual = actual or {}
+    t1e, t2e = expected.get("team1", {}), expected.get("team2", {})
+    t1a, t2a = actual.get("team1") or {}, actual.get("team2") or {}
+    return {
+        "map": expected.get("map") == actual.get("map"),
+        "result": expected.get("result") == actual.get("result"),
+        "gamemode": expected.get("gamemode") == actual.get("gamemode"),
+        "date": expected.get("date") == actual.get("date"),
+        "length": expected.get("length") == actual.get("length"),
+        "score": (t1e.get("score"), t2e.get("score")) == (t1a.get("score"), t2a.get("score")),
+        "sides": (t1e.get("side"), t2e.get("side")) == (t1a.get("side"), t2a.get("side")),
+        "players": (_players(expected, "team1"), _players(expected, "team2"))
+        == (_players(actual, "team1"), _players(actual, "team2")),
+    }
+
+
+def accuracy_summary(comparisons):
+    """Per-field accuracy and the share of analyses where every field matched."""
+    if not comparisons:
+        return {}
+    summary = {
+        field: round(sum(c[field] for c in comparisons) / len(comparisons), 4)
+        for field in COMPARED_FIELDS
+    }
+    summary["exact"] = round(sum(all(c.values()) for c in comparisons) / len(comparisons), 4)
+    return summary
+
+
+def print_latency_table(stages):
+    print(f"{'stage':<12} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, summary in stages.items():
+        if summary:
+            print(
+                f"{name:<12} {summary['count']:>6} {summary['p50']:>9.2f} {summary['p95']:>9.2f} "
+                f"{summary['p99']:>9.2f} {summary['max']:>9.2f}"
+            )
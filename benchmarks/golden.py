@@ -0,0 +1,158 @@
+"""
+Regression harness over a corpus of real scoreboard screenshots.
+
+The corpus is a directory of screenshots, each with an expected-output JSON file
+next to it (`game1.png` + `game1.json`, in the shape analyze_scoreboard()
+returns). Every screenshot is analyzed, each field is diffed against the
+expectation, and the run fails if accuracy drops below the minimum or if any
+stage exceeds its latency budget:
+
+    python -m benchmarks.golden path/to/corpus --budgets benchmarks/golden_budgets.json --report report.json
+
+Budgets are a JSON object of {"min_accuracy": {field: share}, "latency_ms":
+{stage: {"p95": ms, ...}}}. Exit code 0 means pass, 1 means a regression.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import pytesseract
+import tracing
+from benchmarks.common import (
+    COMPARED_FIELDS, stage_latencies, latency_summary, compare_fields, accuracy_summary,
+    print_latency_table,
+)
+from data_extraction.main_ocr import analyze_scoreboard
+from data_extraction.template_priors import use_in_memory_priors
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+DEFAULT_BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_budgets.json")
+
+
+def load_corpus(corpus_dir):
+    """Returns [(case name, image path, expected data)] for every screenshot with an expectation."""
+    cases = []
+    for file_name in sorted(os.listdir(corpus_dir)):
+        stem, ext = os.path.splitext(file_name)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        expected_path = os.path.join(corpus_dir, stem + ".json")
+        if not os.path.exists(expected_path):
+            logging.warning(f"Skipping {file_name}: no {stem}.json next to it.")
+            continue
+        with open(expected_path, "r") as f:
+            cases.append((stem, os.path.join(corpus_dir, file_name), json.load(f)))
+    return cases
+
+
+def diff_fields(expected, actual, comparison):
+    """The expected and actual value of every field that did not match."""
+    actual = actual or {}
+    flat = {
+        "score": lambda d: [(d.get("team1") or {}).get("score"), (d.get("team2") or {}).get("score")],
+        "sides": lambda d: [(d.get("team1") or {}).get("side"), (d.get("team2") or {}).get("side")],
+        "players": lambda d: [(d.get("team1") or {}).get("players", []), (d.get("team2") or {}).get("players", [])],
+    }
+    return {
+        field: {
+            "expected": flat[field](expected) if field in flat else expected.get(field),
+            "actual": flat[field](actual) if field in flat else actual.get(field),
+        }
+        for field, ok in comparison.items() if not ok
+    }
+
+
+def check_budgets(report, budgets):
+    """Returns a list of human-readable budget violations."""
+    violations = []
+    for field, minimum in budgets.get("min_accuracy", {}).items():
+        value = report["accuracy"].get(field)
+        if value is None or value < minimum:
+            violations.append(f"accuracy[{field}] = {value} < {minimum}")
+    for stage, limits in budgets.get("latency_ms", {}).items():
+        summary = report["latency_ms"].get(stage)
+        if not summary:
+            continue
+        for stat, limit in limits.items():
+            if summary.get(stat) is not None and summary[stat] > limit:
+                violations.append(f"latency[{stage}].{stat} = {summary[stat]}ms > {limit}ms")
+    return violations
+
+
+def run_golden(cases, known_players, budgets):
+    traces = []
+    collect = traces.append
+    tracing.add_trace_sink(collect)
+    results, comparisons = [], []
+    try:
+        for name, image_path, expected in cases:
+            actual = analyze_scoreboard(scoreboard_img_path=image_path, known_players=known_players)
+            comparison = compare_fields(expected, actual)
+            comparisons.append(comparison)
+            results.append({
+                "case": name,
+                "passed": all(comparison.values()),
+                "analysis_failed": actual is None,
+                "duration_ms": traces[-1].duration_ms if traces else None,
+                "diff": diff_fields(expected, actual, comparison),
+            })
+    finally:
+        tracing.remove_trace_sink(collect)
+
+    report = {
+        "cases": len(cases),
+        "accuracy": accuracy_summary(comparisons),
+        "latency_ms": {name: latency_summary(v) for name, v in stage_latencies(traces).items()},
+        "results": results,
+    }
+    report["violations"] = check_budgets(report, budgets)
+    report["passed"] = not report["violations"]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of screenshots with expected JSON files.")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS_PATH, help="Accuracy and latency budgets (JSON).")
+    parser.add_argument("--players", nargs="*", help="Tracked player names. Defaults to the ones in config.json.")
+    parser.add_argument("--report", help="Write the machine-readable JSON report to this file.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the pipeline's log output.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        print("Tesseract is not installed or not on the PATH; the OCR stages cannot run.")
+        return 2
+
+    cases = load_corpus(args.corpus)
+    if not cases:
+        print(f"No screenshots with expected JSON found in {args.corpus}.")
+        return 2
+    with open(args.budgets, "r") as f:
+        budgets = json.load(f)
+
+    use_in_memory_priors()
+    report = run_golden(cases, args.players, budgets)
+
+    for result in report["results"]:
+        if not result["passed"]:
+            print(f"FAIL {result['case']}: " + ", ".join(
+                f"{field} expected {d['expected']!r}, got {d['actual']!r}" for field, d in result["diff"].items()
+            ))
+    print(f"\n{report['cases']} cases, exact match {report['accuracy'].get('exact', 0):.1%}")
+    print("Accuracy: " + ", ".join(f"{k}={report['accuracy'][k]:.1%}" for k in COMPARED_FIELDS))
+    print_latency_table(report["latency_ms"])
+    for violation in report["violations"]:
+        print(f"BUDGET EXCEEDED: {violation}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
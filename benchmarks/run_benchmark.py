@@ -0,0 +1,121 @@
+"""
+End-to-end latency and accuracy benchmark on synthetic scoreboards.
+
+Runs fully offline on CPU (Tesseract must be installed and on the PATH):
+
+    python -m benchmarks.run_benchmark --frames 50 --seed 0 --output report.json
+
+With --memory, tracemalloc records peak and retained memory per stage instead
+(latencies are then inflated by the tracing overhead).
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import numpy as np
+import pytesseract
+import tracing
+from benchmarks.common import (
+    stage_latencies, latency_summary, compare_fields, accuracy_summary, print_latency_table,
+    memory_summary,
+)
+from benchmarks.synthetic import generate_scoreboard
+from data_extraction.main_ocr import analyze_scoreboard
+from data_extraction.template_priors import use_in_memory_priors
+from data_extraction.template_registry import get_templates
+
+
+def run_benchmark(frames, seed, known_players, warmup=1, profile_memory=False):
+    """Generates the frames, runs them through the pipeline and returns a report."""
+    rng = np.random.default_rng(seed)
+    samples = [generate_scoreboard(rng, known_players) for _ in range(frames + warmup)]
+
+    traces = []
+    collect = traces.append
+    tracing.add_trace_sink(collect)
+    if profile_memory:
+        tracing.set_memory_profiling(True)
+    comparisons, failures = [], 0
+    # Restarted after the warm-up frames below.
+    started = time.perf_counter()
+    try:
+        for i, (frame, truth) in enumerate(samples):
+            if i == warmup:
+                traces.clear()
+                started = time.perf_counter()
+            result = analyze_scoreboard(scoreboard_img=frame, known_players=known_players)
+            if i < warmup:
+                continue
+            if result is None:
+                failures += 1
+            comparisons.append(compare_fields(truth, result))
+        elapsed = time.perf_counter() - started
+    finally:
+        tracing.remove_trace_sink(collect)
+        if profile_memory:
+            tracing.set_memory_profiling(False)
+
+    report = {
+        "frames": frames,
+        "seed": seed,
+        "known_players": known_players,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_fps": round(frames / elapsed, 3) if elapsed > 0 else None,
+        "failed_analyses": failures,
+        "accuracy": accuracy_summary(comparisons),
+        "latency_ms": {name: latency_summary(v) for name, v in stage_latencies(traces).items()},
+    }
+    if profile_memory:
+        report["memory"] = memory_summary(traces)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=50, help="Number of measured frames.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the frame generator.")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured frames run first.")
+    parser.add_argument(
+        "--players", nargs="*",
+        help="Tracked player names. Defaults to every player with a name template.",
+    )
+    parser.add_argument("--memory", action="store_true", help="Profile peak and retained memory per stage.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the pipeline's log output.")
+    args = parser.parse_args(argv)
+    if args.frames < 1:
+        parser.error("--frames must be at least 1.")
+    if args.warmup < 0:
+        parser.error("--warmup can't be negative.")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+    try:
+        pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError:
+        print("Tesseract is not installed or not on the PATH; the OCR stages cannot run.")
+        return 2
+
+    use_in_memory_priors()
+    known_players = args.players or [name.upper() for name in get_templates("names")]
+    report = run_benchmark(args.frames, args.seed, known_players, args.warmup, args.memory)
+
+    print(f"\n{report['frames']} frames in {report['elapsed_s']}s ({report['throughput_fps']} frames/s), "
+          f"{report['failed_analyses']} failed analyses")
+    print("Accuracy: " + ", ".join(f"{k}={v:.1%}" for k, v in report["accuracy"].items()))
+    print_latency_table(report["latency_ms"])
+    if "memory" in report:
+        memory = report["memory"]
+        print(f"\nMemory: peak {memory.get('peak_kb')} KiB per analysis, "
+              f"growth over the run {memory.get('growth_kb')} KiB")
+        for name, stage in memory["stages"].items():
+            print(f"  {name:<12} peak {stage['peak_kb']:>10.1f} KiB  retained {stage['retained_kb']:>10.1f} KiB")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
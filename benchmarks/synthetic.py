@@ -0,0 +1,159 @@
+"""
+Composes synthetic 2560x1440 scoreboards from the shipped templates.
+
+The ROIs are the ones data_extraction/main_ocr.py crops, so the generated
+frames go through exactly the same crops as a real screenshot. Every frame comes
+with the ground truth in the same shape analyze_scoreboard() returns.
+"""
+import cv2
+import numpy as np
+from data_extraction.main_ocr import (
+    KNOWN_GAMEMODES, SYMMETRIC_MODES, ASYMMETRIC_MODES, TEAM_SIZE, ROI_COORDS,
+)
+from data_extraction.template_registry import get_templates
+
+FRAME_WIDTH, FRAME_HEIGHT = 2560, 1440
+
+BACKGROUND_COLOR = (38, 28, 22)
+TEXT_COLOR = (245, 244, 243)
+RESULT_COLORS = {"VICTORY": (60, 200, 240), "DEFEAT": (60, 60, 230), "DRAW": (200, 200, 200)}
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+DETAILS_FONT_SCALE = 0.75
+DETAILS_LINE_SPACING = 46
+# Names sit this far below the top of their hero portrait, relative to the ROIs.
+NAME_ROW_OFFSET = 25
+FILLER_NAMES = ["GUEST", "PLAYER", "ANON", "RANDOM", "VISITOR", "STRANGER", "NOBODY"]
+
+
+def _roi(frame, key):
+    x1, y1, x2, y2 = ROI_COORDS[key]
+    return frame[y1:y2, x1:x2]
+
+
+def _paste(dst, src, x, y):
+    """Pastes src into dst at (x, y), clipping anything that does not fit."""
+    h = min(src.shape[0], dst.shape[0] - y)
+    w = min(src.shape[1], dst.shape[1] - x)
+    if h > 0 and w > 0:
+        dst[y:y + h, x:x + w] = src[:h, :w]
+
+
+def _draw_map(frame, template, rng):
+    roi = _roi(frame, "map")
+    roi_h, roi_w = roi.shape[:2]
+    t_h, t_w = template.shape[:2]
+    if t_h >= roi_h and t_w >= roi_w:
+        # Large map art fills the whole panel; the matcher slides the ROI over it.
+        y = int(rng.integers(0, t_h - roi_h + 1))
+        x = int(rng.integers(0, t_w - roi_w + 1))
+        roi[:] = template[y:y + roi_h, x:x + roi_w]
+    else:
+        _paste(roi, template, int(rng.integers(0, max(1, roi_w - t_w))), int(rng.integers(0, max(1, roi_h - t_h))))
+
+
+def _slot_tops(roi_height, portrait_height):
+    spacing = (roi_height - portrait_height) // (TEAM_SIZE - 1)
+    return [i * spacing for i in range(TEAM_SIZE)]
+
+
+def _draw_team(frame, team, heroes, names, hero_templates, name_templates):
+    """Draws one team's hero column and the matching name column."""
+    hero_roi = _roi(frame, f"{team}_heroes")
+    name_roi = _roi(frame, f"{team}_names")
+    hero_y1 = ROI_COORDS[f"{team}_heroes"][1]
+    name_y1 = ROI_COORDS[f"{team}_names"][1]
+    portrait_h = max(hero_templates[h].shape[0] for h in heroes)
+    for hero, name, top in zip(heroes, names, _slot_tops(hero_roi.shape[0], portrait_h)):
+        _paste(hero_roi, hero_templates[hero], 2, top)
+        # Align the name row with the portrait in frame coordinates.
+        name_top = hero_y1 + top + NAME_ROW_OFFSET - name_y1
+        name_top = max(0, min(name_top, name_roi.shape[0] - 32))
+        template = name_templates.get(name.lower())
+        if template is not None:
+            _paste(name_roi, template, 6, name_top)
+        else:
+            cv2.putText(name_roi, name, (6, name_top + 24), FONT, 0.8, TEXT_COLOR, 2, cv2.LINE_AA)
+
+
+def _sides(gamemode, team1_score, team2_score, result):
+    if gamemode in SYMMETRIC_MODES:
+        return "attack", "attack"
+    if gamemode in ASYMMETRIC_MODES:
+        if team1_score > team2_score:
+            return "attack", "defense"
+        if team2_score > team1_score:
+            return "defense", "attack"
+        if result == "VICTORY":
+            return "defense", "attack"
+        if result == "DEFEAT":
+            return "attack", "defense"
+    return "unknown", "unknown"
+
+
+def generate_scoreboard(rng, known_players):
+    """
+    Renders one synthetic scoreboard. Returns (frame, ground_truth).
+    `known_players` are the tracked player names; the ones that have a name
+    template are placed on the scoreboard.
+    """
+    hero_templates = get_templates("heroes")
+    map_templates = get_templates("maps")
+    name_templates = get_templates("names")
+    frame = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    frame[:] = BACKGROUND_COLOR
+    noise = rng.integers(-6, 7, size=frame.shape, dtype=np.int16)
+    frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    # "default" is the dashboard fallback picture, not a real map.
+    map_name = str(rng.choice(sorted(n for n in map_templates if n != "default")))
+    _draw_map(frame, map_templates[map_name], rng)
+
+    gamemode = str(rng.choice(KNOWN_GAMEMODES))
+    result = str(rng.choice(list(RESULT_COLORS)))
+    team1_score, team2_score = (int(s) for s in rng.integers(0, 4, size=2))
+    length = f"{int(rng.integers(5, 25)):02d}:{int(rng.integers(0, 60)):02d}"
+    date = f"{int(rng.integers(1, 13)):02d}/{int(rng.integers(1, 29)):02d}/20{int(rng.integers(23, 27))}"
+
+    # Tracked players that we can render, split randomly across both teams.
+    renderable = [p for p in known_players if p.lower() in name_templates]
+    tracked = [str(p) for p in rng.permutation(renderable)] if renderable else []
+    tracked = tracked[:int(rng.integers(1, len(tracked) + 1))] if tracked else []
+    heroes = [str(h) for h in rng.choice(sorted(hero_templates), size=2 * TEAM_SIZE, replace=False)]
+    truth_teams = {}
+    for t, team in enumerate(("team1", "team2")):
+        team_heroes = heroes[t * TEAM_SIZE:(t + 1) * TEAM_SIZE]
+        team_names = [str(n) for n in rng.choice(FILLER_NAMES, size=TEAM_SIZE, replace=False)]
+        players = []
+        for i, player in enumerate(tracked):
+            if i % 2 == t:
+                slot = int(rng.integers(0, TEAM_SIZE))
+                while team_names[slot] in known_players:
+                    slot = (slot + 1) % TEAM_SIZE
+                team_names[slot] = player
+        for slot, name in enumerate(team_names):
+            if name in known_players:
+                players.append({"player_name": name, "hero": team_heroes[slot].title()})
+        _draw_team(frame, team, team_heroes, team_names, hero_templates, name_templates)
+        truth_teams[team] = players
+
+    result_roi = _roi(frame, "result")
+    cv2.putText(result_roi, result, (8, 52), FONT, 1.2, RESULT_COLORS[result], 3, cv2.LINE_AA)
+
+    details_roi = _roi(frame, "game_details")
+    lines = [
+        f"FINAL SCORE: {team1_score} VS {team2_score}",
+        f"GAME MODE: {gamemode}",
+        f"GAME LENGTH: {length}",
+        f"DATE: {date}",
+    ]
+    for i, line in enumerate(lines):
+        cv2.putText(details_roi, line, (4, 30 + i * DETAILS_LINE_SPACING), FONT, DETAILS_FONT_SCALE, TEXT_COLOR, 2, cv2.LINE_AA)
+
+    team1_side, team2_side = _sides(gamemode, team1_score, team2_score, result)
+    truth = {
+        "map": map_name, "gamemode": gamemode, "result": result,
+        "date": date, "length": length,
+        "team1": {"score": team1_score, "side": team1_side, "players": truth_teams["team1"]},
+        "team2": {"score": team2_score, "side": team2_side, "players": truth_teams["team2"]},
+    }
+    return frame, truth
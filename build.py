@@ -17,8 +17,12 @@ MAIN_SCRIPT = "run.py"
 # Format: "path/on/disk:path/in/executable"
 DATA_TO_INCLUDE = [
     
-    # All hero, map, and name templates
-    f"data_extraction/templates{os.pathsep}data_extraction/templates",
+    # Hero and map templates, pre-decoded into a single memory-mappable atlas
+    f"data_extraction/templates/template_atlas.npy{os.pathsep}data_extraction/templates",
+    f"data_extraction/templates/template_atlas.json{os.pathsep}data_extraction/templates",
+    f"data_extraction/templates/template_thresholds.json{os.pathsep}data_extraction/templates",
+    # Name templates stay loose files, since they are regenerated per user
+    f"data_extraction/templates/name_templates{os.pathsep}data_extraction/templates/name_templates",
     # The client secret for Google Sheets (if it exists)
     f"google_sheets_integration/client_secret.json{os.pathsep}google_sheets_integration",
     # The entire web app directory
@@ -57,10 +61,25 @@ PYINSTALLER_OPTIONS = [
 # -----------------------------------------------------------------------------
 
 
+def compile_templates():
+    """
+    Compiles all templates into the atlas that the bundled app memory-maps at
+    startup, so it does not have to decode every PNG on a cold start.
+    """
+    import logging
+    from data_extraction.template_atlas import compile_atlas
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print("--- Compiling template atlas ---")
+    compile_atlas()
+
+
 def build():
     """
     Runs the PyInstaller build process.
     """
+    compile_templates()
+
     command = [
         MAIN_SCRIPT,
         f"--name={EXE_NAME}",
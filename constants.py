@@ -25,16 +25,94 @@ TESSERACT_CMD_PATH = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 # You can find key names here: https://pynput.readthedocs.io/en/latest/keyboard.html#pynput.keyboard.Key
 HOTKEY = "f6"
 
-# The path where the screenshot will be saved
-# We save it in the user's home directory to avoid permission issues.
+# Maximum number of jobs waiting for the analysis worker. Hotkey presses that
+# arrive while a capture is already waiting are merged into it.
+WORK_QUEUE_SIZE = 4
+
+# --- WATCH MODE ---
+# Opt-in: sample the 'FINAL SCORE' region of the screen at a low rate and start
+# the analysis automatically when a scoreboard stays on screen. Can also be
+# toggled from the tray menu.
+WATCH_MODE_ENABLED = False
+WATCH_INTERVAL_SECONDS = 1.0
+# Consecutive positive samples needed before the analysis is triggered.
+WATCH_STABLE_SAMPLES = 3
+# Minimum seconds between two automatic analyses.
+WATCH_COOLDOWN_SECONDS = 60
+
+# --- WATCH FOLDERS ---
+# Directories where other tools (e.g. the game's own screenshot key) save
+# screenshots. New images there are analyzed and uploaded automatically.
+# Example: [os.path.join(os.path.expanduser("~"), "Documents", "Overwatch", "ScreenShots", "Overwatch")]
+WATCH_FOLDERS = []
+WATCH_FOLDER_POLL_SECONDS = 2.0
+# A new file is read only after its size and timestamp stayed unchanged this long.
+WATCH_FOLDER_SETTLE_SECONDS = 2.0
+# Screenshots already in the folders at startup are analyzed if they were not
+# processed yet and are at most this many days old (None: no age limit).
+WATCH_FOLDER_BACKLOG_DAYS = 7
+
+# Where screenshots are kept.
+# We save them in the user's home directory to avoid permission issues.
 SCREENSHOT_DIR = os.path.join(os.path.expanduser("~"), "OverwatchStatsOCR_Screenshots")
-SCREENSHOT_PATH = os.path.join(SCREENSHOT_DIR, "screenshot.png")
+# Every analyzed screenshot is kept in a content-addressed archive with an index
+# of its analysis results. The least recently used ones are removed once the
+# archive grows beyond SCREENSHOT_ARCHIVE_MAX_BYTES.
+SCREENSHOT_ARCHIVE_DIR = os.path.join(SCREENSHOT_DIR, "archive")
+SCREENSHOT_ARCHIVE_INDEX = os.path.join(SCREENSHOT_DIR, "archive.db")
+SCREENSHOT_ARCHIVE_MAX_BYTES = 2 * 1024 * 1024 * 1024
 
 # --- APPLICATION CONFIG FILES ---
 # We store user-generated config in the user's home directory.
 USER_DATA_DIR = os.path.join(os.path.expanduser("~"), "OverwatchStatsOCR_Data")
 CONFIG_FILE = os.path.join(USER_DATA_DIR, "config.json")
 TOKEN_FILE = os.path.join(USER_DATA_DIR, "token.json")
+# How often each map and hero was detected in past analyses. Used to scan the
+# most likely templates first.
+TEMPLATE_PRIORS_FILE = os.path.join(USER_DATA_DIR, "template_priors.json")
+# Downsampled 'FINAL SCORE' regions of analyzed scoreboards, used by watch mode.
+SCOREBOARD_SIGNATURES_FILE = os.path.join(USER_DATA_DIR, "scoreboard_signatures.npy")
+# Content hashes of screenshots from the watch folders that were already analyzed.
+PROCESSED_IMAGES_FILE = os.path.join(USER_DATA_DIR, "processed_images.txt")
+# Last Match ID written to the sheet and the row it went to, so uploads don't
+# have to read the whole Match ID column.
+MATCH_ID_COUNTER_FILE = os.path.join(USER_DATA_DIR, "match_id_counter.json")
+# Games waiting to be uploaded, see google_sheets_integration/outbox.py.
+OUTBOX_FILE = os.path.join(USER_DATA_DIR, "upload_outbox.db")
+# Local match database, used instead of the Google Sheet with "storage": "sqlite" in config.json.
+MATCH_DB_FILE = os.path.join(USER_DATA_DIR, "matches.db")
+
+# --- GOOGLE SHEET LAYOUT ---
+# The sheet's columns before the per-player "<player> Hero" and "<player> Role" columns.
+MATCH_COLUMNS = [
+    "Match ID", "Date", "Season", "Year", "Month", "Map", "Gamemode",
+    "Result", "Game Length", "Team 1 Score", "Team 1 Side",
+    "Team 2 Score", "Team 2 Side",
+]
+
+
+def sheet_columns(known_players):
+    """The header row of the sheet for the given players."""
+    columns = list(MATCH_COLUMNS)
+    for player in known_players:
+        columns.extend([f"{player} Hero", f"{player} Role"])
+    return columns
+
+
+# --- LOGGING ---
+LOG_DIR = os.path.join(os.path.expanduser("~"), "OverwatchStatsOCR_Logs")
+
+# --- TRACING ---
+# Set to True to write per-stage timings of every analysis as one JSON line to TRACE_FILE.
+TRACE_ENABLED = False
+TRACE_FILE = os.path.join(LOG_DIR, "traces.jsonl")
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+# Set to True to also record peak and retained memory per stage in every trace (uses tracemalloc, slow).
+MEMORY_PROFILING_ENABLED = False
+# When this environment variable names a file, run.py appends its startup
+# milestones to it and exits once it is fully started (used by benchmarks/cold_start.py).
+STARTUP_PROBE_ENV = "OVERWATCH_STATS_STARTUP_PROBE"
 
 # --- DEBUGGING ---
 # Set to True to save a debug image with ROIs drawn on it.
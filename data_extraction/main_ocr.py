@@ -3,13 +3,24 @@ import numpy as np
 import os
 import pytesseract
 import json
+import hashlib
 import re
 import logging
+import threading
 from thefuzz import fuzz
-from constants import resource_path, TESSERACT_CMD_PATH, CONFIG_FILE
-
-# If a Tesseract path is specified in constants, set it
-if TESSERACT_CMD_PATH:
+import tracing
+from constants import resource_path, TESSERACT_CMD_PATH, CONFIG_FILE, DEBUG_MODE
+from data_extraction.template_thresholds import get_set_thresholds
+from data_extraction.template_priors import order_by_prior, record_detections
+from data_extraction.template_registry import get_templates
+from data_extraction.scoreboard_detector import SCOREBOARD_SIZE, crop_validator_region
+from data_extraction.ocr_preprocessing import (
+    preprocess_for_ocr, tesseract_config, filter_to_whitelist, DETAILS_BLOCK_HEIGHT, OCR_WHITELISTS,
+)
+
+# If a Tesseract path is specified in constants and exists on this machine, set it.
+# Otherwise pytesseract falls back to the tesseract found on the PATH.
+if TESSERACT_CMD_PATH and os.path.exists(TESSERACT_CMD_PATH):
     pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
 
 # --- CONFIGURATION ---
@@ -27,6 +38,26 @@ MAP_CONFIDENCE_THRESHOLD = 0.80
 HERO_DETECTION_THRESHOLD = 0.70
 NAME_DETECTION_THRESHOLD = 0.85
 RESULT_SIMILARITY_THRESHOLD = 75
+TEAM_SIZE = 5
+# Bump when the OCR preprocessing or parsing changes, so cached OCR results of
+# archived screenshots are recomputed by reprocess.py.
+OCR_STAGE_VERSION = 1
+# Same for the hero detection logic.
+HERO_STAGE_VERSION = 2
+# Upper bound on the number of distinct result-buffer shapes kept per thread.
+MAX_MATCH_BUFFERS = 64
+
+# Regions of a 2560x1440 scoreboard: (x1, y1, x2, y2)
+ROI_COORDS = {
+    "map": (1515, 291, 2205, 738), "result": (1556, 773, 1770, 847),
+    "game_details": (1550, 845, 1950, 1050), "team1_names": (479, 336, 713, 743),
+    "team1_heroes": (390, 328, 477, 744), "team2_names": (477, 868, 778, 1279),
+    "team2_heroes": (385, 849, 483, 1288),
+}
+
+# Correlation result buffers, reused across templates and analyses so the
+# tray app's memory stays flat. One set per thread, keyed by result shape.
+_match_buffers = threading.local()
 
 
 def load_known_players():
@@ -39,7 +70,36 @@ def load_known_players():
         return config.get("known_players", [])
 
 
-def find_heroes_in_roi(roi, hero_templates, threshold):
+def match_template(image, template):
+    """
+    cv2.matchTemplate(TM_CCOEFF_NORMED) writing into a reused float32 buffer.
+    The returned array is only valid until the next call with the same
+    result shape on this thread.
+    """
+    ih, iw = image.shape[:2]
+    th, tw = template.shape[:2]
+    # OpenCV swaps image and template if the template is the larger one.
+    shape = (abs(ih - th) + 1, abs(iw - tw) + 1)
+    buffers = getattr(_match_buffers, "by_shape", None)
+    if buffers is None or len(buffers) > MAX_MATCH_BUFFERS:
+        buffers = _match_buffers.by_shape = {}
+    buffer = buffers.get(shape)
+    if buffer is None:
+        buffer = buffers[shape] = np.empty(shape, dtype=np.float32)
+    return cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED, result=buffer)
+
+
+def find_heroes_in_roi(roi, hero_templates, threshold, thresholds=None):
+    """
+    Finds hero portraits in a team's hero column. `thresholds` holds optional
+    per-template "accept" and "early_exit" scores. Each portrait position keeps
+    the best-scoring template, so a common hero scanned first can't take the
+    slot of a better match scanned later. Once a full team is detected and
+    every detection is above its early-exit score, the remaining templates are
+    skipped.
+    """
+    accept = thresholds["accept"] if thresholds else {}
+    early_exit = thresholds["early_exit"] if thresholds else {}
     found_heroes = []
     roi_h, roi_w = roi.shape[:2]
     for name, template in hero_templates.items():
@@ -48,34 +108,48 @@ def find_heroes_in_roi(roi, hero_templates, threshold):
         templ_h, templ_w = template.shape[:2]
         if templ_h > roi_h or templ_w > roi_w:
             continue
-        res = cv2.matchTemplate(roi, template, cv2.TM_CCOEFF_NORMED)
+        res = match_template(roi, template)
         _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(res)
-        logging.debug(f"  - Checking for {name:<12} | Best match score: {max_val:.2f}")
-        if max_val >= threshold:
-            if all(
-                abs(max_loc[0] - ex) > 20 or abs(max_loc[1] - ey) > 20
-                for _, ex, ey, _ in found_heroes
-            ):
-                found_heroes.append((name, max_loc[0], max_loc[1], max_val))
-                logging.info(
-                    f"    └──> DETECTED {name} at ({max_loc[0]}, {max_loc[1]}) with score {max_val:.2f}"
-                )
+        logging.debug("  - Checking for %-12s | Best match score: %.2f", name, max_val)
+        if max_val < accept.get(name, threshold):
+            continue
+        slot = next((
+            i for i, (_, ex, ey, _) in enumerate(found_heroes)
+            if abs(max_loc[0] - ex) <= 20 and abs(max_loc[1] - ey) <= 20
+        ), None)
+        detection = (name, max_loc[0], max_loc[1], max_val)
+        if slot is None:
+            found_heroes.append(detection)
+        elif max_val > found_heroes[slot][3]:
+            logging.info(f"    └──> {name} replaces {found_heroes[slot][0]} ({found_heroes[slot][3]:.2f})")
+            found_heroes[slot] = detection
+        else:
+            continue
+        logging.info(f"    └──> DETECTED {name} at ({max_loc[0]}, {max_loc[1]}) with score {max_val:.2f}")
+        if len(found_heroes) >= TEAM_SIZE and all(
+            hero in early_exit and score >= early_exit[hero] for hero, _, _, score in found_heroes
+        ):
+            logging.info("    └──> Full team detected unambiguously, skipping remaining templates.")
+            break
     return found_heroes
 
 
-def find_known_players_in_roi(roi, name_templates, threshold):
+def find_known_players_in_roi(roi, name_templates, threshold, thresholds=None):
+    accept = thresholds["accept"] if thresholds else {}
     found_players = []
     roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
     for name, template in name_templates.items():
         if template is None:
             logging.warning(f"  - Skipping template for '{name}' as it could not be loaded.")
             continue
-        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        # The registry hands out pre-converted grayscale name templates.
+        template_gray = template if template.ndim == 2 else cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
         w, h = template_gray.shape[::-1]
-        res = cv2.matchTemplate(roi_gray, template_gray, cv2.TM_CCOEFF_NORMED)
+        name_threshold = accept.get(name.lower(), threshold)
+        res = match_template(roi_gray, template_gray)
         _min_val, max_val, _min_loc, _max_loc = cv2.minMaxLoc(res)
-        logging.debug(f"  - Checking for '{name:<12}' | Best match score: {max_val:.2f}")
-        locs = np.where(res >= threshold)
+        logging.debug("  - Checking for '%-12s' | Best match score: %.2f", name, max_val)
+        locs = np.where(res >= name_threshold)
         detections = [(pt[0], pt[1], res[pt[1], pt[0]]) for pt in zip(*locs[::-1])]
         suppressed_detections = []
         detections.sort(key=lambda x: x[2], reverse=True)
@@ -88,30 +162,36 @@ def find_known_players_in_roi(roi, name_templates, threshold):
         for x, y, score in suppressed_detections:
             found_players.append({"name": name, "y": y, "x": x, "score": score})
             logging.info(
-                f"    └──> DETECTED {name} at ({x}, {y}) with score {score:.2f} (Threshold: {threshold})"
+                f"    └──> DETECTED {name} at ({x}, {y}) with score {score:.2f} (Threshold: {name_threshold})"
             )
     return found_players
 
 
-def find_best_map_match(map_roi, map_templates, threshold):
+def find_best_map_match(map_roi, map_templates, threshold, thresholds=None):
+    accept = thresholds["accept"] if thresholds else {}
+    early_exit = thresholds["early_exit"] if thresholds else {}
     best_match_score, best_match_name = -1, "Unknown"
     logging.info("--- MAP DETECTION ---")
     for name, template in map_templates.items():
         if template is None:
             continue
-        res = cv2.matchTemplate(map_roi, template, cv2.TM_CCOEFF_NORMED)
+        res = match_template(map_roi, template)
         _, max_val, _, _ = cv2.minMaxLoc(res)
-        logging.debug(f"  - Checking for {name:<20} | Confidence: {max_val:.2f}")
+        logging.debug("  - Checking for %-20s | Confidence: %.2f", name, max_val)
         if max_val > best_match_score:
             best_match_score, best_match_name = max_val, name
-    if best_match_score >= threshold:
+        if name in early_exit and max_val >= early_exit[name]:
+            logging.info(f"  - {name} is above its early-exit score, skipping remaining templates.")
+            break
+    best_match_threshold = accept.get(best_match_name, threshold)
+    if best_match_score >= best_match_threshold:
         logging.info(
             f"└──> Best Match Found: {best_match_name} (Score: {best_match_score:.2f})"
         )
         return best_match_name
     else:
         logging.warning(
-            f"└──> No map found above threshold {threshold}. Best attempt was {best_match_name} (Score: {best_match_score:.2f})"
+            f"└──> No map found above threshold {best_match_threshold}. Best attempt was {best_match_name} (Score: {best_match_score:.2f})"
         )
         return "Unknown"
 
@@ -123,18 +203,18 @@ def is_scoreboard_image(image):
     """
     try:
         # A tight ROI around where 'FINAL SCORE' is expected
-        # Adjusted Y-coordinates by -50px based on user feedback.
-        validator_roi_coords = (1550, 850, 1800, 890)
-        roi = image[
-            validator_roi_coords[1] : validator_roi_coords[3],
-            validator_roi_coords[0] : validator_roi_coords[2],
-        ]
+        roi = crop_validator_region(image)
         # --- DEBUG: Save the ROI to a file ---
-        cv2.imwrite("debug_validator_roi.png", roi)
-        logging.info("Saved validation ROI to debug_validator_roi.png")
+        if DEBUG_MODE:
+            cv2.imwrite("debug_validator_roi.png", roi)
+            logging.info("Saved validation ROI to debug_validator_roi.png")
         # --- END DEBUG ---
-        gray_roi = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
-        text = pytesseract.image_to_string(gray_roi, config="--psm 7").strip().upper()
+        ocr_img = preprocess_for_ocr(roi)
+        if ocr_img is None:
+            logging.info("--- SCOREBOARD VALIDATION ---")
+            logging.info("  - No text found in validator region.")
+            return False
+        text = pytesseract.image_to_string(ocr_img, config=tesseract_config(7, "validator")).strip().upper()
         confidence = fuzz.partial_ratio("FINAL SCORE", text)
 
         logging.info("--- SCOREBOARD VALIDATION ---")
@@ -147,68 +227,99 @@ def is_scoreboard_image(image):
         return False
 
 
-def analyze_scoreboard(scoreboard_img_path):
+def warm_up():
     """
-    Analyzes an Overwatch scoreboard screenshot to extract game data.
+    Pays the one-time costs of the first analysis up front: decodes or maps the
+    templates, runs every matcher once on a blank frame (so OpenCV and the match
+    buffers are initialized) and runs Tesseract once on a rendered line of text
+    so its binary and language data are loaded from disk.
+    A blank frame would stop at the validation step, so the stages are run
+    directly instead of through analyze_scoreboard().
     """
-    if not os.path.exists(scoreboard_img_path):
-        logging.error(f"Scoreboard image not found at {scoreboard_img_path}")
-        return None
-    scoreboard_img = cv2.imread(scoreboard_img_path)
-    if scoreboard_img is None:
-        logging.error(f"Could not read image file {scoreboard_img_path}")
-        return None
+    frame = np.zeros((SCOREBOARD_SIZE[1], SCOREBOARD_SIZE[0], 3), dtype=np.uint8)
+
+    def roi(key):
+        x1, y1, x2, y2 = ROI_COORDS[key]
+        return frame[y1:y2, x1:x2]
+
+    map_templates = get_templates("maps")
+    hero_templates = get_templates("heroes")
+    name_templates = get_templates("names", "gray")
+    find_best_map_match(roi("map"), map_templates, MAP_CONFIDENCE_THRESHOLD, get_set_thresholds("maps"))
+    find_heroes_in_roi(roi("team1_heroes"), hero_templates, HERO_DETECTION_THRESHOLD, get_set_thresholds("heroes"))
+    find_known_players_in_roi(roi("team1_names"), name_templates, NAME_DETECTION_THRESHOLD, get_set_thresholds("names"))
+
+    text_img = np.zeros((40, 250, 3), dtype=np.uint8)
+    cv2.putText(text_img, "FINAL SCORE", (4, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 255, 255), 2, cv2.LINE_AA)
+    ocr_img = preprocess_for_ocr(text_img)
+    try:
+        pytesseract.image_to_string(ocr_img, config=tesseract_config(7, "validator"))
+    except Exception as e:
+        logging.warning(f"Tesseract could not be run during warm-up: {e}")
 
-    if not is_scoreboard_image(scoreboard_img):
-        logging.warning("Validation failed. Image is not a valid scoreboard. Aborting analysis.")
-        return None
-    logging.info("Validation successful. Proceeding with full analysis.")
 
-    KNOWN_PLAYERS = load_known_players()
-    if not KNOWN_PLAYERS:
-        return None
+def _short_hash(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
 
-    map_templates = {
-        os.path.basename(p).split(".")[0]: cv2.imread(os.path.join(MAP_TEMPLATES_PATH, p))
-        for p in os.listdir(MAP_TEMPLATES_PATH) if p.endswith(".png")
-    }
-    hero_templates = {
-        os.path.basename(p).split(".")[0]: cv2.imread(os.path.join(HERO_TEMPLATES_PATH, p))
-        for p in os.listdir(HERO_TEMPLATES_PATH) if p.endswith(".png")
-    }
-    name_templates = {
-        name: cv2.imread(os.path.join(NAME_TEMPLATES_PATH, f"{name.lower()}.png"))
-        for name in KNOWN_PLAYERS
-    }
 
-    roi_coords = {
-        "map": (1515, 291, 2205, 738), "result": (1556, 773, 1770, 847),
-        "game_details": (1550, 845, 1950, 1050), "team1_names": (479, 336, 713, 743),
-        "team1_heroes": (390, 328, 477, 744), "team2_names": (477, 868, 778, 1279),
-        "team2_heroes": (385, 849, 483, 1288),
+def stage_versions(known_players):
+    """
+    A short hash of everything each cacheable stage depends on besides the
+    image: the template set, its per-template thresholds and the detection
+    parameters (and the tracked players for names). A stage result cached
+    under the same version can be reused as is.
+    """
+    from data_extraction.template_registry import template_set_version
+    ocr_version = _short_hash([OCR_STAGE_VERSION, OCR_WHITELISTS, RESULT_SIMILARITY_THRESHOLD, KNOWN_GAMEMODES])
+    return {
+        "validation": ocr_version,
+        "map": _short_hash([template_set_version("maps"), get_set_thresholds("maps"), MAP_CONFIDENCE_THRESHOLD]),
+        "heroes": _short_hash([
+            HERO_STAGE_VERSION, template_set_version("heroes"), get_set_thresholds("heroes"), HERO_DETECTION_THRESHOLD,
+        ]),
+        "names": _short_hash([
+            template_set_version("names"), get_set_thresholds("names"), NAME_DETECTION_THRESHOLD, sorted(known_players),
+        ]),
+        "ocr": ocr_version,
     }
 
-    ROI_MAP = scoreboard_img[roi_coords["map"][1]:roi_coords["map"][3], roi_coords["map"][0]:roi_coords["map"][2]]
-    ROI_HEROES_1 = scoreboard_img[roi_coords["team1_heroes"][1]:roi_coords["team1_heroes"][3], roi_coords["team1_heroes"][0]:roi_coords["team1_heroes"][2]]
-    ROI_HEROES_2 = scoreboard_img[roi_coords["team2_heroes"][1]:roi_coords["team2_heroes"][3], roi_coords["team2_heroes"][0]:roi_coords["team2_heroes"][2]]
-    ROI_RESULT = scoreboard_img[roi_coords["result"][1]:roi_coords["result"][3], roi_coords["result"][0]:roi_coords["result"][2]]
-    ROI_GAME_DETAILS = scoreboard_img[roi_coords["game_details"][1]:roi_coords["game_details"][3], roi_coords["game_details"][0]:roi_coords["game_details"][2]]
-    ROI_TEAM1_NAMES = scoreboard_img[roi_coords["team1_names"][1]:roi_coords["team1_names"][3], roi_coords["team1_names"][0]:roi_coords["team1_names"][2]]
-    ROI_TEAM2_NAMES = scoreboard_img[roi_coords["team2_names"][1]:roi_coords["team2_names"][3], roi_coords["team2_names"][0]:roi_coords["team2_names"][2]]
 
-    detected_map = find_best_map_match(ROI_MAP, map_templates, MAP_CONFIDENCE_THRESHOLD)
+def _run_stage(stage_cache, versions, stage, compute, cacheable=None):
+    """
+    Returns the cached result of a stage if its version matches, otherwise
+    computes it and caches it (unless `cacheable(result)` says otherwise).
+    """
+    if stage_cache is not None:
+        found, value = stage_cache.get(stage, versions[stage])
+        if found:
+            logging.info(f"--- Reusing cached '{stage}' result ---")
+            return value
+    value = compute()
+    if stage_cache is not None and (cacheable is None or cacheable(value)):
+        stage_cache.put(stage, versions[stage], value)
+    return value
+
+
+def analyze_scoreboard(scoreboard_img_path=None, scoreboard_img=None, known_players=None, stage_cache=None):
+    """
+    Analyzes an Overwatch scoreboard screenshot to extract game data.
+    The screenshot is either read from `scoreboard_img_path` or passed in as an
+    already decoded BGR array. `known_players` defaults to the ones in config.json.
+    With a `stage_cache` (see screenshot_archive.StageCache), the results of
+    stages whose inputs did not change since the last run are reused.
+    """
+    with tracing.trace("analysis"):
+        return _analyze_scoreboard(scoreboard_img_path, scoreboard_img, known_players, stage_cache)
 
-    logging.info("--- TEAM 1 HERO DETECTION ---")
-    team1_heroes_found = find_heroes_in_roi(ROI_HEROES_1, hero_templates, HERO_DETECTION_THRESHOLD)
-    logging.info("--- TEAM 2 HERO DETECTION ---")
-    team2_heroes_found = find_heroes_in_roi(ROI_HEROES_2, hero_templates, HERO_DETECTION_THRESHOLD)
-    team1_heroes_sorted = sorted(team1_heroes_found, key=lambda item: item[2])
-    team2_heroes_sorted = sorted(team2_heroes_found, key=lambda item: item[2])
 
+def _read_result(roi):
     logging.info("--- TEXT RECOGNITION (OCR for Game Result) ---")
     match_result = "UNKNOWN"
     try:
-        result_text = pytesseract.image_to_string(ROI_RESULT, config="--psm 7").strip().upper()
+        result_img = preprocess_for_ocr(roi, color_key="bright")
+        result_text = ""
+        if result_img is not None:
+            result_text = pytesseract.image_to_string(result_img, config=tesseract_config(7, "result")).strip().upper()
         scores = {
             "VICTORY": fuzz.ratio(result_text, "VICTORY"), "DEFEAT": fuzz.ratio(result_text, "DEFEAT"),
             "DRAW": fuzz.ratio(result_text, "DRAW"),
@@ -222,33 +333,116 @@ def analyze_scoreboard(scoreboard_img_path):
     except Exception:
         logging.error("OCR FAILED for result.", exc_info=True)
         match_result = "OCR_FAILED"
+    return match_result
 
+
+def _read_details(roi):
     logging.info("--- TEXT RECOGNITION (OCR for Game Details) ---")
-    detected_gamemode, game_length, game_date = "Unknown", "Unknown", "Unknown"
-    team1_score, team2_score = -1, -1
+    details = {"gamemode": "Unknown", "length": "Unknown", "date": "Unknown", "team1_score": -1, "team2_score": -1}
     try:
-        gray_details = cv2.cvtColor(ROI_GAME_DETAILS, cv2.COLOR_BGR2GRAY)
-        details_text = pytesseract.image_to_string(gray_details, config="--psm 6").strip().upper()
-        logging.debug(f"  - Raw OCR for Details:\n---\n{details_text}\n---")
+        details_img = preprocess_for_ocr(roi, target_height=DETAILS_BLOCK_HEIGHT)
+        details_text = ""
+        if details_img is not None:
+            details_text = pytesseract.image_to_string(details_img, config=tesseract_config(6, "game_details")).strip().upper()
+        logging.debug("  - Raw OCR for Details:\n---\n%s\n---", details_text)
         lines = [line.strip() for line in details_text.split("\n") if line.strip()]
         for line in lines:
             if "FINAL SCORE" in line:
                 score_match = re.search(r"(\d+)\s*VS\s*(\d+)", line)
                 if score_match:
-                    team1_score, team2_score = int(score_match.group(1)), int(score_match.group(2))
+                    details["team1_score"], details["team2_score"] = int(score_match.group(1)), int(score_match.group(2))
             elif "GAME MODE" in line:
-                value = line.split(":", 1)[-1]
+                value = filter_to_whitelist(line.split(":", 1)[-1], "mode")
                 for mode in KNOWN_GAMEMODES:
                     if mode in value:
-                        detected_gamemode = mode
+                        details["gamemode"] = mode
                         break
             elif "GAME LENGTH" in line:
-                game_length = line.split(":", 1)[-1].strip()
+                details["length"] = filter_to_whitelist(line.split(":", 1)[-1], "length")
             elif "DATE" in line:
-                game_date = line.split(":", 1)[-1].strip()
-        logging.info(f"  - Gamemode: {detected_gamemode}, Score: {team1_score}-{team2_score}, Length: {game_length}, Date: {game_date}")
+                details["date"] = filter_to_whitelist(line.split(":", 1)[-1], "date")
+        logging.info(
+            f"  - Gamemode: {details['gamemode']}, Score: {details['team1_score']}-{details['team2_score']}, "
+            f"Length: {details['length']}, Date: {details['date']}"
+        )
     except Exception:
         logging.error("OCR FAILED for game details.", exc_info=True)
+        # Not a reading of the image, so the stage result must not be cached.
+        details["details_failed"] = True
+    return details
+
+
+def _analyze_scoreboard(scoreboard_img_path, scoreboard_img, known_players, stage_cache):
+    if scoreboard_img is None:
+        if not scoreboard_img_path or not os.path.exists(scoreboard_img_path):
+            logging.error(f"Scoreboard image not found at {scoreboard_img_path}")
+            return None
+        with tracing.span("load"):
+            scoreboard_img = cv2.imread(scoreboard_img_path)
+        if scoreboard_img is None:
+            logging.error(f"Could not read image file {scoreboard_img_path}")
+            return None
+
+    KNOWN_PLAYERS = known_players if known_players is not None else load_known_players()
+    versions = stage_versions(KNOWN_PLAYERS) if stage_cache is not None else None
+
+    with tracing.span("validation"):
+        is_scoreboard = _run_stage(stage_cache, versions, "validation", lambda: is_scoreboard_image(scoreboard_img))
+    if not is_scoreboard:
+        logging.warning("Validation failed. Image is not a valid scoreboard. Aborting analysis.")
+        tracing.annotate(status="not_a_scoreboard")
+        return None
+    logging.info("Validation successful. Proceeding with full analysis.")
+
+    if not KNOWN_PLAYERS:
+        return None
+
+    # Scan the most frequently seen maps and heroes first, so the matchers can
+    # usually exit early after a handful of templates.
+    with tracing.span("templates"):
+        map_templates = order_by_prior(get_templates("maps"), "maps")
+        hero_templates = order_by_prior(get_templates("heroes"), "heroes")
+        all_name_templates = get_templates("names", "gray")
+        name_templates = {name: all_name_templates.get(name.lower()) for name in KNOWN_PLAYERS}
+
+    roi_coords = ROI_COORDS
+
+    ROI_MAP = scoreboard_img[roi_coords["map"][1]:roi_coords["map"][3], roi_coords["map"][0]:roi_coords["map"][2]]
+    ROI_HEROES_1 = scoreboard_img[roi_coords["team1_heroes"][1]:roi_coords["team1_heroes"][3], roi_coords["team1_heroes"][0]:roi_coords["team1_heroes"][2]]
+    ROI_HEROES_2 = scoreboard_img[roi_coords["team2_heroes"][1]:roi_coords["team2_heroes"][3], roi_coords["team2_heroes"][0]:roi_coords["team2_heroes"][2]]
+    ROI_RESULT = scoreboard_img[roi_coords["result"][1]:roi_coords["result"][3], roi_coords["result"][0]:roi_coords["result"][2]]
+    ROI_GAME_DETAILS = scoreboard_img[roi_coords["game_details"][1]:roi_coords["game_details"][3], roi_coords["game_details"][0]:roi_coords["game_details"][2]]
+    ROI_TEAM1_NAMES = scoreboard_img[roi_coords["team1_names"][1]:roi_coords["team1_names"][3], roi_coords["team1_names"][0]:roi_coords["team1_names"][2]]
+    ROI_TEAM2_NAMES = scoreboard_img[roi_coords["team2_names"][1]:roi_coords["team2_names"][3], roi_coords["team2_names"][0]:roi_coords["team2_names"][2]]
+
+    with tracing.span("map"):
+        detected_map = _run_stage(stage_cache, versions, "map", lambda: find_best_map_match(
+            ROI_MAP, map_templates, MAP_CONFIDENCE_THRESHOLD, get_set_thresholds("maps")
+        ))
+
+    def detect_heroes():
+        hero_thresholds = get_set_thresholds("heroes")
+        teams = []
+        for team, roi in (("1", ROI_HEROES_1), ("2", ROI_HEROES_2)):
+            logging.info(f"--- TEAM {team} HERO DETECTION ---")
+            found = find_heroes_in_roi(roi, hero_templates, HERO_DETECTION_THRESHOLD, hero_thresholds)
+            # Plain Python types, so the result can be cached as JSON.
+            teams.append([[name, int(x), int(y), float(score)] for name, x, y, score in found])
+        return teams
+
+    with tracing.span("heroes"):
+        team1_heroes_found, team2_heroes_found = _run_stage(stage_cache, versions, "heroes", detect_heroes)
+    team1_heroes_sorted = sorted(team1_heroes_found, key=lambda item: item[2])
+    team2_heroes_sorted = sorted(team2_heroes_found, key=lambda item: item[2])
+
+    with tracing.span("ocr"):
+        # A failed Tesseract run is not cached, so it is retried next time.
+        ocr = _run_stage(stage_cache, versions, "ocr", lambda: {
+            "result": _read_result(ROI_RESULT), **_read_details(ROI_GAME_DETAILS),
+        }, cacheable=lambda value: value["result"] != "OCR_FAILED" and not value.get("details_failed"))
+    match_result = ocr["result"]
+    detected_gamemode, game_length, game_date = ocr["gamemode"], ocr["length"], ocr["date"]
+    team1_score, team2_score = ocr["team1_score"], ocr["team2_score"]
 
     team1_side, team2_side = "unknown", "unknown"
     if detected_gamemode in SYMMETRIC_MODES:
@@ -260,11 +454,20 @@ def analyze_scoreboard(scoreboard_img_path):
             if match_result == "VICTORY": team1_side, team2_side = "defense", "attack"
             elif match_result == "DEFEAT": team1_side, team2_side = "attack", "defense"
 
-    logging.info("--- PLAYER NAME DETECTION (Template Matching) ---")
-    logging.info("--- Detecting in Team 1 ---")
-    team1_players_found = find_known_players_in_roi(ROI_TEAM1_NAMES, name_templates, NAME_DETECTION_THRESHOLD)
-    logging.info("--- Detecting in Team 2 ---")
-    team2_players_found = find_known_players_in_roi(ROI_TEAM2_NAMES, name_templates, NAME_DETECTION_THRESHOLD)
+    def detect_names():
+        logging.info("--- PLAYER NAME DETECTION (Template Matching) ---")
+        name_thresholds = get_set_thresholds("names")
+        teams = []
+        for team, roi in (("1", ROI_TEAM1_NAMES), ("2", ROI_TEAM2_NAMES)):
+            logging.info(f"--- Detecting in Team {team} ---")
+            found = find_known_players_in_roi(roi, name_templates, NAME_DETECTION_THRESHOLD, name_thresholds)
+            teams.append([
+                {"name": p["name"], "y": int(p["y"]), "x": int(p["x"]), "score": float(p["score"])} for p in found
+            ])
+        return teams
+
+    with tracing.span("names"):
+        team1_players_found, team2_players_found = _run_stage(stage_cache, versions, "names", detect_names)
     team1_players_sorted = sorted(team1_players_found, key=lambda p: p["y"])
     team2_players_sorted = sorted(team2_players_found, key=lambda p: p["y"])
 
@@ -276,8 +479,13 @@ def analyze_scoreboard(scoreboard_img_path):
         if match_result == "UNKNOWN": logging.warning("Reason: Match result could not be determined.")
         if not known_players_found: logging.warning("Reason: No known players were found.")
         logging.warning("--- Analysis aborted, no data will be returned. ---")
+        tracing.annotate(status="validation_failed")
         return None
     logging.info("--- Validation successful, proceeding with data assembly. ---")
+    record_detections({
+        "maps": [detected_map],
+        "heroes": [h[0] for h in team1_heroes_found + team2_heroes_found],
+    })
 
     final_data = {
         "map": detected_map, "gamemode": detected_gamemode, "result": match_result,
@@ -286,23 +494,26 @@ def analyze_scoreboard(scoreboard_img_path):
         "team2": {"score": team2_score, "side": team2_side, "players": []},
     }
 
-    logging.info("--- Pairing Players with Heroes ---")
-    available_heroes_1 = list(team1_heroes_sorted)
-    for player in team1_players_sorted:
-        if not available_heroes_1: break
-        closest_hero = min(available_heroes_1, key=lambda h: abs(h[2] - player["y"]))
-        final_data["team1"]["players"].append({"player_name": player["name"], "hero": closest_hero[0].title()})
-        available_heroes_1.remove(closest_hero)
-        logging.debug(f"  - Team 1: Paired {player['name']} (y={player['y']}) with {closest_hero[0]} (y={closest_hero[2]}) ")
-
-    available_heroes_2 = list(team2_heroes_sorted)
-    for player in team2_players_sorted:
-        if not available_heroes_2: break
-        closest_hero = min(available_heroes_2, key=lambda h: abs(h[2] - player["y"]))
-        final_data["team2"]["players"].append({"player_name": player["name"], "hero": closest_hero[0].title()})
-        available_heroes_2.remove(closest_hero)
-        logging.debug(f"  - Team 2: Paired {player['name']} (y={player['y']}) with {closest_hero[0]} (y={closest_hero[2]}) ")
+    with tracing.span("pairing"):
+        logging.info("--- Pairing Players with Heroes ---")
+        available_heroes_1 = list(team1_heroes_sorted)
+        for player in team1_players_sorted:
+            if not available_heroes_1: break
+            closest_hero = min(available_heroes_1, key=lambda h: abs(h[2] - player["y"]))
+            final_data["team1"]["players"].append({"player_name": player["name"], "hero": closest_hero[0].title()})
+            available_heroes_1.remove(closest_hero)
+            logging.debug("  - Team 1: Paired %s (y=%s) with %s (y=%s)", player["name"], player["y"], closest_hero[0], closest_hero[2])
+
+        available_heroes_2 = list(team2_heroes_sorted)
+        for player in team2_players_sorted:
+            if not available_heroes_2: break
+            closest_hero = min(available_heroes_2, key=lambda h: abs(h[2] - player["y"]))
+            final_data["team2"]["players"].append({"player_name": player["name"], "hero": closest_hero[0].title()})
+            available_heroes_2.remove(closest_hero)
+            logging.debug("  - Team 2: Paired %s (y=%s) with %s (y=%s)", player["name"], player["y"], closest_hero[0], closest_hero[2])
 
     logging.info("--- EXTRACTION COMPLETE ---")
-    logging.debug(f"Final structured data: {json.dumps(final_data, indent=2)}")
+    tracing.annotate(status="ok")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Final structured data: %s", json.dumps(final_data, indent=2))
     return final_data
@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+import string
+
+# --- COLOR KEYS ---
+# Scoreboard labels and values are rendered in near-white text. A pixel is part of
+# the text if all channels are bright and the channels are close to each other.
+WHITE_TEXT_MIN_VALUE = 170
+WHITE_TEXT_MAX_CHROMA = 40
+# The game result banner ("VICTORY" / "DEFEAT" / "DRAW") is colored, so for that
+# region we only key on brightness and ignore the hue.
+BRIGHT_TEXT_MIN_VALUE = 150
+
+# --- GEOMETRY ---
+# Tesseract is most accurate (and fastest) with glyphs around 30-40px tall and a
+# small clean margin around the text.
+SINGLE_LINE_HEIGHT = 48
+DETAILS_BLOCK_HEIGHT = 4 * SINGLE_LINE_HEIGHT
+CROP_PADDING = 2
+OCR_BORDER = 10
+# Blobs smaller than this (in pixels) are treated as noise when cropping.
+MIN_TEXT_BLOB_AREA = 4
+
+# --- CHARACTER WHITELISTS ---
+UPPERCASE = string.ascii_uppercase
+DIGITS = string.digits
+OCR_WHITELISTS = {
+    "result": UPPERCASE,
+    "mode": UPPERCASE,
+    "validator": UPPERCASE + " ",
+    "date": DIGITS + "/",
+    "length": DIGITS + ":",
+    # The details block holds the labels and values of all lines above, so it is
+    # read with the union of their character sets.
+    "game_details": UPPERCASE + DIGITS + ":/ ",
+}
+
+
+def tesseract_config(psm, region=None):
+    """Builds a Tesseract config string with the whitelist for a region."""
+    config = f"--psm {psm}"
+    whitelist = OCR_WHITELISTS.get(region)
+    if whitelist:
+        # Spaces cannot be passed inside the whitelist on the command line, and
+        # Tesseract keeps inter-word spaces regardless of the whitelist.
+        config += f" -c tessedit_char_whitelist={whitelist.replace(' ', '')}"
+        config += " -c preserve_interword_spaces=1"
+    return config
+
+
+def filter_to_whitelist(text, region):
+    """Drops every character that is not allowed in the given region."""
+    whitelist = OCR_WHITELISTS.get(region)
+    if not whitelist:
+        return text
+    return "".join(c for c in text if c in whitelist)
+
+
+def binarize_white_text(roi):
+    """Returns a mask of the near-white, low-saturation pixels in a BGR ROI."""
+    channel_min = roi.min(axis=2)
+    channel_max = roi.max(axis=2)
+    mask = (channel_min >= WHITE_TEXT_MIN_VALUE) & (
+        (channel_max - channel_min) <= WHITE_TEXT_MAX_CHROMA
+    )
+    return mask.astype(np.uint8) * 255
+
+
+def binarize_bright_text(roi):
+    """Returns a mask of the bright pixels in a BGR ROI, regardless of hue."""
+    value = roi.max(axis=2)
+    _, mask = cv2.threshold(value, BRIGHT_TEXT_MIN_VALUE, 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def crop_to_text(mask, pad=CROP_PADDING):
+    """
+    Crops a binary mask to the bounding box of its text blobs. Returns None if
+    no text is found.
+    """
+    count, _labels, stats, _centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    keep = [i for i in range(1, count) if stats[i, cv2.CC_STAT_AREA] >= MIN_TEXT_BLOB_AREA]
+    if not keep:
+        return None
+    x1 = min(stats[i, cv2.CC_STAT_LEFT] for i in keep)
+    y1 = min(stats[i, cv2.CC_STAT_TOP] for i in keep)
+    x2 = max(stats[i, cv2.CC_STAT_LEFT] + stats[i, cv2.CC_STAT_WIDTH] for i in keep)
+    y2 = max(stats[i, cv2.CC_STAT_TOP] + stats[i, cv2.CC_STAT_HEIGHT] for i in keep)
+    h, w = mask.shape[:2]
+    return mask[max(0, y1 - pad):min(h, y2 + pad), max(0, x1 - pad):min(w, x2 + pad)]
+
+
+def rescale_to_height(img, target_height):
+    """Scales an image to a fixed height, keeping the aspect ratio."""
+    h, w = img.shape[:2]
+    if h == target_height or h == 0:
+        return img
+    scale = target_height / h
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    new_w = max(1, int(round(w * scale)))
+    resized = cv2.resize(img, (new_w, target_height), interpolation=interpolation)
+    # Re-binarize, since interpolation introduces gray edges.
+    _, resized = cv2.threshold(resized, 127, 255, cv2.THRESH_BINARY)
+    return resized
+
+
+def preprocess_for_ocr(roi, target_height=SINGLE_LINE_HEIGHT, color_key="white"):
+    """
+    Turns a BGR scoreboard ROI into a clean black-on-white image for Tesseract:
+    color-key binarization, tight crop to the text and fixed-height rescaling.
+    Returns None if the ROI contains no text.
+    """
+    if color_key == "bright":
+        mask = binarize_bright_text(roi)
+    else:
+        mask = binarize_white_text(roi)
+    cropped = crop_to_text(mask)
+    if cropped is None:
+        return None
+    scaled = rescale_to_height(cropped, target_height)
+    # Tesseract expects dark text on a light background with some margin.
+    inverted = cv2.bitwise_not(scaled)
+    return cv2.copyMakeBorder(
+        inverted, OCR_BORDER, OCR_BORDER, OCR_BORDER, OCR_BORDER,
+        cv2.BORDER_CONSTANT, value=255,
+    )
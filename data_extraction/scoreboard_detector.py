@@ -0,0 +1,167 @@
+"""
+A cheap check for "is a scoreboard on screen right now?", meant to run on every
+sample of a low-rate screen or video capture.
+
+It only looks at the small region where the scoreboard shows 'FINAL SCORE' and
+never runs OCR: the region must hold a moderate amount of near-white text on a
+dark background, and once real scoreboards have been analyzed, its downsampled
+signature must also correlate with the signatures learned from them. A positive
+here is only a candidate; the full analysis still validates the frame with OCR.
+"""
+import logging
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from constants import SCOREBOARD_SIGNATURES_FILE
+from data_extraction.ocr_preprocessing import binarize_white_text
+
+# Size of the screenshots the scoreboard regions are defined for (width, height).
+SCOREBOARD_SIZE = (2560, 1440)
+# Region of a 2560x1440 frame that holds the 'FINAL SCORE' label: (x1, y1, x2, y2)
+# Adjusted Y-coordinates by -50px based on user feedback.
+VALIDATOR_ROI = (1550, 850, 1800, 890)
+
+# --- PARAMETERS ---
+# The region is reduced to this many pixels (width, height) for the signature.
+SIGNATURE_SIZE = (64, 8)
+# Share of text pixels a 'FINAL SCORE' label covers, with some slack.
+MIN_INK_FRACTION = 0.03
+MAX_INK_FRACTION = 0.40
+# The scoreboard background behind the label is dark.
+MAX_BACKGROUND_VALUE = 110
+# Minimum correlation with a learned signature to count as a scoreboard.
+MIN_SIGNATURE_SCORE = 0.75
+# Two samples with at least this correlation show the same, unchanged screen.
+STABLE_SIMILARITY = 0.95
+MAX_LEARNED_SIGNATURES = 8
+
+_learned = None
+_learned_lock = threading.Lock()
+
+
+def crop_validator_region(frame):
+    x1, y1, x2, y2 = VALIDATOR_ROI
+    return frame[y1:y2, x1:x2]
+
+
+def region_signature(roi):
+    """
+    Returns the grayscale region shrunk to SIGNATURE_SIZE as a zero-mean,
+    unit-length vector, or None for a flat region.
+    """
+    gray = roi if roi.ndim == 2 else cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    small -= small.mean()
+    norm = np.linalg.norm(small)
+    if norm < 1e-3:
+        return None
+    return small / norm
+
+
+def signature_similarity(a, b):
+    if a is None or b is None:
+        return 0.0
+    return float(np.dot(a, b))
+
+
+def looks_like_label(roi):
+    """True if the region holds near-white text on a dark background."""
+    if roi.ndim != 3:
+        return False
+    mask = binarize_white_text(roi)
+    ink = np.count_nonzero(mask) / mask.size
+    if not MIN_INK_FRACTION <= ink <= MAX_INK_FRACTION:
+        return False
+    background = roi.max(axis=2)[mask == 0]
+    return background.size > 0 and float(np.median(background)) <= MAX_BACKGROUND_VALUE
+
+
+def load_learned_signatures():
+    """Signatures learned from analyzed scoreboards, loaded once per process."""
+    global _learned
+    with _learned_lock:
+        if _learned is None:
+            _learned = []
+            try:
+                _learned = list(np.load(SCOREBOARD_SIGNATURES_FILE))
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                logging.error(f"Could not read scoreboard signatures from {SCOREBOARD_SIGNATURES_FILE}.", exc_info=True)
+        return _learned
+
+
+def learn_signature(roi):
+    """
+    Remembers the signature of a validator region from a frame the full
+    analysis accepted, so later detections can be checked against it.
+    """
+    signature = region_signature(roi)
+    if signature is None:
+        return
+    learned = load_learned_signatures()
+    with _learned_lock:
+        if any(signature_similarity(signature, s) >= STABLE_SIMILARITY for s in learned):
+            return
+        learned.append(signature)
+        del learned[:-MAX_LEARNED_SIGNATURES]
+        try:
+            os.makedirs(os.path.dirname(SCOREBOARD_SIGNATURES_FILE), exist_ok=True)
+            tmp_path = SCOREBOARD_SIGNATURES_FILE + ".tmp.npy"
+            np.save(tmp_path, np.stack(learned))
+            os.replace(tmp_path, SCOREBOARD_SIGNATURES_FILE)
+        except OSError:
+            logging.error(f"Could not save scoreboard signatures to {SCOREBOARD_SIGNATURES_FILE}.", exc_info=True)
+
+
+def score_region(roi):
+    """
+    Returns (is_candidate, signature) for a validator region. The signature is
+    returned so callers can compare consecutive samples without recomputing it.
+    """
+    signature = region_signature(roi)
+    if signature is None or not looks_like_label(roi):
+        return False, signature
+    learned = load_learned_signatures()
+    if learned and max(signature_similarity(signature, s) for s in learned) < MIN_SIGNATURE_SCORE:
+        return False, signature
+    return True, signature
+
+
+class ScoreboardDetector:
+    """
+    Turns per-sample detections into analysis triggers. A trigger needs
+    `stable_samples` consecutive positive samples showing the same screen, at
+    least `cooldown` seconds since the last trigger, and a negative sample in
+    between, so one scoreboard left open is analyzed only once.
+    """
+
+    def __init__(self, stable_samples, cooldown):
+        self.stable_samples = stable_samples
+        self.cooldown = cooldown
+        self.streak = 0
+        self.previous = None
+        self.armed = True
+        self.last_trigger = None
+
+    def update(self, roi, now=None):
+        """Feeds one validator region sample. Returns True if analysis should run."""
+        now = time.monotonic() if now is None else now
+        positive, signature = score_region(roi)
+        if not positive:
+            self.streak, self.previous, self.armed = 0, None, True
+            return False
+        if self.previous is not None and signature_similarity(signature, self.previous) >= STABLE_SIMILARITY:
+            self.streak += 1
+        else:
+            self.streak = 1
+        self.previous = signature
+        if not self.armed or self.streak < self.stable_samples:
+            return False
+        if self.last_trigger is not None and now - self.last_trigger < self.cooldown:
+            return False
+        self.armed = False
+        self.last_trigger = now
+        return True
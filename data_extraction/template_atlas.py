@@ -0,0 +1,170 @@
+"""
+Compiles all template images into a single memory-mappable atlas.
+
+The atlas is one flat uint8 `.npy` blob holding every pre-decoded array, plus a
+JSON manifest with the offset, shape and dtype of each array, the source file
+of each template and a version hash per template set. Loading it is a single
+`np.load(mmap_mode="r")` instead of decoding ~90 PNGs on every cold start.
+
+Run from the project root (build.py does this automatically):
+
+    python -m data_extraction.template_atlas
+"""
+import cv2
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+from constants import resource_path
+
+TEMPLATES_ROOT = resource_path("data_extraction/templates")
+ATLAS_DATA_PATH = os.path.join(TEMPLATES_ROOT, "template_atlas.npy")
+ATLAS_MANIFEST_PATH = os.path.join(TEMPLATES_ROOT, "template_atlas.json")
+ATLAS_FORMAT_VERSION = 1
+
+# Template set name -> directory inside TEMPLATES_ROOT
+TEMPLATE_SET_DIRS = {
+    "heroes": "hero_templates",
+    "maps": "map_templates",
+    "names": "name_templates",
+}
+# Sets compiled into the atlas. Name templates are generated per user after
+# installation, so they are always read from disk.
+ATLAS_SETS = ("heroes", "maps")
+
+# Downscaled copies of the BGR template (factor 2 and 4) for coarse-to-fine matching.
+PYRAMID_LEVELS = 2
+# Side length of the normalized grayscale index vector used for quick similarity lookups.
+INDEX_VECTOR_SIZE = 16
+# Every array starts on a 64-byte boundary so the views are properly aligned.
+ARRAY_ALIGNMENT = 64
+
+
+def list_template_sources(set_dir):
+    """Returns (file name, size in bytes) for every .png in a template directory."""
+    if not os.path.isdir(set_dir):
+        return []
+    return sorted(
+        (entry.name, entry.stat().st_size)
+        for entry in os.scandir(set_dir) if entry.name.endswith(".png")
+    )
+
+
+def template_set_hash(set_dir):
+    """A short hash over the file names and contents of a template directory."""
+    set_hash = hashlib.sha256()
+    for file_name, _size in list_template_sources(set_dir):
+        with open(os.path.join(set_dir, file_name), "rb") as f:
+            raw = f.read()
+        set_hash.update(file_name.encode())
+        set_hash.update(raw)
+    return set_hash.hexdigest()[:16]
+
+
+def compute_index_vector(gray):
+    """A tiny zero-mean, unit-norm thumbnail of the template."""
+    thumb = cv2.resize(gray, (INDEX_VECTOR_SIZE, INDEX_VECTOR_SIZE), interpolation=cv2.INTER_AREA)
+    vector = thumb.astype(np.float32).ravel()
+    vector -= vector.mean()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def template_variants(bgr):
+    """All arrays stored in the atlas for one template, keyed by variant name."""
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    variants = {"bgr": bgr, "gray": gray}
+    level = bgr
+    for i in range(1, PYRAMID_LEVELS + 1):
+        level = cv2.pyrDown(level)
+        variants[f"pyramid_{i}"] = level
+    variants["index"] = compute_index_vector(gray)
+    return variants
+
+
+def compile_atlas(templates_root=TEMPLATES_ROOT, data_path=ATLAS_DATA_PATH, manifest_path=ATLAS_MANIFEST_PATH):
+    """Decodes every template once and writes the atlas blob and manifest."""
+    chunks, offset = [], 0
+    manifest = {"version": ATLAS_FORMAT_VERSION, "sets": {}, "set_hashes": {}}
+    atlas_hash = hashlib.sha256()
+
+    for set_name in ATLAS_SETS:
+        dir_name = TEMPLATE_SET_DIRS[set_name]
+        set_dir = os.path.join(templates_root, dir_name)
+        set_hash = hashlib.sha256()
+        templates = {}
+        for file_name, size in list_template_sources(set_dir):
+            with open(os.path.join(set_dir, file_name), "rb") as f:
+                raw = f.read()
+            # Hashed like template_set_hash(), so the atlas can be checked against the directory.
+            set_hash.update(file_name.encode())
+            set_hash.update(raw)
+            bgr = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if bgr is None:
+                logging.warning(f"  - Skipping unreadable template {set_name}/{file_name}")
+                continue
+
+            arrays = {}
+            for variant, array in template_variants(bgr).items():
+                array = np.ascontiguousarray(array)
+                padding = -offset % ARRAY_ALIGNMENT
+                if padding:
+                    chunks.append(np.zeros(padding, dtype=np.uint8))
+                    offset += padding
+                arrays[variant] = {
+                    "offset": offset,
+                    "shape": list(array.shape),
+                    "dtype": array.dtype.str,
+                }
+                chunks.append(array.view(np.uint8).ravel())
+                offset += array.nbytes
+            templates[file_name.split(".")[0]] = {
+                "source": {"file": file_name, "size": size},
+                "arrays": arrays,
+            }
+        manifest["sets"][set_name] = {"dir": dir_name, "templates": templates}
+        manifest["set_hashes"][set_name] = set_hash.hexdigest()[:16]
+        atlas_hash.update(set_hash.digest())
+        logging.info(f"  - {set_name}: {len(templates)} templates")
+
+    manifest["hash"] = atlas_hash.hexdigest()[:16]
+    blob = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+    np.save(data_path, blob)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    logging.info(f"Template atlas written to {data_path} ({blob.nbytes / 1e6:.1f} MB, hash {manifest['hash']})")
+    return manifest
+
+
+def load_atlas(data_path=ATLAS_DATA_PATH, manifest_path=ATLAS_MANIFEST_PATH):
+    """
+    Memory-maps the atlas. Returns (manifest, blob), or (None, None) if there is
+    no usable atlas.
+    """
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != ATLAS_FORMAT_VERSION:
+            logging.warning("Template atlas has an unsupported format version, ignoring it.")
+            return None, None
+        blob = np.load(data_path, mmap_mode="r")
+        return manifest, blob
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError):
+        logging.error("Could not load the template atlas.", exc_info=True)
+        return None, None
+
+
+def atlas_array(blob, entry):
+    """Returns a read-only view of one array in the atlas."""
+    dtype = np.dtype(entry["dtype"])
+    count = int(np.prod(entry["shape"])) * dtype.itemsize
+    raw = blob[entry["offset"]:entry["offset"] + count]
+    return raw.view(dtype).reshape(entry["shape"])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    compile_atlas()
@@ -0,0 +1,71 @@
+import json
+import logging
+import os
+import threading
+from constants import TEMPLATE_PRIORS_FILE
+
+_priors = None
+_priors_lock = threading.Lock()
+_persist = True
+
+
+def load_template_priors():
+    """Loads the detection counts per template set once per process."""
+    global _priors
+    with _priors_lock:
+        if _priors is None:
+            try:
+                with open(TEMPLATE_PRIORS_FILE, "r") as f:
+                    _priors = json.load(f)
+            except FileNotFoundError:
+                _priors = {}
+            except (OSError, ValueError):
+                logging.error(f"Could not read template priors from {TEMPLATE_PRIORS_FILE}.", exc_info=True)
+                _priors = {}
+        return _priors
+
+
+def use_in_memory_priors():
+    """
+    Starts from empty priors that are never written to disk. Used by benchmarks
+    and tools, so they do not skew the user's real detection history.
+    """
+    global _priors, _persist
+    with _priors_lock:
+        _priors = {}
+        _persist = False
+
+
+def order_by_prior(templates, set_name):
+    """
+    Returns the templates reordered so the most frequently detected ones come
+    first. Templates that were never detected keep their original order.
+    """
+    counts = load_template_priors().get(set_name, {})
+    if not counts:
+        return templates
+    ordered_names = sorted(templates, key=lambda name: -counts.get(name, 0))
+    return {name: templates[name] for name in ordered_names}
+
+
+def record_detections(detections):
+    """
+    Adds one analysis worth of detections to the priors and persists them.
+    `detections` maps a set name to the list of template names detected.
+    """
+    priors = load_template_priors()
+    with _priors_lock:
+        for set_name, names in detections.items():
+            counts = priors.setdefault(set_name, {})
+            for name in names:
+                counts[name] = counts.get(name, 0) + 1
+        if not _persist:
+            return
+        try:
+            os.makedirs(os.path.dirname(TEMPLATE_PRIORS_FILE), exist_ok=True)
+            tmp_path = TEMPLATE_PRIORS_FILE + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(priors, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, TEMPLATE_PRIORS_FILE)
+        except OSError:
+            logging.error(f"Could not save template priors to {TEMPLATE_PRIORS_FILE}.", exc_info=True)
@@ -0,0 +1,131 @@
+import cv2
+import hashlib
+import logging
+import numpy as np
+import os
+import sys
+import threading
+from data_extraction.template_atlas import (
+    TEMPLATES_ROOT, TEMPLATE_SET_DIRS, ATLAS_SETS, load_atlas, atlas_array, list_template_sources,
+    template_set_hash, template_variants,
+)
+
+# Loaded templates, keyed by (set name, variant). Filled lazily once per process.
+_cache = {}
+_set_versions = {}
+# What the template directory of each set read from disk looked like when it was loaded.
+_set_signatures = {}
+_atlas = None
+_lock = threading.Lock()
+
+
+def _get_atlas():
+    global _atlas
+    if _atlas is None:
+        manifest, blob = load_atlas()
+        _atlas = (manifest, blob)
+        if manifest:
+            logging.info(f"Template atlas loaded (hash {manifest.get('hash')}).")
+    return _atlas
+
+
+def _atlas_is_current(set_name, manifest):
+    """
+    Checks the atlas entry for a set against the template directory. In a frozen
+    bundle the atlas is built together with the templates and always trusted;
+    in the source tree the content hash of the directory must match.
+    """
+    if getattr(sys, "frozen", False):
+        return True
+    set_dir = os.path.join(TEMPLATES_ROOT, TEMPLATE_SET_DIRS[set_name])
+    return template_set_hash(set_dir) == manifest["set_hashes"].get(set_name)
+
+
+def _decode_set(set_name, variant):
+    """Fallback: decodes the template PNGs of a set from disk."""
+    set_dir = os.path.join(TEMPLATES_ROOT, TEMPLATE_SET_DIRS[set_name])
+    templates, set_hash = {}, hashlib.sha256()
+    for file_name, _size in list_template_sources(set_dir):
+        with open(os.path.join(set_dir, file_name), "rb") as f:
+            raw = f.read()
+        set_hash.update(file_name.encode())
+        set_hash.update(raw)
+        image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None and variant != "bgr":
+            image = template_variants(image)[variant]
+        templates[file_name.split(".")[0]] = image
+    _set_versions[set_name] = set_hash.hexdigest()[:16]
+    return templates
+
+
+def _directory_signature(set_name):
+    """File names, sizes and modification times of a set's template PNGs."""
+    set_dir = os.path.join(TEMPLATES_ROOT, TEMPLATE_SET_DIRS[set_name])
+    if not os.path.isdir(set_dir):
+        return ()
+    return tuple(sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(set_dir) if entry.name.endswith(".png")
+    ))
+
+
+def _load_set(set_name, variant):
+    if set_name not in ATLAS_SETS:
+        # Taken before reading, so a change made while decoding is seen next time.
+        _set_signatures[set_name] = _directory_signature(set_name)
+        return _decode_set(set_name, variant)
+    manifest, blob = _get_atlas()
+    set_manifest = manifest["sets"].get(set_name) if manifest else None
+    if set_manifest is not None and _atlas_is_current(set_name, manifest):
+        _set_versions[set_name] = manifest["set_hashes"][set_name]
+        return {
+            name: atlas_array(blob, entry["arrays"][variant])
+            for name, entry in set_manifest["templates"].items()
+        }
+    if manifest:
+        logging.warning(
+            f"Template atlas is out of date for '{set_name}', decoding PNGs. "
+            "Run 'python -m data_extraction.template_atlas' to rebuild it."
+        )
+    return _decode_set(set_name, variant)
+
+
+def get_templates(set_name, variant="bgr"):
+    """
+    Returns {template name: array} for a template set ("heroes", "maps" or
+    "names"). Variants are "bgr", "gray", "pyramid_1", "pyramid_2" and "index".
+    The arrays are shared and must not be modified.
+    """
+    key = (set_name, variant)
+    with _lock:
+        if key not in _cache:
+            _cache[key] = _load_set(set_name, variant)
+        return _cache[key]
+
+
+def template_set_version(set_name):
+    """A short content hash of the templates in a set."""
+    get_templates(set_name)
+    return _set_versions.get(set_name)
+
+
+def refresh_templates():
+    """
+    Forgets the loaded sets that are read from disk (the name templates) if
+    their directory changed since, e.g. after generate_templates.py was run
+    for a new player. Cheap enough to call before every analysis; returns the
+    names of the sets that will be reloaded.
+    """
+    with _lock:
+        changed = [
+            set_name for set_name, signature in _set_signatures.items()
+            if _directory_signature(set_name) != signature
+        ]
+        for set_name in changed:
+            for key in [key for key in _cache if key[0] == set_name]:
+                del _cache[key]
+            _set_versions.pop(set_name, None)
+            del _set_signatures[set_name]
+    for set_name in changed:
+        logging.info(f"Template set '{set_name}' changed on disk, reloading it.")
+    return changed
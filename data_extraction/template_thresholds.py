@@ -0,0 +1,159 @@
+"""
+Builds and loads per-template detection thresholds.
+
+Every template in a set is cross-correlated against every other template of the
+same set. The resulting confusability matrix tells us how close the nearest
+look-alike of each template scores, and from that we derive:
+
+- an accept threshold: the minimum score for a detection of that template to
+  count. Templates with a close look-alike get a higher bar than the global
+  default.
+- an early-exit threshold: a score so far above every look-alike that the
+  matchers can stop scanning the remaining templates.
+
+Run from the project root to regenerate the file after changing templates:
+
+    python -m data_extraction.template_thresholds
+"""
+import cv2
+import json
+import logging
+import os
+from constants import resource_path
+
+THRESHOLDS_PATH = resource_path("data_extraction/templates/template_thresholds.json")
+THRESHOLDS_FORMAT_VERSION = 1
+
+# --- DERIVATION PARAMETERS ---
+# A detection must beat the closest look-alike by at least this margin.
+ACCEPT_MARGIN = 0.10
+ACCEPT_CEILING = 0.95
+# Scanning stops once a score beats the closest look-alike by this margin.
+EARLY_EXIT_MARGIN = 0.20
+# Even for very distinct templates, exiting early needs a bit more than a bare accept.
+EARLY_EXIT_MIN_GAP = 0.05
+EARLY_EXIT_CEILING = 0.98
+
+_thresholds_cache = None
+
+
+def cross_correlate(template_a, template_b):
+    """
+    Returns the best TM_CCOEFF_NORMED score between two templates. The smaller
+    template is slid over the larger one; if neither fits inside the other, both
+    are center-cropped to their common size.
+    """
+    ah, aw = template_a.shape[:2]
+    bh, bw = template_b.shape[:2]
+    if ah <= bh and aw <= bw:
+        image, templ = template_b, template_a
+    elif bh <= ah and bw <= aw:
+        image, templ = template_a, template_b
+    else:
+        h, w = min(ah, bh), min(aw, bw)
+        image = template_a[(ah - h) // 2:(ah - h) // 2 + h, (aw - w) // 2:(aw - w) // 2 + w]
+        templ = template_b[(bh - h) // 2:(bh - h) // 2 + h, (bw - w) // 2:(bw - w) // 2 + w]
+    res = cv2.matchTemplate(image, templ, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, _ = cv2.minMaxLoc(res)
+    return float(max_val)
+
+
+def build_confusability_matrix(templates):
+    """Cross-correlates every template against every other one in the set."""
+    names = sorted(name for name, template in templates.items() if template is not None)
+    matrix = {name: {} for name in names}
+    for i, name_a in enumerate(names):
+        for name_b in names[i + 1:]:
+            score = round(cross_correlate(templates[name_a], templates[name_b]), 4)
+            matrix[name_a][name_b] = score
+            matrix[name_b][name_a] = score
+    return matrix
+
+
+def derive_thresholds(matrix, base_threshold):
+    """Derives the per-template accept and early-exit thresholds from a matrix."""
+    accept, early_exit = {}, {}
+    for name, row in matrix.items():
+        closest = max(row.values(), default=0.0)
+        accept[name] = round(min(ACCEPT_CEILING, max(base_threshold, closest + ACCEPT_MARGIN)), 4)
+        early_exit[name] = round(
+            min(EARLY_EXIT_CEILING, max(accept[name] + EARLY_EXIT_MIN_GAP, closest + EARLY_EXIT_MARGIN)), 4
+        )
+    return accept, early_exit
+
+
+def load_template_dir(path):
+    """Loads every .png in a template directory, keyed by file name."""
+    if not os.path.isdir(path):
+        return {}
+    return {
+        os.path.basename(p).split(".")[0]: cv2.imread(os.path.join(path, p))
+        for p in sorted(os.listdir(path)) if p.endswith(".png")
+    }
+
+
+def build_threshold_file(template_sets, output_path=THRESHOLDS_PATH):
+    """
+    Builds the thresholds file. `template_sets` maps a set name to a
+    (templates, base_threshold) tuple.
+    """
+    data = {"version": THRESHOLDS_FORMAT_VERSION, "sets": {}}
+    for set_name, (templates, base_threshold) in template_sets.items():
+        logging.info(f"Cross-correlating {len(templates)} {set_name} templates...")
+        matrix = build_confusability_matrix(templates)
+        accept, early_exit = derive_thresholds(matrix, base_threshold)
+        data["sets"][set_name] = {
+            "base_threshold": base_threshold,
+            "accept": accept,
+            "early_exit": early_exit,
+            "matrix": matrix,
+        }
+        for name in sorted(matrix, key=lambda n: max(matrix[n].values(), default=0.0), reverse=True)[:3]:
+            closest = max(matrix[name], key=matrix[name].get, default=None)
+            if closest:
+                logging.info(
+                    f"  - {name:<20} closest look-alike: {closest:<20} ({matrix[name][closest]:.2f}) -> accept {accept[name]:.2f}"
+                )
+    with open(output_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    logging.info(f"Template thresholds written to {output_path}")
+    return data
+
+
+def load_template_thresholds(path=THRESHOLDS_PATH):
+    """Loads the thresholds file once per process. Returns {} if it is missing."""
+    global _thresholds_cache
+    if _thresholds_cache is None:
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            _thresholds_cache = data.get("sets", {}) if data.get("version") == THRESHOLDS_FORMAT_VERSION else {}
+        except FileNotFoundError:
+            logging.info("No template thresholds file found, using global thresholds.")
+            _thresholds_cache = {}
+        except (OSError, ValueError):
+            logging.error(f"Could not read template thresholds from {path}.", exc_info=True)
+            _thresholds_cache = {}
+    return _thresholds_cache
+
+
+def get_set_thresholds(set_name):
+    """Returns the {"accept": {...}, "early_exit": {...}} thresholds for a set."""
+    set_data = load_template_thresholds().get(set_name, {})
+    return {
+        "accept": set_data.get("accept", {}),
+        "early_exit": set_data.get("early_exit", {}),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from data_extraction.main_ocr import (
+        HERO_TEMPLATES_PATH, MAP_TEMPLATES_PATH, NAME_TEMPLATES_PATH,
+        HERO_DETECTION_THRESHOLD, MAP_CONFIDENCE_THRESHOLD, NAME_DETECTION_THRESHOLD,
+    )
+    build_threshold_file({
+        "heroes": (load_template_dir(HERO_TEMPLATES_PATH), HERO_DETECTION_THRESHOLD),
+        "maps": (load_template_dir(MAP_TEMPLATES_PATH), MAP_CONFIDENCE_THRESHOLD),
+        "names": (load_template_dir(NAME_TEMPLATES_PATH), NAME_DETECTION_THRESHOLD),
+    })
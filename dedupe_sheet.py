@@ -0,0 +1,96 @@
+"""
+Finds games that were recorded more than once in the Google Sheet.
+
+    python dedupe_sheet.py            # list the duplicates
+    python dedupe_sheet.py --apply    # delete them from the sheet
+
+Rows are compared by their match fingerprint (date, map, mode, result,
+length, score and the known players' heroes). The row with the lowest Match ID
+of each game is kept. Rows with a field that could not be read (empty or
+"Unknown") can't be told apart from other games and are never deleted. The fingerprints of the kept rows are added to the local fingerprint
+index, so these games are never uploaded again.
+"""
+import argparse
+import logging
+import sys
+import constants
+from google_sheets_integration.outbox import Outbox
+from google_sheets_integration.uploader import UploaderSession, match_fingerprint
+
+
+def _match_id(record):
+    value = str(record.get("Match ID", "")).strip()
+    return int(value) if value.isdigit() else None
+
+
+def find_duplicates(values):
+    """
+    Takes the sheet's values (header first) and returns ({fingerprint: (row,
+    Match ID) of the kept row}, [(row, Match ID, row kept instead)]). Rows are
+    1-based like in the sheet. Rows without a fingerprint are in neither.
+    """
+    header = [column.strip() for column in values[0]]
+    kept, duplicates = {}, []
+    rows = [(index, dict(zip(header, row))) for index, row in enumerate(values[1:], start=2)]
+    # Lowest Match ID first, so the original of every game is kept.
+    rows.sort(key=lambda r: (_match_id(r[1]) is None, _match_id(r[1]) or 0, r[0]))
+    for row, record in rows:
+        fingerprint = match_fingerprint(record)
+        match_id = _match_id(record)
+        if fingerprint is None:
+            continue
+        if fingerprint in kept:
+            duplicates.append((row, match_id, kept[fingerprint][0]))
+        else:
+            kept[fingerprint] = (row, match_id)
+    return kept, sorted(duplicates)
+
+
+def delete_rows(sheet, rows):
+    """Deletes rows in one request, bottom up so the row numbers stay valid."""
+    requests = [
+        {"deleteDimension": {"range": {"sheetId": sheet.id, "dimension": "ROWS", "startIndex": row - 1, "endIndex": row}}}
+        for row in sorted(rows, reverse=True)
+    ]
+    sheet.spreadsheet.batch_update({"requests": requests})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and remove duplicate games in the Google Sheet.")
+    parser.add_argument("--apply", action="store_true", help="Delete the duplicate rows from the sheet.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sheet = UploaderSession().get_sheet()
+    if not sheet:
+        sys.exit(1)
+    values = sheet.get_all_values()
+    if len(values) < 2:
+        logging.info("The sheet has no games.")
+        return
+
+    kept, duplicates = find_duplicates(values)
+    for row, match_id, original_row in duplicates:
+        print(f"Row {row} (Match ID {match_id}) duplicates row {original_row}")
+    unidentified = len(values) - 1 - len(kept) - len(duplicates)
+    logging.info(
+        f"{len(values) - 1} rows, {len(kept)} distinct games, {len(duplicates)} duplicates, "
+        f"{unidentified} rows with unreadable details left alone."
+    )
+
+    outbox = Outbox(constants.OUTBOX_FILE)
+    try:
+        added = outbox.add_fingerprints((fingerprint, match_id) for fingerprint, (_row, match_id) in kept.items())
+    finally:
+        outbox.close()
+    logging.info(f"Added {added} games to the local fingerprint index.")
+
+    if duplicates and args.apply:
+        delete_rows(sheet, [row for row, _, _ in duplicates])
+        logging.info(f"Deleted {len(duplicates)} duplicate rows.")
+    elif duplicates:
+        logging.info("Run with --apply to delete them.")
+
+
+if __name__ == "__main__":
+    main()
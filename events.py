@@ -0,0 +1,51 @@
+"""
+In-process publish/subscribe between the app's components, e.g. the uploader
+telling the dashboard about new games without either importing the other.
+
+Callbacks run synchronously on the publishing thread, so they should be quick.
+The last events of every topic are kept, and a late subscriber (like the
+dashboard, which is only loaded when it is opened) can ask for them to be
+replayed when it subscribes.
+"""
+import logging
+import threading
+from collections import defaultdict, deque
+
+# Payload: {"columns": [sheet column names], "rows": [[values of one game], ...]}
+MATCHES_ADDED = "matches_added"
+
+REPLAY_SIZE = 100
+
+_subscribers = defaultdict(list)
+_history = defaultdict(lambda: deque(maxlen=REPLAY_SIZE))
+_lock = threading.Lock()
+
+
+def subscribe(topic, callback, replay=False):
+    """Calls `callback(payload)` for every event published on `topic`."""
+    with _lock:
+        _subscribers[topic].append(callback)
+        missed = list(_history[topic]) if replay else []
+    for payload in missed:
+        _deliver(topic, callback, payload)
+
+
+def unsubscribe(topic, callback):
+    with _lock:
+        if callback in _subscribers[topic]:
+            _subscribers[topic].remove(callback)
+
+
+def publish(topic, payload):
+    with _lock:
+        _history[topic].append(payload)
+        callbacks = list(_subscribers[topic])
+    for callback in callbacks:
+        _deliver(topic, callback, payload)
+
+
+def _deliver(topic, callback, payload):
+    try:
+        callback(payload)
+    except Exception:
+        logging.error(f"Subscriber of '{topic}' failed.", exc_info=True)
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderWatcher(threading.Thread):
+    """
+    Polls a set of directories for new screenshots written by other tools and
+    hands each new image to `submit(path, sha256)` once.
+
+    A file is only submitted after its size and modification time have not
+    changed for `settle_seconds`, so partially written files are never read.
+    Images whose content hash is in the processed-hash file are skipped, even
+    if they show up again under another name. Files that already exist when
+    the watcher starts are submitted too unless they were already processed,
+    so screenshots taken while the app was closed are not lost; with
+    `backlog_days` set, files modified longer ago than that are left alone.
+    """
+
+    def __init__(self, folders, submit, hashes_file, poll_seconds, settle_seconds, backlog_days=None):
+        super().__init__(name="FolderWatcher", daemon=True)
+        self.folders = [os.path.abspath(os.path.expanduser(f)) for f in folders]
+        self.submit = submit
+        self.hashes_file = hashes_file
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        self.backlog_days = backlog_days
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.processed = self._load_hashes()
+        # path -> (size, mtime) of files already handled or ignored.
+        self.seen = {}
+        # path -> (size, mtime, first time this size/mtime was seen)
+        self.settling = {}
+        # Hashes submitted to the worker but not marked processed yet.
+        self.in_flight = set()
+
+    def _load_hashes(self):
+        try:
+            with open(self.hashes_file, "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+        except OSError:
+            logging.error(f"Could not read processed image hashes from {self.hashes_file}.", exc_info=True)
+            return set()
+
+    def mark_processed(self, sha256):
+        """Records an image as processed, so it is never analyzed again."""
+        with self.lock:
+            self.in_flight.discard(sha256)
+            if sha256 in self.processed:
+                return
+            self.processed.add(sha256)
+            try:
+                os.makedirs(os.path.dirname(self.hashes_file), exist_ok=True)
+                with open(self.hashes_file, "a", encoding="utf-8") as f:
+                    f.write(sha256 + "\n")
+            except OSError:
+                logging.error(f"Could not save processed image hash to {self.hashes_file}.", exc_info=True)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _scan(self):
+        """Returns {path: (size, mtime)} for the images in the watched folders."""
+        found = {}
+        for folder in self.folders:
+            try:
+                entries = os.scandir(folder)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    found[entry.path] = (stat.st_size, stat.st_mtime)
+        return found
+
+    def poll(self, now=None):
+        """Checks the folders once and submits images that have settled."""
+        now = time.monotonic() if now is None else now
+        found = self._scan()
+        for path in list(self.seen):
+            if path not in found:
+                del self.seen[path]
+        for path in list(self.settling):
+            if path not in found:
+                del self.settling[path]
+
+        for path, state in found.items():
+            if self.seen.get(path) == state:
+                continue
+            settling = self.settling.get(path)
+            if settling is None or settling[:2] != state:
+                self.settling[path] = (*state, now)
+                continue
+            if now - settling[2] < self.settle_seconds or state[0] == 0:
+                continue
+            if not self._submit_file(path):
+                # The worker queue is full, try again on the next poll.
+                break
+            del self.settling[path]
+            self.seen[path] = state
+
+    def _submit_file(self, path):
+        try:
+            sha256 = file_sha256(path)
+        except OSError:
+            logging.warning(f"Could not read {path}, skipping it.")
+            return True
+        with self.lock:
+            duplicate = sha256 in self.processed or sha256 in self.in_flight
+        if duplicate:
+            logging.debug(f"Skipping {os.path.basename(path)}, this image was already processed.")
+            return True
+        if not self.submit(path, sha256):
+            return False
+        with self.lock:
+            self.in_flight.add(sha256)
+        logging.info(f"New screenshot found: {path}")
+        return True
+
+    def run(self):
+        logging.info(f"Watching for new screenshots in: {', '.join(self.folders)}")
+        found = self._scan()
+        if self.backlog_days is not None:
+            cutoff = time.time() - self.backlog_days * 24 * 3600
+            self.seen = {path: state for path, state in found.items() if state[1] < cutoff}
+        backlog = len(found) - len(self.seen)
+        if backlog:
+            logging.info(f"Checking {backlog} existing screenshots for ones that were not processed yet.")
+        while not self.stop_event.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:
+                logging.error("Watch folder scan failed.", exc_info=True)
@@ -0,0 +1,370 @@
+"""
+Durable queue of games waiting to be uploaded.
+
+Every analyzed game is committed to a local SQLite outbox first, so a network
+or Sheets API failure never loses it. A background flusher uploads the pending
+games in batches and tracks the delivery state of every row:
+
+    pending -> sending -> sent
+                       -> unconfirmed -> sent or pending
+
+Every game also gets a fingerprint (see uploader.game_fingerprint). The
+fingerprints of all games ever queued are kept in an index, and a game whose
+fingerprint is already in it is not queued again, so a scoreboard analyzed
+twice is only recorded once.
+
+A row is claimed ('sending') before its batch goes out and gets the Match ID
+it is uploaded with. If the upload fails after that point (e.g. a timeout after
+the sheet already wrote the rows), the rows become 'unconfirmed': before
+anything else is sent, their Match IDs are looked up in the sheet and only the
+rows that are missing go back to 'pending'. Batches interrupted by a crash are
+settled the same way. Failed batches are retried with exponential backoff;
+quota errors wait out the quota window.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# --- PARAMETERS ---
+BATCH_SIZE = 50
+# The Sheets API allows 60 write requests per minute per user.
+MIN_SECONDS_BETWEEN_BATCHES = 1.0
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 15 * 60
+QUOTA_RETRY_SECONDS = 60.0
+# A 'sending' row older than this belongs to a flusher that died mid-batch.
+CLAIM_TIMEOUT_SECONDS = 10 * 60
+
+STATE_PENDING = "pending"
+STATE_SENDING = "sending"
+STATE_SENT = "sent"
+# The upload failed after the rows got their Match IDs; they may be in the sheet.
+STATE_UNCONFIRMED = "unconfirmed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_data TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    created_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    claimed_at REAL,
+    match_id INTEGER,
+    sent_at TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox (state, id);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fingerprint TEXT PRIMARY KEY,
+    match_id INTEGER,
+    recorded_at TEXT NOT NULL
+);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+def retry_delay(failures, error=None):
+    """Seconds to wait after `failures` failed batches in a row."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (failures - 1))
+    if is_quota_error(error):
+        retry_after = _retry_after(error)
+        delay = max(delay, retry_after if retry_after is not None else QUOTA_RETRY_SECONDS)
+    return delay
+
+
+def _status_code(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_quota_error(error):
+    return _status_code(error) == 429
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class Outbox:
+    """The SQLite table of games to upload and their delivery state."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.lock, self.db:
+            self.db.executescript(_SCHEMA)
+            columns = {r["name"] for r in self.db.execute("PRAGMA table_info(outbox)")}
+            if "fingerprint" not in columns:
+                self.db.execute("ALTER TABLE outbox ADD COLUMN fingerprint TEXT")
+
+    def add(self, game_data, fingerprint=None):
+        """
+        Commits a game to the outbox and returns its row id, or None if a game
+        with the same fingerprint was already recorded.
+        """
+        now = _now()
+        with self.lock, self.db:
+            if fingerprint is not None:
+                inserted = self.db.execute(
+                    "INSERT OR IGNORE INTO fingerprints (fingerprint, recorded_at) VALUES (?, ?)", (fingerprint, now)
+                ).rowcount
+                if not inserted:
+                    return None
+            return self.db.execute(
+                "INSERT INTO outbox (game_data, created_at, fingerprint) VALUES (?, ?, ?)",
+                (json.dumps(game_data), now, fingerprint),
+            ).lastrowid
+
+    def add_fingerprints(self, fingerprints):
+        """Indexes games that were recorded without the outbox: [(fingerprint, match_id)]."""
+        now = _now()
+        with self.lock, self.db:
+            return self.db.executemany(
+                "INSERT OR IGNORE INTO fingerprints (fingerprint, match_id, recorded_at) VALUES (?, ?, ?)",
+                [(fingerprint, match_id, now) for fingerprint, match_id in fingerprints],
+            ).rowcount
+
+    def match_id_for(self, fingerprint):
+        """The Match ID the game with this fingerprint was stored under, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT match_id FROM fingerprints WHERE fingerprint = ?", (fingerprint,)).fetchone()
+        return row["match_id"] if row else None
+
+    def claim(self, limit):
+        """Marks up to `limit` of the oldest pending rows as sending and returns [(id, game_data)]."""
+        with self.lock, self.db:
+            # The tray app and analyze_video.py share the outbox: take the write
+            # lock before reading, so two processes never claim the same rows.
+            self.db.execute("BEGIN IMMEDIATE")
+            rows = self.db.execute(
+                "SELECT id, game_data FROM outbox WHERE state = ? ORDER BY id LIMIT ?", (STATE_PENDING, limit)
+            ).fetchall()
+            self.db.executemany(
+                "UPDATE outbox SET state = ?, claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(STATE_SENDING, time.time(), r["id"]) for r in rows],
+            )
+        return [(r["id"], json.loads(r["game_data"])) for r in rows]
+
+    def assign(self, row_ids, match_ids):
+        """Records the Match IDs a claimed batch is about to be uploaded with."""
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE outbox SET match_id = ? WHERE id = ?", list(zip(match_ids, row_ids))
+            )
+
+    def mark_sent(self, row_ids, match_ids):
+        now = _now()
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE outbox SET state = ?, match_id = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                [(STATE_SENT, match_id, now, row_id) for row_id, match_id in zip(row_ids, match_ids)],
+            )
+            self.db.executemany(
+                "UPDATE fingerprints SET match_id = ? "
+                "WHERE fingerprint = (SELECT fingerprint FROM outbox WHERE id = ?)",
+                list(zip(match_ids, row_ids)),
+            )
+
+    def release(self, row_ids, error):
+        """Puts the rows of a batch that failed before it was sent back in the queue."""
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE outbox SET state = ?, match_id = NULL, claimed_at = NULL, last_error = ? WHERE id = ?",
+                [(STATE_PENDING, error, row_id) for row_id in row_ids],
+            )
+
+    def mark_unconfirmed(self, row_ids, error):
+        """Keeps the Match IDs of a batch that failed after they were assigned, until it is settled."""
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE outbox SET state = ?, last_error = ? WHERE id = ?",
+                [(STATE_UNCONFIRMED, error, row_id) for row_id in row_ids],
+            )
+
+    def unsettled(self):
+        """
+        [(id, match_id, claimed_at)] of rows that may or may not be in the
+        sheet: unconfirmed rows and rows a flusher claimed but never finished.
+        """
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, match_id, claimed_at FROM outbox WHERE state = ? OR (state = ? AND claimed_at < ?)",
+                (STATE_UNCONFIRMED, STATE_SENDING, time.time() - CLAIM_TIMEOUT_SECONDS),
+            ).fetchall()
+        return [(r["id"], r["match_id"], r["claimed_at"]) for r in rows]
+
+    def settle(self, claims, delivered, error):
+        """
+        Marks unsettled rows whose Match ID is in `delivered` as sent and puts
+        the others back in the queue. A row is only changed if it still has
+        the claim it had in unsettled(), so a row another process settled and
+        claimed again in the meantime is left alone.
+        """
+        now = _now()
+        sent = pending = 0
+        with self.lock, self.db:
+            for row_id, match_id, claimed_at in claims:
+                if match_id is not None and match_id in delivered:
+                    sent += self.db.execute(
+                        "UPDATE outbox SET state = ?, sent_at = ?, last_error = NULL "
+                        "WHERE id = ? AND claimed_at IS ? AND state IN (?, ?)",
+                        (STATE_SENT, now, row_id, claimed_at, STATE_SENDING, STATE_UNCONFIRMED),
+                    ).rowcount
+                    self.db.execute(
+                        "UPDATE fingerprints SET match_id = ? WHERE fingerprint = (SELECT fingerprint FROM outbox WHERE id = ?)",
+                        (match_id, row_id),
+                    )
+                else:
+                    pending += self.db.execute(
+                        "UPDATE outbox SET state = ?, match_id = NULL, claimed_at = NULL, last_error = ? "
+                        "WHERE id = ? AND claimed_at IS ? AND state IN (?, ?)",
+                        (STATE_PENDING, error, row_id, claimed_at, STATE_SENDING, STATE_UNCONFIRMED),
+                    ).rowcount
+        return sent, pending
+
+    def counts(self):
+        """{state: number of rows}."""
+        with self.lock:
+            rows = self.db.execute("SELECT state, COUNT(*) AS n FROM outbox GROUP BY state").fetchall()
+        return {r["state"]: r["n"] for r in rows}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class OutboxFlusher(threading.Thread):
+    """
+    Uploads the outbox in the background.
+
+    `send_batch(games, before_send)` must upload the games in order, call
+    `before_send(match_ids)` right before the API call and return the Match IDs
+    the rows ended up with. `find_match_ids(match_ids)` returns the subset that
+    is in the sheet; it is used to settle batches interrupted by a crash.
+    `on_batch(games, match_ids, error)` is called after every attempt, with
+    the uploaded games or the error of a failed attempt.
+    """
+
+    def __init__(self, outbox, send_batch, find_match_ids, on_batch=None):
+        super().__init__(name="OutboxFlusher", daemon=True)
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.find_match_ids = find_match_ids
+        self.on_batch = on_batch
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.idle = threading.Condition()
+        self.failures = 0
+
+    def wake(self):
+        """Tells the flusher a game was added."""
+        self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def wait_until_empty(self, timeout):
+        """Blocks until no game is pending. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        with self.idle:
+            while self.pending():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.is_alive():
+                    return False
+                self.idle.wait(min(remaining, 1.0))
+        return True
+
+    def pending(self):
+        """Number of games not uploaded yet."""
+        counts = self.outbox.counts()
+        return sum(counts.get(state, 0) for state in (STATE_PENDING, STATE_SENDING, STATE_UNCONFIRMED))
+
+    def recover(self):
+        """
+        Settles unconfirmed rows and rows left 'sending' by a flusher that
+        died mid-batch, by looking up their Match IDs. Raises if the lookup
+        fails, so nothing is sent before they are settled.
+        """
+        claims = self.outbox.unsettled()
+        if not claims:
+            return
+        assigned = [match_id for _, match_id, _ in claims if match_id is not None]
+        delivered = self.find_match_ids(assigned) if assigned else set()
+        sent, pending = self.outbox.settle(claims, delivered, "Not in the sheet after a failed upload.")
+        logging.info(f"Outbox recovery: {sent} rows were already uploaded, {pending} will be retried.")
+
+    def flush_once(self):
+        """Uploads one batch. Returns the number of rows sent."""
+        batch = self.outbox.claim(BATCH_SIZE)
+        if not batch:
+            return 0
+        row_ids = [row_id for row_id, _ in batch]
+        assigned = []
+
+        def before_send(match_ids):
+            self.outbox.assign(row_ids, match_ids)
+            assigned.append(match_ids)
+
+        try:
+            match_ids = self.send_batch([game for _, game in batch], before_send)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if assigned:
+                # The rows may have been written anyway; recover() checks before resending.
+                self.outbox.mark_unconfirmed(row_ids, error)
+            else:
+                self.outbox.release(row_ids, error)
+            raise
+        self.outbox.mark_sent(row_ids, match_ids)
+        logging.info(f"Uploaded {len(batch)} games from the outbox (Match IDs {match_ids[0]}-{match_ids[-1]}).")
+        self._report([game for _, game in batch], match_ids, None)
+        return len(batch)
+
+    def _report(self, games, match_ids, error):
+        if self.on_batch:
+            try:
+                self.on_batch(games, match_ids, error)
+            except Exception:
+                logging.error("Upload callback failed.", exc_info=True)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.recover()
+                sent = self.flush_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                delay = retry_delay(self.failures, e)
+                kind = "Sheets API quota exceeded" if is_quota_error(e) else "Upload failed"
+                logging.error(f"{kind}, retrying in {delay:.0f}s. Pending games stay in the outbox.", exc_info=True)
+                self._report([], [], e)
+                # New games don't cut the backoff short, they go out with the retry.
+                self.stop_event.wait(delay)
+                continue
+            if sent:
+                self.stop_event.wait(MIN_SECONDS_BETWEEN_BATCHES)
+                continue
+            with self.idle:
+                self.idle.notify_all()
+            # Nothing pending: sleep until a game is added, but look for
+            # interrupted batches of other processes now and then.
+            self.wake_event.wait(CLAIM_TIMEOUT_SECONDS)
+            self.wake_event.clear()
@@ -1,17 +1,26 @@
-import gspread
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+import hashlib
+import csv
 import json
 import os
-import pandas as pd
-from datetime import datetime
+import re
+import threading
+from contextlib import contextmanager
+from io import StringIO
+from datetime import datetime, timedelta, timezone
 import logging
 
-from constants import resource_path, CONFIG_FILE, TOKEN_FILE
+from constants import resource_path, sheet_columns, CONFIG_FILE, TOKEN_FILE, MATCH_ID_COUNTER_FILE, OUTBOX_FILE
+from google_sheets_integration.outbox import Outbox, OutboxFlusher
 
 # --- CONFIGURATION ---
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 CLIENT_SECRET_FILE = resource_path("google_sheets_integration/client_secret.json")
+# Access tokens are refreshed this long before they expire, so an upload never
+# has to wait for (or fail on) an expired token.
+CREDENTIALS_REFRESH_MARGIN = timedelta(minutes=5)
+# Seconds before a Sheets API request is given up on, so a stalled connection
+# can't block uploads or a dashboard refresh indefinitely.
+REQUEST_TIMEOUT = 30
 
 # --- HERO TO ROLE MAPPING ---
 HERO_ROLES = {
@@ -72,7 +81,15 @@ def load_config():
         return json.load(f)
 
 
-def get_credentials():
+def get_credentials(interactive=True):
+    """
+    The saved Google credentials. Without usable saved credentials, the user is
+    asked to sign in in the browser, unless `interactive` is False.
+    """
+    # The Google client libraries are only needed with the Sheets backend.
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -82,6 +99,9 @@ def get_credentials():
 
             logging.info("Refreshing expired Google credentials.")
             creds.refresh(Request())
+        elif not interactive:
+            logging.info("No saved Google credentials, not starting a sign-in.")
+            return None
         else:
             try:
                 flow = InstalledAppFlow.from_client_secrets_file(
@@ -99,15 +119,17 @@ def get_credentials():
                     exc_info=True,
                 )
                 return None
-        with open(TOKEN_FILE, "w") as token:
-            token.write(creds.to_json())
-            logging.info(f"New credentials saved to '{TOKEN_FILE}'.")
+        save_credentials(creds)
+        logging.info(f"New credentials saved to '{TOKEN_FILE}'.")
     return creds
 
 
-def get_sheet(sheet_id, creds):
+def get_sheet(sheet_id, creds, client=None):
+    import gspread
+
     try:
-        client = gspread.authorize(creds)
+        if client is None:
+            client = gspread.authorize(creds)
         return client.open_by_key(sheet_id).sheet1
     except gspread.exceptions.SpreadsheetNotFound:
         logging.error(f"Google Sheet with ID '{sheet_id}' not found.")
@@ -119,14 +141,151 @@ def get_sheet(sheet_id, creds):
         return None
 
 
-def get_next_match_id(sheet):
-    """Gets the last Match ID from the sheet and increments it."""
+def last_match_id(ids):
+    """The highest numeric Match ID in a list of cell values, 0 if there is none."""
+    return max((int(v) for v in ids if str(v).isdigit()), default=0)
+
+
+def appended_row(response):
+    """The row number an append_row() call wrote to, from the API response."""
     try:
-        last_id = sheet.col_values(1)[-1]
-        return int(last_id) + 1 if last_id.isdigit() else 1
-    except (IndexError, ValueError):
-        logging.info("Match ID column is empty or invalid, starting from 1.")
-        return 1
+        updated_range = response["updates"]["updatedRange"]
+    except (TypeError, KeyError):
+        return None
+    match = re.search(r"![A-Z]+(\d+)", updated_range)
+    return int(match.group(1)) if match else None
+
+
+@contextmanager
+def _file_lock(path):
+    """Holds an exclusive lock on `path` (created if missing), across processes."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about 10 seconds; keep waiting.
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class MatchIdCounter:
+    """
+    Hands out Match IDs from a counter persisted in MATCH_ID_COUNTER_FILE
+    instead of downloading the whole Match ID column for every upload.
+
+    The counter remembers the last ID and the row it was written to. It is
+    checked against the sheet once per session, which only reads those two
+    cells while nobody else appended to the sheet, and is rebuilt from the
+    full column when the sheet and the counter disagree.
+
+    Other processes (e.g. analyze_video.py --upload) may append at the same
+    time, so IDs are only handed out and confirmed inside `locked()`.
+    """
+
+    def __init__(self, path=MATCH_ID_COUNTER_FILE):
+        self.path = path
+        self.sheet_id = None
+        self.last_id = None
+        self.last_row = None
+        self.reconciled = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.sheet_id, self.last_id, self.last_row = state["sheet_id"], state["last_id"], state["last_row"]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError):
+            logging.warning(f"Could not read the Match ID counter from {self.path}, it will be rebuilt.")
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sheet_id": self.sheet_id, "last_id": self.last_id, "last_row": self.last_row}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logging.error(f"Could not save the Match ID counter to {self.path}.", exc_info=True)
+
+    @contextmanager
+    def locked(self):
+        """Holds the counter's lock file and reloads the counter from disk."""
+        with _file_lock(self.path + ".lock"):
+            self._load()
+            yield self
+
+    def _in_sync(self, sheet, sheet_id):
+        """True if the sheet still ends with the row this counter wrote last."""
+        if sheet_id != self.sheet_id or self.last_id is None or not self.last_row:
+            return False
+        cells = sheet.get(f"A{self.last_row}:A{self.last_row + 1}")
+        return [list(row) for row in cells] == [[str(self.last_id)]]
+
+    def rebuild(self, sheet, sheet_id):
+        """Resets the counter from the sheet's full Match ID column."""
+        ids = sheet.col_values(1)
+        self.sheet_id, self.last_id, self.last_row = sheet_id, last_match_id(ids), len(ids)
+        self.reconciled = True
+        self._save()
+        logging.info(f"Match ID counter rebuilt from the sheet: last ID {self.last_id} in row {self.last_row}.")
+
+    def reconcile(self, sheet, sheet_id):
+        """Makes sure the counter matches the sheet, once per session."""
+        if self.reconciled and sheet_id == self.sheet_id:
+            return
+        if self._in_sync(sheet, sheet_id):
+            self.reconciled = True
+        else:
+            self.rebuild(sheet, sheet_id)
+
+    def next_ids(self, count):
+        first = (self.last_id or 0) + 1
+        return list(range(first, first + count))
+
+    def confirm(self, sheet, match_ids, first_row):
+        """
+        Records a successful append of rows starting at `first_row` and
+        returns the Match IDs they ended up with. If the rows didn't land right
+        after our last one, someone else wrote to the sheet in between: the
+        counter is rebuilt and the new rows' IDs are fixed.
+        """
+        if first_row is None or self.last_row is None or first_row == self.last_row + 1:
+            self.last_id = match_ids[-1]
+            self.last_row = first_row + len(match_ids) - 1 if first_row is not None else None
+            self._save()
+            return match_ids
+        logging.warning(f"Rows landed at row {first_row}, expected row {self.last_row + 1}. Reconciling Match IDs.")
+        ids = sheet.col_values(1)
+        base = last_match_id(ids[:first_row - 1])
+        correct_ids = list(range(base + 1, base + 1 + len(match_ids)))
+        if correct_ids != match_ids:
+            last_row = first_row + len(match_ids) - 1
+            sheet.update(range_name=f"A{first_row}:A{last_row}", values=[[i] for i in correct_ids])
+            logging.info(f"Changed the Match IDs of rows {first_row}-{last_row} to {correct_ids[0]}-{correct_ids[-1]}.")
+        later_ids = ids[first_row + len(match_ids) - 1:]
+        self.last_id, self.last_row = max(correct_ids[-1], last_match_id(later_ids)), len(ids)
+        self._save()
+        return correct_ids
 
 
 def flatten_json_for_sheet(data, config, match_id):
@@ -174,33 +333,311 @@ def flatten_json_for_sheet(data, config, match_id):
     return row
 
 
+# Columns that identify a game, together with the known players' heroes.
+FINGERPRINT_COLUMNS = ("Date", "Map", "Gamemode", "Result", "Game Length", "Team 1 Score", "Team 2 Score")
+# What the analysis writes when it could not read a field (see main_ocr).
+UNKNOWN_VALUES = {"", "unknown", "ocr_failed", "-1"}
+
+
+def _fingerprint_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:
+            return ""
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip().lower()
+
+
+def match_fingerprint(record):
+    """
+    A stable identifier of a game, from a row keyed by the sheet's columns.
+    The same game gives the same fingerprint whether it comes from a fresh
+    analysis, a sheet download or a CSV export.
+
+    Returns None if any identifying field is unknown: two games whose details
+    could not be read would otherwise look the same.
+    """
+    parts = [_fingerprint_value(record.get(column)) for column in FINGERPRINT_COLUMNS]
+    if any(part in UNKNOWN_VALUES for part in parts):
+        return None
+    parts.extend(sorted(
+        f"{column[:-len(' Hero')]}={_fingerprint_value(value)}"
+        for column, value in record.items() if column.endswith(" Hero")
+    ))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def game_fingerprint(data, config):
+    """The fingerprint of analyzed game data, as it would be written to the sheet (or None)."""
+    row = flatten_json_for_sheet(data, config, "")
+    return match_fingerprint(dict(zip(sheet_columns(config["known_players"]), row)))
+
+
+def save_credentials(creds):
+    with open(TOKEN_FILE, "w") as token:
+        token.write(creds.to_json())
+
+
+def _expires_soon(creds):
+    if creds.expiry is None:
+        return False
+    # google-auth stores the expiry as a naive UTC datetime.
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < CREDENTIALS_REFRESH_MARGIN
+
+
+class UploaderSession:
+    """
+    Keeps the config, credentials, authorized gspread client and worksheet
+    between uploads, so an upload is a single API call on a reused connection
+    instead of re-reading files and re-opening the spreadsheet every time.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.config = None
+        self.config_mtime = None
+        self.creds = None
+        self.client = None
+        self.sheet = None
+        self.sheet_id = None
+        self.match_ids = MatchIdCounter()
+
+    def get_config(self):
+        """The config, re-read only if config.json changed on disk."""
+        try:
+            mtime = os.path.getmtime(CONFIG_FILE)
+        except OSError:
+            mtime = None
+        if self.config is None or mtime != self.config_mtime:
+            self.config = load_config()
+            self.config_mtime = mtime
+        return self.config
+
+    def get_credentials(self, interactive=True):
+        """Valid credentials, refreshed proactively shortly before they expire."""
+        if self.creds is None:
+            self.creds = get_credentials(interactive)
+            if self.creds is None:
+                return None
+        if self.creds.refresh_token and (not self.creds.valid or _expires_soon(self.creds)):
+            from google.auth.transport.requests import Request
+
+            logging.info("Refreshing Google credentials before they expire.")
+            try:
+                self.creds.refresh(Request())
+                save_credentials(self.creds)
+            except Exception:
+                logging.error("Could not refresh Google credentials.", exc_info=True)
+                self.invalidate(credentials=True)
+                return None
+        return self.creds
+
+    def get_sheet(self, interactive=True):
+        """
+        The worksheet of the configured spreadsheet, opened once per session.
+        With `interactive` False, returns None instead of asking the user to sign in.
+        """
+        with self.lock:
+            config = self.get_config()
+            if not config:
+                return None
+            creds = self.get_credentials(interactive)
+            if not creds:
+                return None
+            if self.client is None:
+                import gspread
+
+                # The client keeps one HTTP session, so its connections are reused.
+                self.client = gspread.authorize(creds)
+                if hasattr(self.client, "set_timeout"):
+                    self.client.set_timeout(REQUEST_TIMEOUT)
+            if self.sheet is None or self.sheet_id != config["sheet_id"]:
+                self.sheet = get_sheet(config["sheet_id"], creds, client=self.client)
+                self.sheet_id = config["sheet_id"] if self.sheet else None
+            return self.sheet
+
+    def invalidate(self, credentials=False):
+        """Drops the cached client and worksheet (and credentials), e.g. after an API error."""
+        with self.lock:
+            self.client, self.sheet, self.sheet_id = None, None, None
+            if credentials:
+                self.creds = None
+
+    def upload_batch(self, games, before_send=None):
+        """
+        Appends games to the sheet in one API call and returns their Match IDs.
+        `before_send(match_ids)` is called right before the append. Raises if
+        the upload failed.
+        """
+        with self.lock:
+            sheet = self.get_sheet()
+            if not sheet:
+                raise RuntimeError("Could not access the worksheet.")
+            # Held until the counter is confirmed, so no other process can
+            # hand out the same Match IDs in between.
+            with self.match_ids.locked():
+                try:
+                    self.match_ids.reconcile(sheet, self.sheet_id)
+                    match_ids = self.match_ids.next_ids(len(games))
+                    rows = [flatten_json_for_sheet(data, self.config, match_id) for data, match_id in zip(games, match_ids)]
+                    if before_send:
+                        before_send(match_ids)
+                    logging.info(f"Appending {len(rows)} games (Match IDs {match_ids[0]}-{match_ids[-1]})")
+                    logging.debug(f"Row data: {rows}")
+                    response = sheet.append_rows(rows)
+                except Exception:
+                    # The next upload starts from a fresh client and worksheet and
+                    # checks the counter again, in case the rows were written anyway.
+                    self.invalidate()
+                    self.match_ids.reconciled = False
+                    raise
+                try:
+                    return self.match_ids.confirm(sheet, match_ids, appended_row(response))
+                except Exception:
+                    logging.error("Could not verify the Match IDs of the uploaded rows.", exc_info=True)
+                    self.match_ids.reconciled = False
+                    return match_ids
+
+    def read_rows_since(self, match_id):
+        """
+        Rows with a Match ID greater than `match_id`, as a DataFrame. Match ID n
+        is normally in row n + 1, so only the new rows are read; if rows were
+        deleted or reordered, the whole sheet is read instead.
+
+        Values are read as formatted in the sheet and parsed like the CSV
+        export, so the rows get the same values and types as a full download.
+        """
+        # Only the dashboard reads rows; the uploader itself doesn't need pandas.
+        import pandas as pd
+
+        with self.lock:
+            # Called from the dashboard, which must never open a sign-in page.
+            sheet = self.get_sheet(interactive=False)
+            if not sheet:
+                raise RuntimeError("Could not access the worksheet.")
+            start = max(2, match_id + 1)
+            header, rows = sheet.batch_get(["1:1", f"A{start}:ZZ"], value_render_option="FORMATTED_VALUE")
+            if start > 2 and (not rows or str(rows[0][0]) != str(match_id)):
+                logging.info("Match IDs don't line up with the rows, reading the whole sheet.")
+                rows = sheet.batch_get(["A2:ZZ"], value_render_option="FORMATTED_VALUE")[0]
+        header = header[0] if header else []
+        text = StringIO()
+        writer = csv.writer(text)
+        writer.writerow(header)
+        writer.writerows((list(r) + [""] * len(header))[:len(header)] for r in rows)
+        df = pd.read_csv(StringIO(text.getvalue()))
+        if df.empty or "Match ID" not in df.columns:
+            return df
+        ids = pd.to_numeric(df["Match ID"], errors="coerce")
+        return df[ids > match_id].reset_index(drop=True)
+
+    def update_rows(self, games_by_id):
+        """
+        Overwrites the rows of the given Match IDs with new game data in one
+        request. Returns the Match IDs that were found in the sheet.
+        """
+        with self.lock:
+            sheet = self.get_sheet()
+            if not sheet:
+                raise RuntimeError("Could not access the worksheet.")
+            rows = {int(v): row for row, v in enumerate(sheet.col_values(1), start=1) if str(v).isdigit()}
+            updates = [
+                {"range": f"A{rows[match_id]}", "values": [flatten_json_for_sheet(data, self.config, match_id)]}
+                for match_id, data in games_by_id.items() if match_id in rows
+            ]
+            if updates:
+                sheet.batch_update(updates)
+            logging.info(f"Updated {len(updates)} rows in the sheet.")
+            return {match_id for match_id in games_by_id if match_id in rows}
+
+    def find_match_ids(self, match_ids):
+        """The subset of `match_ids` that is in the sheet."""
+        with self.lock:
+            sheet = self.get_sheet()
+            if not sheet:
+                raise RuntimeError("Could not access the worksheet.")
+            present = {int(v) for v in sheet.col_values(1) if str(v).isdigit()}
+            return {match_id for match_id in match_ids if match_id in present}
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_upload_listeners = []
+
+
+def add_upload_listener(callback):
+    """
+    Calls `callback(games, match_ids, error)` from the flusher thread after
+    every upload attempt: with the uploaded games and their Match IDs, or with
+    the error of a failed attempt.
+    """
+    _upload_listeners.append(callback)
+
+
+def _notify_listeners(games, match_ids, error):
+    for callback in list(_upload_listeners):
+        try:
+            callback(games, match_ids, error)
+        except Exception:
+            logging.error("Upload listener failed.", exc_info=True)
+
+
+def get_flusher():
+    """
+    The process-wide outbox flusher, started on first use. It writes to the
+    storage backend selected in config.json.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            from match_storage import get_storage
+            storage = get_storage(load_config() or {})
+            _flusher = OutboxFlusher(
+                Outbox(OUTBOX_FILE), storage.append_matches, storage.find_match_ids, on_batch=_notify_listeners
+            )
+            _flusher.start()
+        return _flusher
+
+
 def upload_to_sheet(data):
-    """Main function to upload a single game's data to the Google Sheet."""
+    """
+    Commits a single game's data to the outbox; the background flusher
+    uploads it to the Google Sheet. Returns once the game is stored locally,
+    with the game's fingerprint (None without a config or if the game can't
+    be identified; such games are never skipped as duplicates).
+    """
     logging.info("--- GOOGLE SHEETS UPLOAD ---")
     config = load_config()
-    if not config:
-        logging.error("Upload failed: config.json not found.")
-        return
+    fingerprint = game_fingerprint(data, config) if config else None
+    flusher = get_flusher()
+    row_id = flusher.outbox.add(data, fingerprint)
+    if row_id is None:
+        logging.info("This game was already recorded, skipping the upload.")
+        return fingerprint
+    logging.info(f"Game saved to the upload outbox (entry {row_id}).")
+    flusher.wake()
+    return fingerprint
 
-    creds = get_credentials()
-    if not creds:
-        logging.error("Upload failed: Could not get Google credentials.")
-        return
 
-    sheet = get_sheet(config["sheet_id"], creds)
-    if not sheet:
-        logging.error("Upload failed: Could not access the worksheet.")
-        return
+def pending_uploads():
+    """Number of games waiting in the outbox."""
+    flusher = _flusher
+    return flusher.pending() if flusher is not None else 0
 
-    next_id = get_next_match_id(sheet)
-    new_row = flatten_json_for_sheet(data, config, next_id)
 
-    logging.info(f"Appending new game data (Match ID: {next_id})")
-    logging.debug(f"Row data: {new_row}")
-    try:
-        sheet.append_row(new_row)
-        logging.info("Successfully uploaded data to Google Sheets.")
-    except Exception as e:
-        logging.error(
-            "Upload failed: An error occurred while appending the row.", exc_info=True
-        )
+def flush_uploads(timeout):
+    """Waits until the outbox is empty. Returns False if games are still pending."""
+    return get_flusher().wait_until_empty(timeout)
+
+
+def stop_uploads():
+    """Stops the flusher; pending games are uploaded the next time it starts."""
+    global _flusher
+    with _flusher_lock:
+        flusher, _flusher = _flusher, None
+    if flusher is not None:
+        flusher.stop()
+        flusher.join(timeout=5)
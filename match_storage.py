@@ -0,0 +1,265 @@
+"""
+Where recorded games are stored and read back from.
+
+    storage = get_storage(config)
+    storage.append_matches([game_data, ...])   # -> Match IDs
+    storage.update_matches({match_id: game_data})   # -> Match IDs found
+    storage.read_since(match_id)               # -> DataFrame of newer games
+    storage.read_all()                         # -> DataFrame of every game
+
+Reads return the same columns as the Google Sheet ("Match ID", "Date", ...,
+"<player> Hero", "<player> Role"), so the dashboard works with either backend.
+The backend is chosen with "storage" in config.json: "sheets" (the default)
+uploads to the Google Sheet, "sqlite" keeps everything in a local database and
+needs no network at all.
+
+Only the standard library is imported here; pandas is imported by the reads,
+so the uploader in the tray app can use this module without loading it.
+"""
+import abc
+import logging
+import os
+import sqlite3
+import threading
+from io import StringIO
+from constants import MATCH_COLUMNS, MATCH_DB_FILE, TOKEN_FILE
+
+# Seconds before downloading the sheet is given up on.
+DOWNLOAD_TIMEOUT = 30
+
+# Database column for each sheet column, in the same order.
+_DB_COLUMNS = [
+    "match_id", "date", "season", "year", "month", "map", "gamemode",
+    "result", "game_length", "team1_score", "team1_side",
+    "team2_score", "team2_side",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id INTEGER PRIMARY KEY,
+    date TEXT,
+    season TEXT,
+    year INTEGER,
+    month TEXT,
+    map TEXT,
+    gamemode TEXT,
+    result TEXT,
+    game_length TEXT,
+    team1_score INTEGER,
+    team1_side TEXT,
+    team2_score INTEGER,
+    team2_side TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_matches_date ON matches (date);
+CREATE INDEX IF NOT EXISTS idx_matches_season ON matches (season);
+CREATE INDEX IF NOT EXISTS idx_matches_map ON matches (map);
+CREATE TABLE IF NOT EXISTS match_players (
+    match_id INTEGER NOT NULL REFERENCES matches (match_id) ON DELETE CASCADE,
+    player TEXT NOT NULL,
+    hero TEXT,
+    role TEXT,
+    PRIMARY KEY (match_id, player)
+);
+CREATE INDEX IF NOT EXISTS idx_match_players_player ON match_players (player, hero);
+"""
+
+
+class MatchStorage(abc.ABC):
+    """Interface of a storage backend."""
+
+    @abc.abstractmethod
+    def append_matches(self, games, before_send=None):
+        """
+        Stores games in order and returns their Match IDs. `before_send` is
+        called with the Match IDs right before they are written.
+        """
+
+    @abc.abstractmethod
+    def update_matches(self, games_by_id):
+        """
+        Overwrites stored games with new data, keyed by Match ID. Returns the
+        Match IDs that were found and updated.
+        """
+
+    @abc.abstractmethod
+    def find_match_ids(self, match_ids):
+        """The subset of `match_ids` that is stored."""
+
+    @abc.abstractmethod
+    def read_since(self, match_id):
+        """Games with a Match ID greater than `match_id`."""
+
+    @abc.abstractmethod
+    def read_all(self):
+        """Every stored game."""
+
+
+class SheetsStorage(MatchStorage):
+    """The Google Sheet created by setup.py."""
+
+    def __init__(self, config):
+        self.config = config
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            from google_sheets_integration.uploader import UploaderSession
+            self._session = UploaderSession()
+        return self._session
+
+    def append_matches(self, games, before_send=None):
+        return self.session.upload_batch(games, before_send)
+
+    def update_matches(self, games_by_id):
+        return self.session.update_rows(games_by_id)
+
+    def find_match_ids(self, match_ids):
+        return self.session.find_match_ids(match_ids)
+
+    def read_since(self, match_id):
+        """
+        Reads only the new rows through the Sheets API when Google credentials
+        are saved. Otherwise (or without the upload dependencies) the public
+        CSV export is filtered instead; a sign-in is never started from here.
+        """
+        import pandas as pd
+
+        if os.path.exists(TOKEN_FILE):
+            try:
+                return self.session.read_rows_since(match_id)
+            except ImportError:
+                pass
+        data = self.read_all()
+        if data.empty or "Match ID" not in data.columns:
+            return data
+        return data[pd.to_numeric(data["Match ID"], errors="coerce") > match_id].reset_index(drop=True)
+
+    def read_all(self):
+        """Downloads the sheet through its public CSV export link."""
+        import pandas as pd
+        import requests
+        response = requests.get(self.config["sheet_csv_url"], timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return pd.read_csv(StringIO(response.text))
+
+
+class SqliteStorage(MatchStorage):
+    """
+    A local database with one row per game and one row per known player in
+    each game, indexed for the dashboard's filters (date, season, map, player).
+    """
+
+    def __init__(self, path, config):
+        self.path = path
+        self.config = config
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA foreign_keys=ON")
+        with self.lock, self.db:
+            self.db.executescript(_SCHEMA)
+
+    def append_matches(self, games, before_send=None):
+        with self.lock, self.db:
+            # The tray app and analyze_video.py can both store games: take the
+            # write lock before reading MAX, so no two get the same Match IDs.
+            self.db.execute("BEGIN IMMEDIATE")
+            last_id = self.db.execute("SELECT COALESCE(MAX(match_id), 0) FROM matches").fetchone()[0]
+            match_ids = list(range(last_id + 1, last_id + 1 + len(games)))
+            if before_send:
+                before_send(match_ids)
+            for data, match_id in zip(games, match_ids):
+                self._insert(data, match_id)
+        logging.info(f"Stored {len(games)} games in {self.path} (Match IDs {match_ids[0]}-{match_ids[-1]}).")
+        return match_ids
+
+    def update_matches(self, games_by_id):
+        updated = set()
+        with self.lock, self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            for match_id, data in games_by_id.items():
+                # The players' rows go with it (ON DELETE CASCADE).
+                if self.db.execute("DELETE FROM matches WHERE match_id = ?", (match_id,)).rowcount:
+                    self._insert(data, match_id)
+                    updated.add(match_id)
+        logging.info(f"Updated {len(updated)} games in {self.path}.")
+        return updated
+
+    def _insert(self, data, match_id):
+        from google_sheets_integration.uploader import flatten_json_for_sheet
+        known_players = self.config.get("known_players", [])
+        row = [None if v == "" else v for v in flatten_json_for_sheet(data, self.config, match_id)]
+        self.db.execute(
+            f"INSERT INTO matches ({', '.join(_DB_COLUMNS)}) VALUES ({', '.join('?' * len(_DB_COLUMNS))})",
+            row[:len(_DB_COLUMNS)],
+        )
+        heroes_and_roles = row[len(_DB_COLUMNS):]
+        self.db.executemany(
+            "INSERT INTO match_players (match_id, player, hero, role) VALUES (?, ?, ?, ?)",
+            [
+                (match_id, player, heroes_and_roles[2 * i], heroes_and_roles[2 * i + 1])
+                for i, player in enumerate(known_players)
+            ],
+        )
+
+    def find_match_ids(self, match_ids):
+        if not match_ids:
+            return set()
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT match_id FROM matches WHERE match_id IN ({', '.join('?' * len(match_ids))})",
+                list(match_ids),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def _read(self, where="", params=()):
+        import pandas as pd
+
+        select = ", ".join(f'{db} AS "{sheet}"' for db, sheet in zip(_DB_COLUMNS, MATCH_COLUMNS))
+        with self.lock:
+            df = pd.read_sql_query(f"SELECT {select} FROM matches {where} ORDER BY match_id", self.db, params=params)
+            players = pd.read_sql_query(
+                f"SELECT p.match_id, p.player, p.hero, p.role FROM match_players p "
+                f"JOIN matches ON matches.match_id = p.match_id {where}",
+                self.db, params=params,
+            )
+        for player in self.config.get("known_players", []):
+            rows = players[players["player"] == player].set_index("match_id")
+            df[f"{player} Hero"] = df["Match ID"].map(rows["hero"])
+            df[f"{player} Role"] = df["Match ID"].map(rows["role"])
+        return df
+
+    def read_since(self, match_id):
+        return self._read("WHERE matches.match_id > ?", (match_id,))
+
+    def read_all(self):
+        return self._read()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+# One SqliteStorage (and connection) per database file, shared by every caller.
+_sqlite_storages = {}
+_sqlite_storages_lock = threading.Lock()
+
+
+def get_storage(config):
+    """
+    The storage backend selected in config.json. The local database is opened
+    once per process; later calls reuse that connection with the new config.
+    """
+    backend = config.get("storage", "sheets")
+    if backend == "sqlite":
+        with _sqlite_storages_lock:
+            storage = _sqlite_storages.get(MATCH_DB_FILE)
+            if storage is None:
+                storage = _sqlite_storages[MATCH_DB_FILE] = SqliteStorage(MATCH_DB_FILE, config)
+            storage.config = config
+            return storage
+    if backend != "sheets":
+        logging.warning(f"Unknown storage backend '{backend}', using Google Sheets.")
+    return SheetsStorage(config)
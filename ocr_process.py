@@ -0,0 +1,272 @@
+"""
+Runs the analysis pipeline in a long-lived child process.
+
+The tray icon, keyboard listener and web dashboard stay in the main process.
+Frames are handed to the child through a shared memory block (no pickling of
+~11 MB screenshots) and results come back over a pipe. The child warms up the
+templates and the OCR engine once at startup and keeps them warm between
+requests; if it crashes or hangs, it is restarted on the next request without
+affecting the rest of the app.
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+import constants
+import tracing
+
+# Seconds to wait for one analysis before the child is considered hung and
+# restarted.
+ANALYSIS_TIMEOUT = 120
+START_TIMEOUT = 60
+
+STATE_STOPPED = "stopped"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+
+
+def _attach_shared_memory(name):
+    """Attaches to a block owned by the parent without taking over its cleanup."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track` flag. A spawned child shares the parent's
+        # resource tracker, so the registration is a duplicate of the parent's
+        # and the parent still unlinks the block.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _setup_child_logging():
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [OCR] %(message)s')
+    file_handler = logging.FileHandler(os.path.join(constants.LOG_DIR, "app.log"), mode='a', encoding='utf-8')
+    file_handler.setFormatter(log_formatter)
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(log_formatter)
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(file_handler)
+    root_logger.addHandler(console_handler)
+    root_logger.setLevel(logging.INFO)
+
+
+class _StageRecorder:
+    """
+    A stage cache that starts empty and collects what the analysis computes,
+    so the parent can store the stage results in the screenshot archive.
+    """
+
+    def __init__(self):
+        self.results = []
+
+    def get(self, stage, version):
+        return False, None
+
+    def put(self, stage, version, result):
+        self.results.append([stage, version, result])
+
+
+def _process_main(conn):
+    """Entry point of the child process: serves requests until told to stop."""
+    _setup_child_logging()
+    # The parent owns the trace file; the child only collects its spans and
+    # sends them back with the result.
+    tracing.set_tracing_enabled(False)
+    import numpy as np
+    finished_traces = []
+    tracing.add_trace_sink(finished_traces.append)
+
+    warm_up_start = time.perf_counter()
+    from data_extraction.main_ocr import analyze_scoreboard, warm_up
+    from data_extraction.template_registry import refresh_templates, template_set_version
+
+    try:
+        warm_up()
+    except Exception:
+        # A failed warm-up only means the first analysis is slower.
+        logging.error("Warm-up failed.", exc_info=True)
+    logging.info(f"OCR process ready (warm-up took {time.perf_counter() - warm_up_start:.1f}s).")
+    template_versions = {set_name: template_set_version(set_name) for set_name in ("maps", "heroes", "names")}
+    conn.send({"ready": True, "template_versions": template_versions})
+
+    attached = None
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+        command = request.get("command")
+        if command == "stop":
+            break
+        if command != "analyze":
+            conn.send({"error": f"Unknown command {command!r}"})
+            continue
+
+        if attached is None or attached.name != request["shm_name"]:
+            if attached is not None:
+                attached.close()
+            attached = _attach_shared_memory(request["shm_name"])
+        frame = np.ndarray(request["shape"], dtype=np.uint8, buffer=attached.buf)
+        if refresh_templates():
+            template_versions = {set_name: template_set_version(set_name) for set_name in ("maps", "heroes", "names")}
+        finished_traces.clear()
+        stages = _StageRecorder()
+        try:
+            with tracing.trace("analysis"):
+                game_data = analyze_scoreboard(scoreboard_img=frame, stage_cache=stages)
+            response = {"result": game_data}
+        except Exception as e:
+            logging.error("--- ANALYSIS FAILED IN OCR PROCESS ---", exc_info=True)
+            response = {"result": None, "error": str(e)}
+        response["stages"] = stages.results
+        response["template_versions"] = template_versions
+        del frame
+        if finished_traces:
+            response["trace"] = finished_traces[-1].to_record()
+        conn.send(response)
+
+    if attached is not None:
+        attached.close()
+
+
+class OcrProcessClient:
+    """Main-process handle to the OCR child process."""
+
+    def __init__(self, on_state_change=None):
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.conn = None
+        self.shm = None
+        self.lock = threading.Lock()
+        self.on_state_change = on_state_change
+        # One of STATE_STOPPED, STATE_WARMING or STATE_READY.
+        self.state = STATE_STOPPED
+        # Content hashes of the template sets the child analyzes with.
+        self.template_versions = {}
+
+    @property
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        """Starts the child, unless it is already running, and waits for its warm-up."""
+        with self.lock:
+            if not self.is_alive:
+                self._start()
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_state_change:
+            try:
+                self.on_state_change(self)
+            except Exception:
+                logging.error("State callback failed.", exc_info=True)
+
+    def _start(self):
+        """Starts the child and blocks until it has warmed up."""
+        self._set_state(STATE_WARMING)
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_process_main, args=(child_conn,), name="OcrProcess", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        try:
+            if not self.conn.poll(START_TIMEOUT):
+                raise RuntimeError("OCR process did not become ready in time.")
+            ready = self.conn.recv()
+        except Exception:
+            self._terminate()
+            raise
+        self.template_versions = ready.get("template_versions", {})
+        logging.info(f"OCR process started (pid {self.process.pid}).")
+        self._set_state(STATE_READY)
+
+    def _restart(self):
+        logging.warning("Restarting the OCR process.")
+        self._terminate()
+        self._start()
+
+    def _terminate(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=5)
+        if self.conn is not None:
+            self.conn.close()
+        self.process, self.conn = None, None
+        if self.state != STATE_STOPPED:
+            self._set_state(STATE_STOPPED)
+
+    def _frame_buffer(self, nbytes):
+        if self.shm is None or self.shm.size < nbytes:
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        return self.shm
+
+    def analyze(self, frame, stage_cache=None):
+        """
+        Analyzes a BGR frame in the child process.
+        Returns the game data, or None if the analysis failed or the child
+        crashed. The results of the single stages are stored in `stage_cache`
+        (see screenshot_archive.StageCache), so reprocess.py can reuse them.
+        """
+        # Imported here, not at the top: run.py imports this module at startup,
+        # and numpy is only needed once the first frame is analyzed.
+        import numpy as np
+
+        with self.lock:
+            if not self.is_alive:
+                self._restart()
+            shape = tuple(frame.shape)
+            shm = self._frame_buffer(frame.nbytes)
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[:] = frame
+            sent_at = time.perf_counter()
+            try:
+                self.conn.send({"command": "analyze", "shm_name": shm.name, "shape": shape})
+                if not self.conn.poll(ANALYSIS_TIMEOUT):
+                    logging.error(f"OCR process did not answer within {ANALYSIS_TIMEOUT}s.")
+                    self._restart()
+                    return None
+                response = self.conn.recv()
+            except (EOFError, OSError):
+                logging.error("Lost connection to the OCR process, it probably crashed.", exc_info=True)
+                self._restart()
+                return None
+
+        trace = tracing.current_trace()
+        if trace is not None and "trace" in response:
+            # Merge the child's stage timings into the trace of this hotkey run.
+            offset = round((sent_at - trace.start) * 1000, 3)
+            for s in response["trace"]["spans"]:
+                trace.spans.append(dict(s, start_ms=s["start_ms"] + offset, process="ocr"))
+            trace.attrs.update(response["trace"]["attrs"])
+        if "error" in response:
+            logging.error(f"OCR process reported an error: {response['error']}")
+        # The child reloads the name templates when they change on disk.
+        self.template_versions = response.get("template_versions", self.template_versions)
+        if stage_cache is not None:
+            try:
+                for stage, version, result in response.get("stages", []):
+                    stage_cache.put(stage, version, result)
+            except Exception:
+                logging.error("Could not store the stage results.", exc_info=True)
+        return response.get("result")
+
+    def stop(self):
+        with self.lock:
+            if self.conn is not None and self.is_alive:
+                try:
+                    self.conn.send({"command": "stop"})
+                    self.process.join(timeout=5)
+                except (EOFError, OSError):
+                    pass
+            self._terminate()
+            if self.shm is not None:
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = None
@@ -0,0 +1,177 @@
+"""
+Re-analyzes the archived screenshots after templates, thresholds or the OCR
+changed, and writes the games whose result changed as a list of corrections.
+
+    python reprocess.py --output corrections.json
+    python reprocess.py --apply corrections.json    # after reviewing them
+
+Every stage result is cached per screenshot under a version that hashes the
+stage's inputs (see main_ocr.stage_versions), so adding a hero template only
+re-runs hero detection, regenerating name templates only re-runs name
+detection, and so on. Screenshots whose stages are all cached under the current
+versions are skipped without even being loaded.
+
+Each correction carries the game's upload fingerprint and, if the game was
+uploaded, its Match ID. --apply writes the new results of the corrections with
+a Match ID over those rows of the storage backend (the Google Sheet or the
+local database); entries can be removed from the file beforehand to skip them.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+import constants
+from data_extraction.main_ocr import analyze_scoreboard, load_known_players, stage_versions
+from data_extraction.template_priors import use_in_memory_priors
+from data_extraction.template_registry import template_set_version
+from google_sheets_integration.outbox import Outbox
+from google_sheets_integration.uploader import game_fingerprint, load_config
+from match_storage import get_storage
+from screenshot_archive import ScreenshotArchive
+
+CACHED_STAGES = ("validation", "map", "heroes", "ocr", "names")
+
+
+def diff_results(old, new, prefix=""):
+    """Returns {field path: [old, new]} for every field that differs."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = {}
+        for key in sorted(set(old) | set(new)):
+            changes.update(diff_results(old.get(key), new.get(key), f"{prefix}{key}."))
+        return changes
+    if old != new:
+        return {prefix.rstrip("."): [old, new]}
+    return {}
+
+
+def is_up_to_date(cached):
+    """True if re-running the analysis could not change the result."""
+    if cached.get("validation") is False:
+        return True
+    return all(stage in cached for stage in CACHED_STAGES)
+
+
+def reprocess(archive, known_players, outbox=None, config=None):
+    """
+    Re-analyzes every archived screenshot and returns the list of corrections.
+    The Match IDs are looked up in the outbox's fingerprint index; screenshots
+    archived without a fingerprint get the one of their old result under `config`.
+    """
+    versions = stage_versions(known_players)
+    template_versions = {set_name: template_set_version(set_name) for set_name in ("maps", "heroes", "names")}
+    corrections = []
+    skipped = missing = 0
+    for entry in archive.entries():
+        image_hash = entry["hash"]
+        if is_up_to_date(archive.cached_stages(image_hash, versions)):
+            skipped += 1
+            continue
+        frame = archive.load(image_hash)
+        if frame is None:
+            missing += 1
+            continue
+        logging.info(f"Re-analyzing {image_hash[:16]} (captured {entry['captured_at']}).")
+        new = analyze_scoreboard(
+            scoreboard_img=frame, known_players=known_players, stage_cache=archive.stage_cache(image_hash)
+        )
+        old = entry["result"]
+        archive.record_result(image_hash, new, template_versions)
+        changes = diff_results(old or {}, new or {})
+        if changes:
+            fingerprint = entry.get("fingerprint")
+            if fingerprint is None and old and config:
+                # Still None if the old result had unreadable details.
+                fingerprint = game_fingerprint(old, config)
+            match_id = outbox.match_id_for(fingerprint) if outbox and fingerprint else None
+            corrections.append({
+                "hash": image_hash,
+                "fingerprint": fingerprint,
+                "match_id": match_id,
+                "captured_at": entry["captured_at"],
+                "changes": changes,
+                "old": old,
+                "new": new,
+            })
+    logging.info(f"{skipped} screenshots were up to date, {missing} are no longer in the archive.")
+    return corrections
+
+
+def apply_corrections(corrections, storage, outbox, config):
+    """
+    Overwrites the stored games of corrections with a Match ID with their new
+    result, and adds the new fingerprints to the index so the corrected games
+    are not uploaded again. Returns the Match IDs that were updated.
+    """
+    games = {c["match_id"]: c["new"] for c in corrections if c.get("match_id") is not None and c.get("new")}
+    skipped = len(corrections) - len(games)
+    if skipped:
+        logging.info(f"{skipped} corrections have no Match ID or no new result and are skipped.")
+    if not games:
+        return set()
+    updated = storage.update_matches(games)
+    fingerprints = []
+    for match_id in updated:
+        fingerprint = game_fingerprint(games[match_id], config)
+        if fingerprint is not None:
+            fingerprints.append((fingerprint, match_id))
+    outbox.add_fingerprints(fingerprints)
+    missing = sorted(set(games) - set(updated))
+    if missing:
+        logging.warning(f"Match IDs not found in storage, not updated: {missing}")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-analyze archived screenshots with the current templates.")
+    parser.add_argument("--output", default="corrections.json", help="Where to write the corrected games.")
+    parser.add_argument("--apply", metavar="FILE", help="Apply the corrections in FILE to the stored games instead.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.apply:
+        config = load_config()
+        if not config:
+            sys.exit(1)
+        with open(args.apply, "r", encoding="utf-8") as f:
+            corrections = json.load(f)
+        outbox = Outbox(constants.OUTBOX_FILE)
+        try:
+            updated = apply_corrections(corrections, get_storage(config), outbox, config)
+        finally:
+            outbox.close()
+        logging.info(f"Applied {len(updated)} corrections.")
+        return
+
+    known_players = load_known_players()
+    if not known_players:
+        sys.exit(1)
+    # Re-analyzing old screenshots must not count as new detections.
+    use_in_memory_priors()
+
+    archive = ScreenshotArchive(
+        constants.SCREENSHOT_ARCHIVE_DIR, constants.SCREENSHOT_ARCHIVE_INDEX,
+        constants.SCREENSHOT_ARCHIVE_MAX_BYTES,
+    )
+    outbox = Outbox(constants.OUTBOX_FILE)
+    started = time.perf_counter()
+    try:
+        corrections = reprocess(archive, known_players, outbox, load_config())
+    finally:
+        archive.close()
+        outbox.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(corrections, f, indent=2)
+    logging.info(
+        f"{len(corrections)} games changed, took {time.perf_counter() - started:.1f}s. "
+        f"Corrections written to {args.output}"
+    )
+    for c in corrections:
+        fields = ", ".join(f"{field}: {old!r} -> {new!r}" for field, (old, new) in c["changes"].items())
+        match_id = c["match_id"] if c["match_id"] is not None else "-"
+        print(f"{c['captured_at']} {c['hash'][:12]} Match ID {match_id}  {fields}")
+
+
+if __name__ == "__main__":
+    main()
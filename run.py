@@ -1,51 +1,85 @@
 import time
 import os
+import json
 import logging
 import threading
 import subprocess
 import sys
 import webbrowser
-from web_app.app import app as web_app
-from PIL import Image, ImageDraw
-from pystray import MenuItem as item, Icon as icon
-from pynput import keyboard
-import pyautogui
 import constants
-from data_extraction.main_ocr import analyze_scoreboard
-from google_sheets_integration.uploader import upload_to_sheet
+import events
+import tracing
+from analysis_worker import AnalysisWorker, JOB_CAPTURE, JOB_FILE
+from ocr_process import OcrProcessClient, STATE_WARMING
 
-import json
+# The OCR process is spawned, so it imports this module again as __mp_main__.
+# Everything it doesn't need (logging setup, PIL, pystray, pynput) therefore
+# only happens in the functions below, which run in the main process only.
 
 
 # --- Setup Logging ---
-# Create a logs directory in the user's home folder
-log_dir = os.path.join(os.path.expanduser("~"), "OverwatchStatsOCR_Logs")
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, "app.log")
-
-log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-# Use UTF-8 encoding for both file and console to prevent UnicodeEncodeError
-file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
-file_handler.setFormatter(log_formatter)
-file_handler.setLevel(logging.INFO)
-
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setFormatter(log_formatter)
-console_handler.setLevel(logging.INFO)
-
-# Configure the root logger
-root_logger = logging.getLogger()
-# Remove any existing handlers to avoid duplicate logs
-root_logger.handlers.clear()
-root_logger.addHandler(file_handler)
-root_logger.addHandler(console_handler)
-root_logger.setLevel(logging.INFO)
+def setup_logging():
+    # Create a logs directory in the user's home folder
+    os.makedirs(constants.LOG_DIR, exist_ok=True)
+    log_file = os.path.join(constants.LOG_DIR, "app.log")
+
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    # Use UTF-8 encoding for both file and console to prevent UnicodeEncodeError
+    file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
+    file_handler.setFormatter(log_formatter)
+    file_handler.setLevel(logging.INFO)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(log_formatter)
+    console_handler.setLevel(logging.INFO)
+
+    # Configure the root logger
+    root_logger = logging.getLogger()
+    # Remove any existing handlers to avoid duplicate logs
+    root_logger.handlers.clear()
+    root_logger.addHandler(file_handler)
+    root_logger.addHandler(console_handler)
+    root_logger.setLevel(logging.INFO)
+
+# --- Startup Probe ---
+STARTUP_PROBE_FILE = os.environ.get(constants.STARTUP_PROBE_ENV)
+startup_milestones = set()
+startup_probe_lock = threading.Lock()
+
+
+def record_startup_milestone(name):
+    """
+    Appends a startup milestone with a wall-clock timestamp to the probe file,
+    if one was given. Once the tray is up and the OCR process has started (or
+    failed to), the app exits, so the cold-start benchmark can launch it repeatedly.
+    """
+    if not STARTUP_PROBE_FILE:
+        return
+    with startup_probe_lock:
+        startup_milestones.add(name)
+        with open(STARTUP_PROBE_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"milestone": name, "time": time.time()}) + "\n")
+        done = "tray_ready" in startup_milestones and bool(startup_milestones & {"ocr_ready", "ocr_failed"})
+    if done and tray_icon is not None:
+        on_exit(tray_icon, None)
+
 
 # --- Global State ---
 keyboard_listener = None
 is_listener_running = False
 web_app_process = None
+analysis_worker = None
+ocr_client = None
+tray_icon = None
+screen_watcher = None
+folder_watcher = None
+screenshot_archive = None
+upload_status = "Uploads: -"
+
+# Screenshot files whose width/height ratio is further than this from 16:9
+# are not scaled to the scoreboard size; the regions would not line up.
+ASPECT_RATIO_TOLERANCE = 0.01
 
 def on_setup_complete(config_data):
     """Callback function to save config and then relaunch the application."""
@@ -62,6 +96,8 @@ def on_setup_complete(config_data):
 
 def create_default_icon():
     """Creates a simple 64x64px icon for the system tray."""
+    from PIL import Image, ImageDraw
+
     width, height = 64, 64
     # Simple blue circle on a transparent background
     image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
@@ -70,39 +106,187 @@ def create_default_icon():
     return image
 
 
-def on_activate():
-    """The function called when the hotkey is pressed."""
-    logging.info(f"--- Hotkey {constants.HOTKEY} activated! Starting main process ---")
+def archive_and_analyze(frame, source):
+    """
+    Archives a BGR frame, analyzes it in the OCR process, records the result in
+    the archive index and queues the game for upload. Returns the game data or None.
+    """
+    image_hash = None
     try:
-        screenshot_dir = os.path.dirname(constants.SCREENSHOT_PATH)
-        os.makedirs(screenshot_dir, exist_ok=True)
-        screenshot = pyautogui.screenshot()
-        screenshot.save(constants.SCREENSHOT_PATH)
-        logging.info(f"Screenshot saved to {constants.SCREENSHOT_PATH}")
-        time.sleep(1)
+        with tracing.span("archive"):
+            image_hash = screenshot_archive.add(frame, source)
+        logging.info(f"Screenshot archived as {image_hash[:16]}")
     except Exception:
-        logging.error(
-            "--- AN ERROR OCCURRED WHILE TAKING SCREENSHOT ---", exc_info=True
-        )
-        return
+        logging.error("Could not archive the screenshot.", exc_info=True)
 
-    if not os.path.exists(constants.SCREENSHOT_PATH):
-        logging.error(f"Screenshot not found at {constants.SCREENSHOT_PATH}. Aborting.")
-        return
+    # The analysis runs in the OCR process; the frame is passed via shared memory.
+    stage_cache = screenshot_archive.stage_cache(image_hash) if image_hash else None
+    game_data = ocr_client.analyze(frame, stage_cache)
+    fingerprint = None
+    if game_data:
+        # Only stored locally here; the upload runs in the background, so the
+        # next press doesn't wait for the network.
+        with tracing.span("queue_upload"):
+            try:
+                from google_sheets_integration.uploader import upload_to_sheet
+                fingerprint = upload_to_sheet(game_data)
+            except Exception:
+                logging.error("Could not queue the game for upload.", exc_info=True)
+    if image_hash:
+        try:
+            # The fingerprint lets reprocess.py find the game's row in the sheet.
+            screenshot_archive.record_result(image_hash, game_data, ocr_client.template_versions, fingerprint)
+        except Exception:
+            logging.error("Could not record the analysis result in the archive.", exc_info=True)
+    return game_data
 
-    logging.info("--- Analyzing scoreboard ---")
-    game_data = analyze_scoreboard(scoreboard_img_path=constants.SCREENSHOT_PATH)
 
-    if game_data:
-        logging.info("--- Uploading to Google Sheets ---")
-        upload_to_sheet(game_data)
-        logging.info("--- Process complete ---")
+def on_activate(trigger="hotkey"):
+    """The function called when the hotkey is pressed (or watch mode saw a scoreboard)."""
+    if trigger == "hotkey":
+        logging.info(f"--- Hotkey {constants.HOTKEY} activated! Starting main process ---")
     else:
-        logging.warning("--- Analysis failed or was aborted, stopping process ---")
+        logging.info("--- Scoreboard detected by watch mode! Starting main process ---")
+    # Imported on first use; they are not needed to bring up the tray icon.
+    import pyautogui
+    import numpy as np
+    from data_extraction.scoreboard_detector import crop_validator_region, learn_signature
+
+    with tracing.trace("analysis", trigger=trigger):
+        try:
+            with tracing.span("capture"):
+                screenshot = pyautogui.screenshot().convert("RGB")
+                # The OCR process expects BGR, like cv2.imread would return it.
+                frame = np.asarray(screenshot)[:, :, ::-1]
+        except Exception:
+            logging.error(
+                "--- AN ERROR OCCURRED WHILE TAKING SCREENSHOT ---", exc_info=True
+            )
+            tracing.annotate(status="capture_failed")
+            return
+
+        logging.info("--- Analyzing scoreboard ---")
+        game_data = archive_and_analyze(frame, trigger)
+
+        if game_data:
+            # Teach watch mode what this user's scoreboard looks like.
+            learn_signature(crop_validator_region(frame))
+            logging.info("--- Process complete ---")
+        else:
+            logging.warning("--- Analysis failed or was aborted, stopping process ---")
     logging.info(f"--- Waiting for next hotkey press ({constants.HOTKEY}) ---")
 
 
+def analyze_file(path, sha256):
+    """Analyzes and uploads a screenshot found in one of the watch folders."""
+    logging.info(f"--- Analyzing screenshot file {path} ---")
+    import numpy as np
+    from PIL import Image
+    from data_extraction.scoreboard_detector import SCOREBOARD_SIZE
+
+    with tracing.trace("analysis", trigger="file"):
+        try:
+            with tracing.span("load"):
+                with Image.open(path) as image:
+                    screenshot = image.convert("RGB")
+                width, height = screenshot.size
+                if abs(width / height - SCOREBOARD_SIZE[0] / SCOREBOARD_SIZE[1]) > ASPECT_RATIO_TOLERANCE:
+                    logging.warning(
+                        f"--- Skipping {os.path.basename(path)}: {width}x{height} is not a 16:9 screenshot, "
+                        f"the scoreboard regions only fit 16:9 (e.g. {SCOREBOARD_SIZE[0]}x{SCOREBOARD_SIZE[1]}) ---"
+                    )
+                    tracing.annotate(status="wrong_aspect_ratio")
+                    folder_watcher.mark_processed(sha256)
+                    return
+                if screenshot.size != SCOREBOARD_SIZE:
+                    # Other 16:9 sizes scale to the regions well enough.
+                    logging.info(f"Resizing screenshot from {screenshot.size} to {SCOREBOARD_SIZE}.")
+                    screenshot = screenshot.resize(SCOREBOARD_SIZE, Image.LANCZOS)
+                frame = np.asarray(screenshot)[:, :, ::-1]
+        except Exception:
+            logging.error(f"--- COULD NOT READ SCREENSHOT FILE {path} ---", exc_info=True)
+            tracing.annotate(status="load_failed")
+            folder_watcher.mark_processed(sha256)
+            return
+
+        game_data = archive_and_analyze(frame, "file")
+    # Also marked when the analysis failed, so a non-scoreboard image is not retried forever.
+    folder_watcher.mark_processed(sha256)
+    if game_data:
+        logging.info(f"--- Processed {os.path.basename(path)} ---")
+    else:
+        logging.warning(f"--- Analysis of {os.path.basename(path)} failed or was aborted ---")
+
+
+def handle_job(kind, payload):
+    """Runs one job from the analysis worker's queue."""
+    if kind == JOB_CAPTURE:
+        on_activate(**(payload or {}))
+    elif kind == JOB_FILE:
+        analyze_file(payload["path"], payload["sha256"])
+
+
+def status_text(_item=None):
+    if analysis_worker is None or ocr_client is None:
+        return "Status: Starting"
+    if analysis_worker.busy:
+        return f"Status: Working (queued: {analysis_worker.queue_depth})"
+    if ocr_client.state == STATE_WARMING:
+        return "Status: Warming up"
+    return "Status: Ready"
+
+
+def last_run_text(_item=None):
+    if analysis_worker is None or analysis_worker.last_run_seconds is None:
+        return "Last run: -"
+    return f"Last run: {analysis_worker.last_run_seconds:.1f}s"
+
+
+def upload_status_text(_item=None):
+    return upload_status
+
+
+def on_upload(games, match_ids, error):
+    """Called from the upload flusher after every attempt."""
+    global upload_status
+    from google_sheets_integration.uploader import flatten_json_for_sheet, load_config, pending_uploads
+
+    pending = pending_uploads()
+    waiting = f" ({pending} waiting)" if pending else ""
+    if error is not None:
+        upload_status = f"Uploads: Failed, retrying{waiting}"
+    else:
+        upload_status = f"Uploads: Match ID {match_ids[-1]} saved{waiting}"
+        config = load_config()
+        if config:
+            # The dashboard appends these rows to its data, if it is open.
+            events.publish(events.MATCHES_ADDED, {
+                "columns": constants.sheet_columns(config["known_players"]),
+                "rows": [flatten_json_for_sheet(game, config, match_id) for game, match_id in zip(games, match_ids)],
+            })
+    on_status_change(None)
+
+
+def start_uploader():
+    """Starts the upload flusher, which also uploads games left over from earlier runs."""
+    try:
+        from google_sheets_integration.uploader import add_upload_listener, get_flusher
+        add_upload_listener(on_upload)
+        get_flusher()
+    except Exception:
+        logging.error("Could not start the uploader.", exc_info=True)
+
+
+def on_status_change(_source):
+    # Refreshes the dynamic menu texts after the worker or the OCR process changed
+    # state. The icon may not exist yet during startup.
+    if tray_icon is not None:
+        tray_icon.update_menu()
+
+
 def on_press(key):
+    from pynput import keyboard
+
     hotkey_char = None
     try:
         hotkey_char = key.char
@@ -110,12 +294,15 @@ def on_press(key):
         pass  # Special key
 
     if hotkey_char == constants.HOTKEY or key == getattr(keyboard.Key, constants.HOTKEY, None):
-        on_activate()
+        # Never do the actual work in the listener thread, it would block key events.
+        analysis_worker.submit_capture()
 
 
 def start_listener():
     global keyboard_listener, is_listener_running
     if not is_listener_running:
+        from pynput import keyboard
+
         logging.info("Starting keyboard listener.")
         keyboard_listener = keyboard.Listener(on_press=on_press)
         keyboard_listener.start()
@@ -130,6 +317,83 @@ def stop_listener():
         is_listener_running = False
 
 
+# mss handles must be used by the thread that created them (the screen watcher's).
+screen_grabber = threading.local()
+
+
+def grab_validator_region():
+    """
+    Grabs only the 'FINAL SCORE' region of the primary monitor, as a BGR array.
+    pyautogui would capture the whole screen and crop it (and start a
+    screencapture process per call on macOS); mss copies just these pixels.
+    """
+    import mss
+    import numpy as np
+    from data_extraction.scoreboard_detector import VALIDATOR_ROI
+
+    if getattr(screen_grabber, "sct", None) is None:
+        screen_grabber.sct = mss.mss()
+    sct = screen_grabber.sct
+    monitor = sct.monitors[1]
+    x1, y1, x2, y2 = VALIDATOR_ROI
+    region = sct.grab({"left": monitor["left"] + x1, "top": monitor["top"] + y1, "width": x2 - x1, "height": y2 - y1})
+    # BGRA -> BGR
+    return np.asarray(region)[:, :, :3]
+
+
+def submit_screenshot_file(path, sha256):
+    return analysis_worker.submit(JOB_FILE, {"path": path, "sha256": sha256})
+
+
+def start_folder_watcher():
+    global folder_watcher
+    from folder_watcher import FolderWatcher
+
+    folder_watcher = FolderWatcher(
+        constants.WATCH_FOLDERS, submit_screenshot_file, constants.PROCESSED_IMAGES_FILE,
+        constants.WATCH_FOLDER_POLL_SECONDS, constants.WATCH_FOLDER_SETTLE_SECONDS,
+        constants.WATCH_FOLDER_BACKLOG_DAYS,
+    )
+    folder_watcher.start()
+
+
+def on_scoreboard_detected():
+    analysis_worker.submit(JOB_CAPTURE, {"trigger": "watch"})
+
+
+def start_watch_mode():
+    global screen_watcher
+    if screen_watcher is not None and screen_watcher.is_alive():
+        return
+    from data_extraction.scoreboard_detector import ScoreboardDetector
+    from screen_watcher import ScreenWatcher
+
+    detector = ScoreboardDetector(constants.WATCH_STABLE_SAMPLES, constants.WATCH_COOLDOWN_SECONDS)
+    screen_watcher = ScreenWatcher(
+        grab_validator_region, detector, on_scoreboard_detected, constants.WATCH_INTERVAL_SECONDS
+    )
+    screen_watcher.start()
+
+
+def stop_watch_mode():
+    global screen_watcher
+    if screen_watcher is not None:
+        screen_watcher.stop()
+        screen_watcher = None
+
+
+def is_watch_mode_on(_item=None):
+    return screen_watcher is not None and screen_watcher.is_alive()
+
+
+def toggle_watch_mode(icon, _item):
+    if is_watch_mode_on():
+        stop_watch_mode()
+    else:
+        start_watch_mode()
+    icon.update_menu()
+
+
 web_app_thread = None
 
 
@@ -142,6 +406,9 @@ def launch_web_dashboard():
 
     def run_app():
         try:
+            # Importing the dashboard loads pandas, plotly and dash and reads the
+            # local data file, so it only happens when the dashboard is opened.
+            from web_app.app import app as web_app
             web_app.run(host="127.0.0.1", port=8050)
         except Exception as e:
             logging.error(f"Failed to start web app: {e}", exc_info=True)
@@ -158,6 +425,19 @@ def launch_web_dashboard():
 def on_exit(icon, item):
     logging.info("Exit selected. Shutting down.")
     stop_listener()
+    stop_watch_mode()
+    if folder_watcher:
+        folder_watcher.stop()
+    if analysis_worker:
+        analysis_worker.stop()
+    if ocr_client:
+        ocr_client.stop()
+    if screenshot_archive:
+        # Waits for screenshots that are still being written.
+        screenshot_archive.close()
+    if "google_sheets_integration.uploader" in sys.modules:
+        # Games that are not uploaded yet stay in the outbox for the next start.
+        sys.modules["google_sheets_integration.uploader"].stop_uploads()
     if web_app_thread:
         # It's a daemon thread, so it should exit with the main program.
         # No explicit stop needed unless it's not a daemon.
@@ -165,14 +445,51 @@ def on_exit(icon, item):
     icon.stop()
 
 
+def start_ocr_process():
+    """Starts the OCR process in the background; it warms up before reporting ready."""
+    try:
+        ocr_client.start()
+    except Exception:
+        # The worker retries on the first hotkey press.
+        logging.error("Could not start the OCR process.", exc_info=True)
+        record_startup_milestone("ocr_failed")
+        return
+    record_startup_milestone("ocr_ready")
+
+
 def main():
+    global analysis_worker, ocr_client, tray_icon, screenshot_archive
+    from pystray import MenuItem as item, Icon as icon
+
     logging.info("--- Overwatch Stats OCR ---")
+    record_startup_milestone("main")
+
+    from screenshot_archive import ScreenshotArchive
+    screenshot_archive = ScreenshotArchive(
+        constants.SCREENSHOT_ARCHIVE_DIR, constants.SCREENSHOT_ARCHIVE_INDEX,
+        constants.SCREENSHOT_ARCHIVE_MAX_BYTES,
+    )
+
+    ocr_client = OcrProcessClient(on_state_change=on_status_change)
+    threading.Thread(target=start_ocr_process, daemon=True).start()
+    threading.Thread(target=start_uploader, daemon=True).start()
+
+    analysis_worker = AnalysisWorker(
+        handle_job, constants.WORK_QUEUE_SIZE, on_status_change=on_status_change
+    )
+    analysis_worker.start()
+
+    if constants.WATCH_FOLDERS:
+        start_folder_watcher()
 
     # The pystray documentation recommends starting listeners
     # in a setup function passed to run(). This avoids race conditions on macOS.
     def post_setup(icon):
         icon.visible = True
         start_listener()
+        if constants.WATCH_MODE_ENABLED:
+            start_watch_mode()
+        record_startup_milestone("tray_ready")
 
     # Setup the system tray icon
     tray_icon = icon(
@@ -180,7 +497,10 @@ def main():
         create_default_icon(),
         'Overwatch Stats OCR',
         menu=(
-            item('Status: Listening', None, enabled=False),
+            item(status_text, None, enabled=False),
+            item(last_run_text, None, enabled=False),
+            item(upload_status_text, None, enabled=False),
+            item('Auto-detect Scoreboards', toggle_watch_mode, checked=is_watch_mode_on),
             item('Launch Web Dashboard', launch_web_dashboard),
             item('Exit', on_exit)
         )
@@ -196,6 +516,8 @@ if __name__ == "__main__":
     multiprocessing.freeze_support()
     # --- End of Fix ---
 
+    setup_logging()
+
     # --- Fix for Qt Platform Plugin Error ---
     # In complex environments like Anaconda, we must explicitly tell Qt where its
     # plugins are. We do this by finding the PyQt6 package path directly.
@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+
+
+class ScreenWatcher(threading.Thread):
+    """
+    Watch mode: samples the scoreboard's 'FINAL SCORE' region every `interval`
+    seconds and calls `on_detect()` when the detector reports a scoreboard that
+    stayed on screen. Only that small region is grabbed and no OCR runs here, so
+    the watcher costs a fraction of a percent of one core.
+    """
+
+    def __init__(self, grab_region, detector, on_detect, interval):
+        super().__init__(name="ScreenWatcher", daemon=True)
+        self.grab_region = grab_region
+        self.detector = detector
+        self.on_detect = on_detect
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.samples = 0
+        self.sample_seconds = 0.0
+
+    def stop(self):
+        self.stop_event.set()
+
+    @property
+    def average_sample_ms(self):
+        return 1000 * self.sample_seconds / self.samples if self.samples else None
+
+    def run(self):
+        logging.info(f"Watch mode started, sampling every {self.interval:.1f}s.")
+        while not self.stop_event.wait(self.interval):
+            start = time.perf_counter()
+            try:
+                triggered = self.detector.update(self.grab_region())
+            except Exception:
+                logging.error("Watch mode sample failed.", exc_info=True)
+                triggered = False
+            self.sample_seconds += time.perf_counter() - start
+            self.samples += 1
+            if triggered:
+                logging.info("Watch mode: scoreboard detected on screen.")
+                self.on_detect()
+        if self.samples:
+            logging.info(
+                f"Watch mode stopped after {self.samples} samples "
+                f"(average {self.average_sample_ms:.1f}ms per sample)."
+            )
@@ -0,0 +1,247 @@
+"""
+Content-addressed archive of every analyzed screenshot.
+
+Each screenshot is stored once, as <hash>.png under SCREENSHOT_ARCHIVE_DIR,
+keyed by the SHA-256 of its pixels. A small SQLite index keeps the capture time,
+the analysis result and the template versions it was analyzed with, so a bad
+analysis can be revisited and re-run later by reprocess.py, which also caches
+per-stage results here. PNGs are written with fast compression on a background
+thread, off the capture path. When the archive grows beyond its size limit, the
+least recently used screenshots are removed.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+# PNG compression level 1 is lossless like the others, ~5x faster than the
+# default and only slightly larger.
+PNG_COMPRESSION = 1
+WRITE_QUEUE_SIZE = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenshots (
+    hash TEXT PRIMARY KEY,
+    file TEXT NOT NULL,
+    size INTEGER,
+    source TEXT,
+    captured_at TEXT NOT NULL,
+    last_used_at TEXT NOT NULL,
+    result TEXT,
+    template_versions TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_screenshots_last_used ON screenshots (last_used_at);
+CREATE TABLE IF NOT EXISTS stage_results (
+    hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    version TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (hash, stage, version)
+);
+"""
+
+
+def frame_hash(frame):
+    """SHA-256 of a frame's shape and pixels."""
+    digest = hashlib.sha256(repr(frame.shape).encode())
+    digest.update(memoryview(frame) if frame.flags.c_contiguous else frame.tobytes())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Per-stage analysis results of one archived screenshot, keyed by
+    (stage, version). Passed to analyze_scoreboard() to skip unchanged stages.
+    """
+
+    def __init__(self, archive, image_hash):
+        self.archive = archive
+        self.image_hash = image_hash
+
+    def get(self, stage, version):
+        """Returns (found, result)."""
+        return self.archive.get_stage_result(self.image_hash, stage, version)
+
+    def put(self, stage, version, result):
+        self.archive.put_stage_result(self.image_hash, stage, version, result)
+
+
+def _now():
+    return datetime.now().isoformat(timespec="milliseconds")
+
+
+class ScreenshotArchive:
+    """Stores screenshots by content hash and keeps an index of their analyses."""
+
+    def __init__(self, directory, index_path, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(index_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        # WAL keeps index updates on the capture path from waiting for a full fsync.
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.lock, self.db:
+            self.db.executescript(_SCHEMA)
+            columns = {r["name"] for r in self.db.execute("PRAGMA table_info(screenshots)")}
+            if "fingerprint" not in columns:
+                self.db.execute("ALTER TABLE screenshots ADD COLUMN fingerprint TEXT")
+        self.writes = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self.writer = threading.Thread(target=self._write_loop, name="ScreenshotArchiveWriter", daemon=True)
+        self.writer.start()
+
+    def path_for(self, image_hash):
+        return os.path.join(self.directory, image_hash[:2], f"{image_hash}.png")
+
+    def add(self, frame, source):
+        """
+        Archives a BGR frame and returns its hash. The PNG is written in the
+        background; a screenshot that is already archived is only marked as used.
+        """
+        image_hash = frame_hash(frame)
+        now = _now()
+        with self.lock, self.db:
+            existing = self.db.execute(
+                "UPDATE screenshots SET last_used_at = ? WHERE hash = ?", (now, image_hash)
+            ).rowcount
+            if not existing:
+                self.db.execute(
+                    "INSERT INTO screenshots (hash, file, source, captured_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                    (image_hash, os.path.relpath(self.path_for(image_hash), self.directory), source, now, now),
+                )
+        if not existing:
+            self.writes.put((image_hash, frame))
+        return image_hash
+
+    def record_result(self, image_hash, game_data, template_versions, fingerprint=None):
+        """
+        Stores the analysis result (None if it failed) of an archived screenshot.
+        `fingerprint` is the upload fingerprint of the game, which links the
+        screenshot to its row in the sheet; a recorded one is kept if it is None.
+        """
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE screenshots SET result = ?, template_versions = ?, fingerprint = COALESCE(?, fingerprint) "
+                "WHERE hash = ?",
+                (json.dumps(game_data), json.dumps(template_versions), fingerprint, image_hash),
+            )
+
+    def stage_cache(self, image_hash):
+        return StageCache(self, image_hash)
+
+    def get_stage_result(self, image_hash, stage, version):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT result FROM stage_results WHERE hash = ? AND stage = ? AND version = ?",
+                (image_hash, stage, version),
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, json.loads(row["result"])
+
+    def put_stage_result(self, image_hash, stage, version, result):
+        # Results for older versions of the stage are no longer useful.
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM stage_results WHERE hash = ? AND stage = ?", (image_hash, stage))
+            self.db.execute(
+                "INSERT INTO stage_results (hash, stage, version, result) VALUES (?, ?, ?, ?)",
+                (image_hash, stage, version, json.dumps(result)),
+            )
+
+    def cached_stages(self, image_hash, versions):
+        """{stage: result} of the stages cached for an image under the given versions."""
+        with self.lock:
+            rows = self.db.execute("SELECT stage, version, result FROM stage_results WHERE hash = ?", (image_hash,)).fetchall()
+        return {r["stage"]: json.loads(r["result"]) for r in rows if versions.get(r["stage"]) == r["version"]}
+
+    def entries(self):
+        """All index rows, oldest capture first, with result and versions decoded."""
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM screenshots ORDER BY captured_at").fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["result"] = json.loads(entry["result"]) if entry["result"] else None
+            entry["template_versions"] = json.loads(entry["template_versions"]) if entry["template_versions"] else {}
+            entries.append(entry)
+        return entries
+
+    def load(self, image_hash):
+        """Reads an archived screenshot as a BGR array (None if it is gone) and marks it as used."""
+        import cv2
+        frame = cv2.imread(self.path_for(image_hash))
+        if frame is not None:
+            with self.lock, self.db:
+                self.db.execute("UPDATE screenshots SET last_used_at = ? WHERE hash = ?", (_now(), image_hash))
+        return frame
+
+    def flush(self):
+        """Waits until every queued screenshot has been written."""
+        self.writes.join()
+
+    def close(self):
+        self.writes.put(None)
+        self.writer.join(timeout=10)
+        with self.lock:
+            self.db.close()
+
+    def _write_loop(self):
+        import cv2
+        while True:
+            item = self.writes.get()
+            if item is None:
+                self.writes.task_done()
+                break
+            image_hash, frame = item
+            try:
+                path = self.path_for(image_hash)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path + ".tmp.png"
+                if not cv2.imwrite(tmp_path, frame, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]):
+                    raise OSError(f"Could not encode {tmp_path}")
+                os.replace(tmp_path, path)
+                with self.lock, self.db:
+                    self.db.execute("UPDATE screenshots SET size = ? WHERE hash = ?", (os.path.getsize(path), image_hash))
+                self._enforce_retention()
+            except Exception:
+                logging.error("Could not archive screenshot.", exc_info=True)
+                with self.lock, self.db:
+                    self.db.execute("DELETE FROM screenshots WHERE hash = ?", (image_hash,))
+                    self.db.execute("DELETE FROM stage_results WHERE hash = ?", (image_hash,))
+            finally:
+                self.writes.task_done()
+
+    def _enforce_retention(self):
+        """Deletes least recently used screenshots until the archive fits in max_bytes."""
+        with self.lock:
+            total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM screenshots").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self.db.execute(
+                "SELECT hash, size FROM screenshots WHERE size IS NOT NULL ORDER BY last_used_at"
+            ).fetchall()
+            evicted = []
+            for row in rows:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self.path_for(row["hash"]))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logging.warning(f"Could not delete archived screenshot {row['hash']}.", exc_info=True)
+                    continue
+                total -= row["size"]
+                evicted.append(row["hash"])
+            with self.db:
+                self.db.executemany("DELETE FROM screenshots WHERE hash = ?", [(h,) for h in evicted])
+                self.db.executemany("DELETE FROM stage_results WHERE hash = ?", [(h,) for h in evicted])
+        if evicted:
+            logging.info(f"Screenshot archive over its size limit, removed {len(evicted)} old screenshots.")
@@ -0,0 +1,18 @@
+from dedupe_sheet import find_duplicates
+
+HEADER = ["Match ID", "Date", "Map", "Gamemode", "Result", "Game Length", "Team 1 Score", "Team 2 Score", "Alice Hero"]
+GAME = ["2024-05-01", "Ilios", "CONTROL", "VICTORY", "10:00", "2", "1", "Mercy"]
+UNREAD = ["", "Ilios", "CONTROL", "VICTORY", "Unknown", "-1", "-1", "Mercy"]
+
+
+def test_keeps_lowest_match_id():
+    kept, duplicates = find_duplicates([HEADER, ["5"] + GAME, ["2"] + GAME])
+    assert list(kept.values()) == [(3, 2)]
+    assert duplicates == [(2, 5, 3)]
+
+
+def test_rows_with_unreadable_details_are_never_duplicates():
+    defeat = UNREAD[:3] + ["DEFEAT"] + UNREAD[4:]
+    kept, duplicates = find_duplicates([HEADER, ["1"] + UNREAD, ["2"] + UNREAD, ["3"] + defeat])
+    assert kept == {}
+    assert duplicates == []
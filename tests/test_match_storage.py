@@ -0,0 +1,60 @@
+import sqlite3
+import pytest
+import match_storage
+from match_storage import SqliteStorage, get_storage
+
+CONFIG = {"storage": "sqlite", "known_players": ["Alice"]}
+
+
+def _game(map_name):
+    return {
+        "date": "05/01/2024", "map": map_name, "gamemode": "CONTROL", "result": "VICTORY", "length": "10:00",
+        "team1": {"score": 2, "players": [{"player_name": "Alice", "hero": "Mercy"}]},
+        "team2": {"score": 1, "players": []},
+    }
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "matches.db")
+
+
+def test_append_numbers_games_after_other_writers(db_path):
+    first, second = SqliteStorage(db_path, CONFIG), SqliteStorage(db_path, CONFIG)
+    assert first.append_matches([_game("Ilios"), _game("Busan")]) == [1, 2]
+    assert second.append_matches([_game("Nepal")]) == [3]
+    assert first.find_match_ids([1, 3, 4]) == {1, 3}
+    first.close()
+    second.close()
+
+
+def test_append_waits_for_another_writer(db_path):
+    storage = SqliteStorage(db_path, CONFIG)
+    storage.db.execute("PRAGMA busy_timeout = 0")
+    other = sqlite3.connect(db_path)
+    other.execute("BEGIN IMMEDIATE")
+    # MAX(match_id) is only read once the write lock is held.
+    with pytest.raises(sqlite3.OperationalError):
+        storage.append_matches([_game("Ilios")], before_send=lambda ids: pytest.fail("read before locking"))
+    other.rollback()
+    assert storage.append_matches([_game("Ilios")]) == [1]
+    other.close()
+    storage.close()
+
+
+def test_update_replaces_game(db_path):
+    storage = SqliteStorage(db_path, CONFIG)
+    storage.append_matches([_game("Ilios")])
+    assert storage.update_matches({1: _game("Busan"), 9: _game("Nepal")}) == {1}
+    assert storage.db.execute("SELECT map FROM matches").fetchall() == [("Busan",)]
+    storage.close()
+
+
+def test_get_storage_reuses_connection(db_path, monkeypatch):
+    monkeypatch.setattr(match_storage, "MATCH_DB_FILE", db_path)
+    monkeypatch.setattr(match_storage, "_sqlite_storages", {})
+    storage = get_storage(CONFIG)
+    renamed = {**CONFIG, "known_players": ["Bob"]}
+    assert get_storage(renamed) is storage
+    assert storage.config is renamed
+    storage.close()
@@ -0,0 +1,199 @@
+import time
+import pytest
+from google_sheets_integration import outbox as outbox_module
+from google_sheets_integration.outbox import (
+    Outbox, OutboxFlusher, retry_delay, CLAIM_TIMEOUT_SECONDS, QUOTA_RETRY_SECONDS,
+    RETRY_BASE_SECONDS, RETRY_MAX_SECONDS, STATE_PENDING, STATE_SENDING, STATE_SENT, STATE_UNCONFIRMED,
+)
+
+
+class FakeSheet:
+    """Stands in for the sheet: send_batch() appends rows, find_match_ids() looks them up."""
+
+    def __init__(self, fail_before_write=False, fail_after_write=False):
+        self.match_ids = []
+        self.fail_before_write = fail_before_write
+        self.fail_after_write = fail_after_write
+
+    def send_batch(self, games, before_send):
+        match_ids = list(range(len(self.match_ids) + 1, len(self.match_ids) + 1 + len(games)))
+        if self.fail_before_write:
+            raise ConnectionError("no network")
+        before_send(match_ids)
+        self.match_ids.extend(match_ids)
+        if self.fail_after_write:
+            raise TimeoutError("the rows were written, but the response was lost")
+        return match_ids
+
+    def find_match_ids(self, match_ids):
+        return set(match_ids) & set(self.match_ids)
+
+
+class QuotaError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("quota exceeded")
+        self.response = type("Response", (), {
+            "status_code": 429,
+            "headers": {"Retry-After": retry_after} if retry_after is not None else {},
+        })()
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.db"))
+    yield box
+    box.close()
+
+
+def _game(n):
+    return {"map": f"Map {n}"}
+
+
+def test_claim_takes_oldest_pending_rows(outbox):
+    ids = [outbox.add(_game(n)) for n in range(3)]
+    batch = outbox.claim(2)
+    assert [row_id for row_id, _ in batch] == ids[:2]
+    assert batch[0][1] == _game(0)
+    assert outbox.counts() == {STATE_SENDING: 2, STATE_PENDING: 1}
+    # Claimed rows are not handed out twice.
+    assert [row_id for row_id, _ in outbox.claim(5)] == ids[2:]
+
+
+def test_release_puts_rows_back(outbox):
+    outbox.add(_game(1))
+    [(row_id, _)] = outbox.claim(1)
+    outbox.release([row_id], "failed")
+    assert outbox.counts() == {STATE_PENDING: 1}
+    assert outbox.claim(1)[0][0] == row_id
+
+
+def test_duplicate_fingerprint_is_not_queued(outbox):
+    assert outbox.add(_game(1), "fp") is not None
+    assert outbox.add(_game(1), "fp") is None
+    assert outbox.counts() == {STATE_PENDING: 1}
+
+
+def test_fingerprint_gets_match_id_when_sent(outbox):
+    outbox.add(_game(1), "fp")
+    [(row_id, _)] = outbox.claim(1)
+    outbox.mark_sent([row_id], [7])
+    assert outbox.match_id_for("fp") == 7
+    assert outbox.match_id_for("unknown") is None
+
+
+def test_add_fingerprints_blocks_later_uploads(outbox):
+    assert outbox.add_fingerprints([("fp", 3)]) == 1
+    assert outbox.add(_game(1), "fp") is None
+    assert outbox.match_id_for("fp") == 3
+
+
+def test_flush_once_sends_batch(outbox):
+    sheet = FakeSheet()
+    reported = []
+    flusher = OutboxFlusher(outbox, sheet.send_batch, sheet.find_match_ids, on_batch=lambda *a: reported.append(a))
+    outbox.add(_game(1))
+    outbox.add(_game(2))
+    assert flusher.flush_once() == 2
+    assert outbox.counts() == {STATE_SENT: 2}
+    assert reported == [([_game(1), _game(2)], [1, 2], None)]
+    assert flusher.flush_once() == 0
+
+
+def test_failure_before_write_releases_rows(outbox):
+    sheet = FakeSheet(fail_before_write=True)
+    flusher = OutboxFlusher(outbox, sheet.send_batch, sheet.find_match_ids)
+    outbox.add(_game(1))
+    with pytest.raises(ConnectionError):
+        flusher.flush_once()
+    assert outbox.counts() == {STATE_PENDING: 1}
+
+
+def test_failure_after_write_is_not_resent(outbox):
+    sheet = FakeSheet(fail_after_write=True)
+    flusher = OutboxFlusher(outbox, sheet.send_batch, sheet.find_match_ids)
+    outbox.add(_game(1), "fp1")
+    outbox.add(_game(2), "fp2")
+    with pytest.raises(TimeoutError):
+        flusher.flush_once()
+    assert outbox.counts() == {STATE_UNCONFIRMED: 2}
+    assert flusher.pending() == 2
+
+    sheet.fail_after_write = False
+    flusher.recover()
+    assert outbox.counts() == {STATE_SENT: 2}
+    assert outbox.match_id_for("fp2") == 2
+    assert flusher.flush_once() == 0
+    assert sheet.match_ids == [1, 2]
+
+
+def test_recover_requeues_rows_missing_from_sheet(outbox):
+    sheet = FakeSheet(fail_after_write=True)
+    flusher = OutboxFlusher(outbox, sheet.send_batch, sheet.find_match_ids)
+    outbox.add(_game(1))
+    with pytest.raises(TimeoutError):
+        flusher.flush_once()
+    # The write was lost after all.
+    sheet.match_ids.clear()
+    sheet.fail_after_write = False
+    flusher.recover()
+    assert outbox.counts() == {STATE_PENDING: 1}
+    assert flusher.flush_once() == 1
+    assert sheet.match_ids == [1]
+
+
+def test_recover_settles_stale_claims(outbox, monkeypatch):
+    sheet = FakeSheet()
+    flusher = OutboxFlusher(outbox, sheet.send_batch, sheet.find_match_ids)
+    outbox.add(_game(1))
+    outbox.add(_game(2))
+    # A flusher that died mid-batch: both rows got IDs, only the first was written.
+    batch = outbox.claim(2)
+    outbox.assign([row_id for row_id, _ in batch], [1, 2])
+    sheet.match_ids.append(1)
+
+    flusher.recover()
+    assert outbox.counts() == {STATE_SENDING: 2}
+
+    later = time.time() + CLAIM_TIMEOUT_SECONDS + 1
+    monkeypatch.setattr(outbox_module.time, "time", lambda: later)
+    flusher.recover()
+    assert outbox.counts() == {STATE_SENT: 1, STATE_PENDING: 1}
+
+
+def test_settle_skips_rows_claimed_again(outbox):
+    outbox.add(_game(1))
+    [(row_id, _)] = outbox.claim(1)
+    outbox.assign([row_id], [1])
+    outbox.mark_unconfirmed([row_id], "timeout")
+    claims = outbox.unsettled()
+    # Another process settled and re-claimed the row in the meantime.
+    outbox.settle(claims, set(), "missing")
+    outbox.claim(1)
+    assert outbox.settle(claims, {1}, "missing") == (0, 0)
+    assert outbox.counts() == {STATE_SENDING: 1}
+
+
+def test_recover_raises_when_lookup_fails(outbox):
+    def find_match_ids(match_ids):
+        raise ConnectionError("no network")
+
+    sheet = FakeSheet(fail_after_write=True)
+    flusher = OutboxFlusher(outbox, sheet.send_batch, find_match_ids)
+    outbox.add(_game(1))
+    with pytest.raises(TimeoutError):
+        flusher.flush_once()
+    with pytest.raises(ConnectionError):
+        flusher.recover()
+    assert outbox.counts() == {STATE_UNCONFIRMED: 1}
+
+
+def test_retry_delay_backs_off_exponentially():
+    assert retry_delay(1) == RETRY_BASE_SECONDS
+    assert retry_delay(3) == RETRY_BASE_SECONDS * 4
+    assert retry_delay(100) == RETRY_MAX_SECONDS
+
+
+def test_retry_delay_waits_out_quota():
+    assert retry_delay(1, QuotaError()) == QUOTA_RETRY_SECONDS
+    assert retry_delay(1, QuotaError(retry_after="120")) == 120
+    assert retry_delay(100, QuotaError(retry_after="120")) == RETRY_MAX_SECONDS
@@ -0,0 +1,155 @@
+import pytest
+
+from google_sheets_integration.uploader import (
+    MatchIdCounter, appended_row, game_fingerprint, last_match_id, match_fingerprint,
+)
+
+
+class FakeSheet:
+    """A worksheet holding only the Match ID column (row 1 is the header)."""
+
+    def __init__(self, ids):
+        self.column = ["Match ID"] + [str(i) for i in ids]
+        self.reads = 0
+
+    def col_values(self, col):
+        self.reads += 1
+        return list(self.column)
+
+    def get(self, range_name):
+        first, last = (int(cell[1:]) for cell in range_name.split(":"))
+        return [[value] for value in self.column[first - 1:last]]
+
+    def append(self, match_ids):
+        """Appends rows like append_rows() and returns the first row written."""
+        first_row = len(self.column) + 1
+        self.column.extend(str(i) for i in match_ids)
+        return first_row
+
+    def update(self, range_name, values):
+        first, last = (int(cell[1:]) for cell in range_name.split(":"))
+        self.column[first - 1:last] = [str(row[0]) for row in values]
+
+
+@pytest.fixture
+def counter_path(tmp_path):
+    return str(tmp_path / "match_id_counter.json")
+
+
+def test_counter_rebuilds_from_sheet(counter_path):
+    sheet = FakeSheet([1, 2, 3])
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(sheet, "sheet")
+    assert (counter.last_id, counter.last_row) == (3, 4)
+    assert counter.next_ids(2) == [4, 5]
+
+
+def test_counter_in_sync_skips_full_read(counter_path):
+    sheet = FakeSheet([1, 2, 3])
+    MatchIdCounter(counter_path).reconcile(sheet, "sheet")
+    sheet.reads = 0
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(sheet, "sheet")
+    assert sheet.reads == 0
+    assert counter.next_ids(1) == [4]
+
+
+def test_counter_rebuilds_after_foreign_append(counter_path):
+    sheet = FakeSheet([1, 2])
+    MatchIdCounter(counter_path).reconcile(sheet, "sheet")
+    sheet.append([3])
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(sheet, "sheet")
+    assert counter.next_ids(1) == [4]
+
+
+def test_counter_rebuilds_for_another_sheet(counter_path):
+    MatchIdCounter(counter_path).reconcile(FakeSheet([1, 2]), "sheet")
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(FakeSheet([1, 2, 3, 4, 5]), "other sheet")
+    assert counter.next_ids(1) == [6]
+
+
+def test_confirm_advances_counter(counter_path):
+    sheet = FakeSheet([1])
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(sheet, "sheet")
+    match_ids = counter.next_ids(2)
+    assert counter.confirm(sheet, match_ids, sheet.append(match_ids)) == [2, 3]
+    assert (counter.last_id, counter.last_row) == (3, 4)
+
+
+def test_confirm_fixes_ids_after_concurrent_append(counter_path):
+    sheet = FakeSheet([1])
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(sheet, "sheet")
+    match_ids = counter.next_ids(2)
+    # Another writer appended Match ID 2 between reconcile and our append.
+    sheet.append([2])
+    first_row = sheet.append(match_ids)
+    assert counter.confirm(sheet, match_ids, first_row) == [3, 4]
+    assert sheet.column == ["Match ID", "1", "2", "3", "4"]
+    assert counter.next_ids(1) == [5]
+
+
+def test_counter_survives_corrupt_file(counter_path):
+    with open(counter_path, "w") as f:
+        f.write("not json")
+    counter = MatchIdCounter(counter_path)
+    counter.reconcile(FakeSheet([1, 2]), "sheet")
+    assert counter.next_ids(1) == [3]
+
+
+def test_locked_reloads_counter(counter_path):
+    sheet = FakeSheet([1])
+    first, second = MatchIdCounter(counter_path), MatchIdCounter(counter_path)
+    first.reconcile(sheet, "sheet")
+    second.reconcile(sheet, "sheet")
+    with first.locked():
+        match_ids = first.next_ids(1)
+        first.confirm(sheet, match_ids, sheet.append(match_ids))
+    with second.locked():
+        assert second.next_ids(1) == [3]
+
+
+def test_last_match_id_ignores_header_and_blanks():
+    assert last_match_id(["Match ID", "3", "", "12", "x"]) == 12
+    assert last_match_id(["Match ID"]) == 0
+
+
+def test_appended_row():
+    assert appended_row({"updates": {"updatedRange": "Sheet1!A12:AB14"}}) == 12
+    assert appended_row({}) is None
+
+
+RECORD = {
+    "Date": "2024-05-01", "Map": "Ilios", "Gamemode": "CONTROL", "Result": "VICTORY", "Game Length": "10:00",
+    "Team 1 Score": 2, "Team 2 Score": 1, "Alice Hero": "Mercy",
+}
+
+
+def test_fingerprint_ignores_match_id_and_formatting():
+    record = {**RECORD, "Match ID": 1, "Bob Hero": "Ana"}
+    from_csv = {**RECORD, "Match ID": "7", "Map": "ilios ", "Team 1 Score": 2.0, "Result": "victory"}
+    from_csv = {"Bob Hero": "Ana", **from_csv}
+    assert match_fingerprint(record) == match_fingerprint(from_csv)
+    assert match_fingerprint(record) != match_fingerprint({**record, "Alice Hero": "Ana"})
+    assert match_fingerprint(record) != match_fingerprint({**record, "Result": "DEFEAT"})
+
+
+def test_no_fingerprint_for_unreadable_details():
+    unread = {**RECORD, "Date": "", "Game Length": "Unknown", "Team 1 Score": -1, "Team 2 Score": -1}
+    assert match_fingerprint(unread) is None
+    assert match_fingerprint({**RECORD, "Gamemode": "Unknown"}) is None
+    assert match_fingerprint({**RECORD, "Result": "OCR_FAILED"}) is None
+
+
+def test_game_fingerprint_matches_sheet_row():
+    config = {"known_players": ["Alice"]}
+    game = {
+        "date": "05/01/2024", "map": "Ilios", "gamemode": "CONTROL", "result": "VICTORY", "length": "10:00",
+        "team1": {"score": 2, "players": [{"player_name": "Alice", "hero": "Mercy"}]},
+        "team2": {"score": 1, "players": []},
+    }
+    assert game_fingerprint(game, config) == match_fingerprint({**RECORD, "Team 1 Score": "2"})
+    assert game_fingerprint({**game, "date": "Unknown"}, config) is None
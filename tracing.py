@@ -0,0 +1,225 @@
+"""
+Lightweight per-stage timing for the analysis pipeline.
+
+Usage:
+
+    with tracing.trace("analysis") as t:
+        with tracing.span("capture"):
+            ...
+
+Each finished trace is written as one JSON line to a rotating file when
+TRACE_ENABLED is set (or tracing is enabled at runtime), and handed to any
+registered sinks. When neither is active, `trace()` and `span()` return a shared
+no-op context manager, so instrumented code costs next to nothing.
+
+With memory profiling on (MEMORY_PROFILING_ENABLED or set_memory_profiling()),
+every span additionally records the peak and retained Python/numpy memory
+measured with tracemalloc, relative to the memory in use when the span started.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+import constants
+
+_NO_OP = nullcontext()
+_enabled = constants.TRACE_ENABLED
+_memory_profiling = False
+_sinks = []
+_local = threading.local()
+_trace_logger = None
+_trace_logger_lock = threading.Lock()
+
+
+class Trace:
+    """Timings collected during one run of the pipeline."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.started_at = datetime.now().isoformat(timespec="milliseconds")
+        self.start = time.perf_counter()
+        self.duration_ms = None
+        self.spans = []
+        self.memory_start = tracemalloc.get_traced_memory()[0] if _memory_profiling else None
+        self.memory = None
+
+    def to_record(self):
+        record = {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "spans": self.spans,
+            "attrs": self.attrs,
+        }
+        if self.memory is not None:
+            record["memory"] = self.memory
+        return record
+
+    def stage_memory(self):
+        """Largest peak and retained KiB per span name (empty without memory profiling)."""
+        memory = {}
+        for s in self.spans:
+            if "mem_peak_kb" in s:
+                peak, retained = memory.get(s["name"], (0.0, 0.0))
+                memory[s["name"]] = (max(peak, s["mem_peak_kb"]), max(retained, s["mem_retained_kb"]))
+        return memory
+
+    def stage_durations(self):
+        """Total milliseconds per span name."""
+        durations = {}
+        for s in self.spans:
+            durations[s["name"]] = durations.get(s["name"], 0.0) + s["duration_ms"]
+        return durations
+
+
+def set_tracing_enabled(enabled):
+    """Turns writing traces to the trace file on or off at runtime."""
+    global _enabled
+    _enabled = enabled
+
+
+def set_memory_profiling(enabled):
+    """
+    Turns per-span memory measurements on or off. Starts tracemalloc if needed,
+    which slows down allocations noticeably, so this is meant for profiling runs.
+    """
+    global _memory_profiling
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and _memory_profiling and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory_profiling = enabled
+
+
+def add_trace_sink(callback):
+    """Registers a callable that receives every finished Trace."""
+    _sinks.append(callback)
+
+
+def remove_trace_sink(callback):
+    if callback in _sinks:
+        _sinks.remove(callback)
+
+
+def current_trace():
+    """The trace active on this thread, or None."""
+    return getattr(_local, "trace", None)
+
+
+def _get_trace_logger():
+    global _trace_logger
+    with _trace_logger_lock:
+        if _trace_logger is None:
+            os.makedirs(constants.LOG_DIR, exist_ok=True)
+            handler = RotatingFileHandler(
+                constants.TRACE_FILE,
+                maxBytes=constants.TRACE_MAX_BYTES,
+                backupCount=constants.TRACE_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("overwatch_stats_ocr.trace")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _trace_logger = logger
+    return _trace_logger
+
+
+def _emit(t):
+    if _enabled:
+        try:
+            _get_trace_logger().info(json.dumps(t.to_record(), default=str))
+        except Exception:
+            logging.error("Could not write trace record.", exc_info=True)
+    for sink in list(_sinks):
+        try:
+            sink(t)
+        except Exception:
+            logging.error("Trace sink failed.", exc_info=True)
+
+
+@contextmanager
+def _trace(name, attrs):
+    t = Trace(name, attrs)
+    _local.trace = t
+    try:
+        yield t
+    finally:
+        t.duration_ms = round((time.perf_counter() - t.start) * 1000, 3)
+        if t.memory_start is not None and tracemalloc.is_tracing():
+            peaks = [s["mem_peak_abs"] for s in t.spans if "mem_peak_abs" in s]
+            current = tracemalloc.get_traced_memory()[0]
+            t.memory = {
+                "peak_kb": round((max(peaks, default=current) - t.memory_start) / 1024, 1),
+                "retained_kb": round((current - t.memory_start) / 1024, 1),
+                "current_kb": round(current / 1024, 1),
+            }
+            for s in t.spans:
+                s.pop("mem_peak_abs", None)
+        _local.trace = None
+        _emit(t)
+
+
+def trace(name, **attrs):
+    """
+    Starts a trace on this thread. If a trace is already active, the existing
+    one is reused (and extended with `attrs`), so nested entry points such as
+    analyze_scoreboard() inside a hotkey run end up in a single record.
+    """
+    if not (_enabled or _sinks):
+        return _NO_OP
+    existing = current_trace()
+    if existing is not None:
+        existing.attrs.update(attrs)
+        return nullcontext(existing)
+    return _trace(name, attrs)
+
+
+@contextmanager
+def _span(t, name):
+    profile_memory = t.memory_start is not None and tracemalloc.is_tracing()
+    if profile_memory:
+        memory_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        record = {
+            "name": name,
+            "start_ms": round((start - t.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+        if profile_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record["mem_peak_kb"] = round((peak - memory_before) / 1024, 1)
+            record["mem_retained_kb"] = round((current - memory_before) / 1024, 1)
+            record["mem_peak_abs"] = peak
+        t.spans.append(record)
+
+
+def span(name):
+    """Times a stage of the active trace. A no-op if there is none."""
+    t = getattr(_local, "trace", None)
+    if t is None:
+        return _NO_OP
+    return _span(t, name)
+
+
+def annotate(**attrs):
+    """Adds attributes to the active trace, if any."""
+    t = getattr(_local, "trace", None)
+    if t is not None:
+        t.attrs.update(attrs)
+
+
+if constants.MEMORY_PROFILING_ENABLED:
+    set_memory_profiling(True)
@@ -2,11 +2,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from dash import Dash, dcc, html, Input, Output, ctx, State, ALL
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import requests
-from io import StringIO
 import re
 import os
+import csv
 import json
 import logging
 
@@ -18,7 +18,13 @@ app = Dash(
 )
 server = app.server
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# The sheet's rows as CSV, so new games can be appended without rewriting it.
+LOCAL_CACHE_FILE = os.path.join(APP_DIR, "local_cache.csv")
+LEGACY_EXCEL_FILE = os.path.join(APP_DIR, "local.xlsx")
 df = pd.DataFrame()
+# Bumped whenever df changes; open pages poll it and redraw when it moved.
+data_version = 0
+DATA_POLL_INTERVAL_MS = 3000
 CONFIG_FILE = os.path.join(
     os.path.expanduser("~"), "OverwatchStatsOCR_Data", "config.json"
 )
@@ -36,8 +42,7 @@ config = load_config()
 
 
 def load_data(use_local=True):
-    global df, config
-    local_excel_path = os.path.join(APP_DIR, "local.xlsx")
+    global df, config, data_version
     if config is None:
         logging.error(
             "config.json not found. Please run setup.py in the root directory."
@@ -45,43 +50,144 @@ def load_data(use_local=True):
         df = pd.DataFrame()
         return
 
-    if use_local and os.path.exists(local_excel_path):
+    if config.get("storage") == "sqlite":
         try:
-            df = pd.read_excel(local_excel_path, engine="openpyxl")
-            logging.info(f"Loaded data from {local_excel_path}")
+            from match_storage import get_storage
+
+            df = get_storage(config).read_all()
+            logging.info("Loaded data from the local match database.")
+        except Exception as e:
+            logging.error(f"Error reading the local match database: {e}", exc_info=True)
+            df = pd.DataFrame()
+    elif use_local and (os.path.exists(LOCAL_CACHE_FILE) or os.path.exists(LEGACY_EXCEL_FILE)):
+        try:
+            df = read_local_cache()
         except Exception as e:
             logging.error(f"Error loading local file: {e}", exc_info=True)
             df = pd.DataFrame()
     else:
         try:
-            logging.info("Attempting to download new data from Google Sheet...")
-            response = requests.get(config["sheet_csv_url"])
-            response.raise_for_status()
-            df = pd.read_csv(StringIO(response.text))
-            df.to_excel(local_excel_path, index=False, engine="openpyxl")
-            logging.info(f"Successfully downloaded and saved as {local_excel_path}!")
+            df = sync_from_cloud(df)
         except Exception as e:
             logging.error(f"Error downloading data: {e}", exc_info=True)
             if "df" not in globals() or df.empty:
                 df = pd.DataFrame()
 
-    if not df.empty:
-        df.columns = df.columns.str.strip()
-        if "Date" in df.columns:
-            df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-        if "Match ID" not in df.columns:
-            df["Match ID"] = range(len(df), 0, -1)
-        df.sort_values("Match ID", ascending=False, inplace=True)
-        df.reset_index(drop=True, inplace=True)
+    df = prepare_data(df)
+    data_version += 1
+
+
+def read_local_cache():
+    if not os.path.exists(LOCAL_CACHE_FILE):
+        # Older versions cached the sheet as Excel; it is converted once.
+        data = pd.read_excel(LEGACY_EXCEL_FILE, engine="openpyxl")
+        data.to_csv(LOCAL_CACHE_FILE, index=False)
+        logging.info(f"Converted {LEGACY_EXCEL_FILE} to {LOCAL_CACHE_FILE}")
+        return data
+    data = pd.read_csv(LOCAL_CACHE_FILE)
+    logging.info(f"Loaded data from {LOCAL_CACHE_FILE}")
+    return data
+
+
+def append_to_local_cache(new):
+    """Appends games to the local cache without rewriting it."""
+    if not os.path.exists(LOCAL_CACHE_FILE):
+        new.to_csv(LOCAL_CACHE_FILE, index=False)
+        return
+    with open(LOCAL_CACHE_FILE, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f), [])
+    if set(new.columns) - set(header):
+        # New columns (e.g. a player was added): rewrite the cache once.
+        pd.concat([pd.read_csv(LOCAL_CACHE_FILE), new], ignore_index=True).to_csv(LOCAL_CACHE_FILE, index=False)
+        return
+    new.reindex(columns=header).to_csv(LOCAL_CACHE_FILE, mode="a", header=False, index=False)
+
+
+def sync_from_cloud(current):
+    """
+    Returns `current` with the games recorded in the cloud since it was
+    loaded. Only the rows after the last loaded Match ID are fetched, and they
+    are appended to the local cache. Without loaded data, or if that fails,
+    the whole sheet is downloaded and the cache rewritten.
+    """
+    from match_storage import get_storage
+
+    storage = get_storage(config)
+    last_id = None
+    if not current.empty and "Match ID" in current.columns:
+        last_id = pd.to_numeric(current["Match ID"], errors="coerce").max()
+    if last_id is not None and pd.notna(last_id):
+        try:
+            new = storage.read_since(int(last_id))
+        except Exception as e:
+            logging.warning(f"Could not fetch only the new games ({e}), downloading the whole sheet.")
+        else:
+            logging.info(f"Fetched {len(new)} new games from the cloud.")
+            if new.empty:
+                return current
+            append_to_local_cache(new)
+            return pd.concat([current, new], ignore_index=True).drop_duplicates("Match ID", keep="last")
+
+    logging.info("Attempting to download new data from Google Sheet...")
+    data = storage.read_all()
+    data.to_csv(LOCAL_CACHE_FILE, index=False)
+    logging.info(f"Successfully downloaded and saved as {LOCAL_CACHE_FILE}!")
+    return data
+
+
+def prepare_data(data):
+    """Normalizes the columns and sorts the games by Match ID (newest first)."""
+    if not data.empty:
+        data.columns = data.columns.str.strip()
+        if "Date" in data.columns:
+            data["Date"] = pd.to_datetime(data["Date"], errors="coerce")
+        if "Match ID" not in data.columns:
+            data["Match ID"] = range(len(data), 0, -1)
+        data.sort_values("Match ID", ascending=False, inplace=True)
+        data.reset_index(drop=True, inplace=True)
         logging.info("DataFrame processed and sorted by Match ID (descending).")
+    return data
+
+
+def on_matches_added(payload):
+    """
+    Adds games the app just recorded (as sheet rows) to the loaded data, so
+    open pages show them without downloading the sheet again.
+    """
+    global df, data_version
+    new = pd.DataFrame(payload["rows"], columns=payload["columns"]).replace("", None)
+    if not df.empty and "Match ID" in df.columns:
+        new = new[~new["Match ID"].isin(df["Match ID"])]
+    if new.empty:
+        return
+    if config and config.get("storage") != "sqlite" and os.path.exists(LOCAL_CACHE_FILE):
+        # Keeps the cache in step with the sheet, so the next sync starts after these games.
+        try:
+            append_to_local_cache(new)
+        except OSError:
+            logging.error("Could not add the new games to the local cache.", exc_info=True)
+    combined = new if df.empty else pd.concat([df, new], ignore_index=True)
+    df = prepare_data(combined.drop_duplicates("Match ID", keep="last"))
+    data_version += 1
+    logging.info(f"Added {len(new)} new games to the dashboard data.")
 
 
 load_data(use_local=True)
+# Games recorded since the app started are replayed, in case the local data
+# predates them.
+try:
+    from events import MATCHES_ADDED, subscribe
+
+    subscribe(MATCHES_ADDED, on_matches_added, replay=True)
+except ImportError:
+    logging.warning("Event channel not available, new games only show up after an update.")
 
 # --- Layout ---
 app.layout = dbc.Container(
     [
         dcc.Store(id="history-display-count-store", data={"count": 10}),
+        dcc.Store(id="data-version-store", data=data_version),
+        dcc.Interval(id="data-version-interval", interval=DATA_POLL_INTERVAL_MS),
         dbc.Row(
             [
                 dbc.Col(
@@ -687,14 +793,20 @@ def generate_history_layout_simple(games_df):
 # --- Callbacks ---
 @app.callback(
     Output("dummy-output", "children"),
+    Output("data-version-store", "data"),
     Input("update-data-button", "n_clicks"),
+    Input("data-version-interval", "n_intervals"),
+    State("data-version-store", "data"),
     prevent_initial_call=True,
 )
-def update_data(n_clicks):
-    if n_clicks > 0:
+def update_data(n_clicks, _n_intervals, shown_version):
+    if ctx.triggered_id == "update-data-button" and n_clicks:
         logging.info("Update data button clicked. Fetching new data.")
         load_data(use_local=False)
-    return f"Data updated at {pd.Timestamp.now()}"
+    elif data_version == shown_version:
+        # Nothing new since this page last redrew.
+        raise PreventUpdate
+    return f"Data updated at {pd.Timestamp.now()}", data_version
 
 
 @app.callback(